@@ -0,0 +1,145 @@
+"""
+Credit Ledger
+
+Every change to a user's balance goes through here as one conditional
+UPDATE with F() expressions plus a CreditTransaction, so concurrent requests
+never overwrite each other's changes. Work that calls an LLM first places a
+hold (a pending 'usage' transaction that already took the credits), then
+commits it on success or releases it, refunding the credits, on failure.
+No row lock is held while the LLM call runs.
+"""
+
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CreditTransaction
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+
+class InsufficientCreditsError(Exception):
+    """The user cannot afford the requested amount"""
+
+    def __init__(self, required: int, available: int):
+        self.required = required
+        self.available = available
+        super().__init__(f"Insufficient credits. Required: {required}, Available: {available}")
+
+
+class CreditLedger:
+    """Atomic credit holds, commits, releases and grants"""
+
+    @staticmethod
+    def _balance(user) -> int:
+        user.credits = User.objects.filter(pk=user.pk).values_list('credits', flat=True).get()
+        return user.credits
+
+    @classmethod
+    def hold(cls, user, credits: int, description: str, paper=None) -> CreditTransaction:
+        """Take credits from the balance, pending commit or release"""
+        with transaction.atomic():
+            taken = User.objects.filter(pk=user.pk, credits__gte=credits).update(credits=F('credits') - credits)
+            balance = cls._balance(user)
+            if not taken:
+                raise InsufficientCreditsError(credits, balance)
+            return CreditTransaction.objects.create(
+                user=user,
+                transaction_type='usage',
+                status='pending',
+                credits=-credits,
+                paper=paper,
+                description=description,
+                balance_before=balance + credits,
+                balance_after=balance
+            )
+
+    @staticmethod
+    def commit(hold: CreditTransaction) -> bool:
+        """Settle a hold once the work succeeded; False if it was already released"""
+        with transaction.atomic():
+            committed = CreditTransaction.objects.filter(pk=hold.pk, status='pending').update(
+                status='completed', updated_at=timezone.now()
+            )
+            if committed:
+                User.objects.filter(pk=hold.user_id).update(total_credits_used=F('total_credits_used') + abs(hold.credits))
+        if committed:
+            hold.status = 'completed'
+        else:
+            logger.warning(f"Credit hold {hold.pk} was settled before it could be committed")
+        return bool(committed)
+
+    @classmethod
+    def release(cls, hold: CreditTransaction, reason: str = '') -> Optional[CreditTransaction]:
+        """Cancel a hold and give the credits back; returns the refund, None if already settled"""
+        with transaction.atomic():
+            released = CreditTransaction.objects.filter(pk=hold.pk, status='pending').update(
+                status='cancelled', updated_at=timezone.now()
+            )
+            if not released:
+                return None
+            hold.status = 'cancelled'
+            return cls.grant(
+                hold.user, -hold.credits, 'refund',
+                description=f"Refund: {hold.description}",
+                admin_notes=reason[:1000],
+                paper_id=hold.paper_id
+            )
+
+    @classmethod
+    def grant(cls, user, credits: int, transaction_type: str, **fields) -> CreditTransaction:
+        """Add (or, for adjustments, remove) credits; removals stop at a zero balance"""
+        with transaction.atomic():
+            while True:
+                applied = credits if credits >= 0 else -min(-credits, cls._balance(user))
+                # Conditional, so a concurrent spend cannot take the balance below zero
+                if User.objects.filter(pk=user.pk, credits__gte=-applied).update(credits=F('credits') + applied):
+                    break
+            balance = cls._balance(user)
+            return CreditTransaction.objects.create(
+                user=user,
+                transaction_type=transaction_type,
+                status='completed',
+                credits=applied,
+                balance_before=balance - applied,
+                balance_after=balance,
+                **fields
+            )
+
+    @staticmethod
+    def paper_holds(paper):
+        return CreditTransaction.objects.filter(paper=paper, transaction_type='usage', status='pending')
+
+    @classmethod
+    def commit_paper(cls, paper):
+        for hold in cls.paper_holds(paper):
+            cls.commit(hold)
+
+    @classmethod
+    def release_paper(cls, paper, reason: str = ''):
+        for hold in cls.paper_holds(paper).select_related('user'):
+            cls.release(hold, reason)
+
+    @classmethod
+    def release_stale(cls) -> int:
+        """Refund holds whose request died without settling them.
+
+        Holds of papers still queued or generating are left to the paper job
+        queue, which fails (and so releases) papers that never finish.
+        """
+        cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'CREDIT_HOLD_TIMEOUT', 3600))
+        stale = CreditTransaction.objects.filter(
+            transaction_type='usage', status='pending', created_at__lt=cutoff
+        ).exclude(paper__status__in=['pending', 'generating']).select_related('user')
+        released = sum(1 for hold in stale if cls.release(hold, 'Hold expired'))
+        if released:
+            logger.warning(f"Released {released} expired credit holds")
+        return released
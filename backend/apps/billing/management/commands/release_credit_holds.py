@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.billing.credits import CreditLedger
+
+
+class Command(BaseCommand):
+    help = 'Refund credit holds that were never committed or released (older than CREDIT_HOLD_TIMEOUT)'
+
+    def handle(self, *args, **options):
+        released = CreditLedger.release_stale()
+        self.stdout.write(self.style.SUCCESS(f'Released {released} expired credit holds'))
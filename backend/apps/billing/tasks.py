@@ -0,0 +1,9 @@
+from config.celery import app
+
+from .credits import CreditLedger
+
+
+@app.task(ignore_result=True)
+def release_credit_holds():
+    """Refund credit holds that were never settled; scheduled by Celery beat"""
+    CreditLedger.release_stale()
@@ -8,6 +8,7 @@ from django.shortcuts import get_object_or_404
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse
 from drf_spectacular.types import OpenApiTypes
 
+from .credits import CreditLedger
 from .models import Package, CreditTransaction, Subscription, PaymentMethod
 from .serializers import (
     PackageSerializer, CreditTransactionSerializer, SubscriptionSerializer,
@@ -168,25 +169,18 @@ class PurchasePackageView(APIView):
                 # TODO: Implement actual payment processing
                 # For now, simulate successful payment
 
-                # Create credit transaction
-                transaction = CreditTransaction.objects.create(
-                    user=request.user,
-                    transaction_type='purchase',
-                    status='completed',
-                    credits=package.credits,
+                # Add the credits and record the purchase
+                transaction = CreditLedger.grant(
+                    request.user,
+                    package.credits,
+                    'purchase',
                     amount=package.price,
                     currency=package.currency,
                     package=package,
                     payment_method='manual',
-                    description=f"Purchase of {package.name}",
-                    balance_before=request.user.credits,
-                    balance_after=request.user.credits + package.credits
+                    description=f"Purchase of {package.name}"
                 )
 
-                # Update user credits
-                request.user.credits += package.credits
-                request.user.save()
-
                 serializer = CreditTransactionSerializer(transaction)
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -279,23 +273,16 @@ class AdjustUserCreditsView(APIView):
             User = get_user_model()
             user = get_object_or_404(User, id=user_id)
             
-            # Create transaction
-            transaction = CreditTransaction.objects.create(
-                user=user,
-                transaction_type='admin_adjustment',
-                status='completed',
-                credits=credits,
+            # Adjust credits (never below zero) and record the transaction
+            transaction = CreditLedger.grant(
+                user,
+                credits,
+                'admin_adjustment',
                 amount=0,
                 description=description,
-                admin_notes=f"Adjusted by admin: {request.user.email}",
-                balance_before=user.credits,
-                balance_after=user.credits + credits
+                admin_notes=f"Adjusted by admin: {request.user.email}"
             )
             
-            # Update user credits
-            user.credits = max(0, user.credits + credits)  # Ensure credits don't go negative
-            user.save()
-            
             serializer = CreditTransactionSerializer(transaction)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
             
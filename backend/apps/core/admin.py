@@ -4,7 +4,9 @@ from django.conf import settings
 from django.utils.html import format_html
 from django.urls import reverse
 from django.http import JsonResponse
-from .models import LLMProvider, LLMModel, PromptTemplate, LLMConfiguration
+from .models import LLMProvider, LLMModel, PromptTemplate, LLMConfiguration, LLMCallRecord
+from .llm_cache import LLMResponseCache
+from .telemetry import WINDOWS, latency_summary
 
 # Customize admin site
 admin.site.site_header = _('Academic Paper Generator Admin')
@@ -39,7 +41,7 @@ admin.sites.site = admin.site
 
 @admin.register(LLMProvider)
 class LLMProviderAdmin(admin.ModelAdmin):
-    list_display = ['name', 'provider_type', 'base_url', 'is_active', 'is_default', 'created_at']
+    list_display = ['name', 'provider_type', 'base_url', 'is_active', 'is_default', 'priority', 'created_at']
     list_filter = ['provider_type', 'is_active', 'is_default']
     search_fields = ['name', 'base_url']
     readonly_fields = ['created_at', 'updated_at']
@@ -52,7 +54,11 @@ class LLMProviderAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         (_('Configuration'), {
-            'fields': ('is_active', 'is_default', 'timeout', 'max_retries')
+            'fields': ('is_active', 'is_default', 'priority', 'timeout', 'max_retries')
+        }),
+        (_('Connection Pool'), {
+            'fields': ('pool_size', 'keep_alive'),
+            'classes': ('collapse',)
         }),
         (_('Timestamps'), {
             'fields': ('created_at', 'updated_at'),
@@ -128,7 +134,7 @@ class LLMConfigurationAdmin(admin.ModelAdmin):
             'fields': ('default_provider', 'default_model', 'default_temperature', 'default_max_tokens')
         }),
         (_('Features'), {
-            'fields': ('enable_streaming', 'enable_caching', 'cache_ttl')
+            'fields': ('enable_streaming', 'enable_caching', 'cache_ttl', 'cache_max_temperature')
         }),
         (_('Rate Limiting'), {
             'fields': ('rate_limit_per_minute',)
@@ -153,3 +159,34 @@ class LLMConfigurationAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('default_provider', 'default_model')
 
+
+@admin.register(LLMCallRecord)
+class LLMCallRecordAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'provider_name', 'model_name', 'call_type', 'outcome',
+                    'latency', 'ttfb', 'tokens_per_second', 'retries', 'cold_start']
+    list_filter = ['provider_name', 'model_name', 'call_type', 'outcome', 'cold_start']
+    date_hierarchy = 'created_at'
+    change_list_template = 'admin/core/llmcallrecord/change_list.html'
+    
+    def has_add_permission(self, request):
+        # Records are written by the telemetry recorder only
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def changelist_view(self, request, extra_context=None):
+        window = request.GET.get('window', '1h')
+        if window not in WINDOWS:
+            window = '1h'
+        # Keep the window selector out of the changelist's own filters
+        request.GET = request.GET.copy()
+        request.GET.pop('window', None)
+        extra_context = {
+            **(extra_context or {}),
+            'windows': list(WINDOWS),
+            'current_window': window,
+            'latency_summary': latency_summary(WINDOWS[window]),
+            'response_cache': LLMResponseCache.stats(),
+        }
+        return super().changelist_view(request, extra_context=extra_context)
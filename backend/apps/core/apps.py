@@ -5,3 +5,8 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.core'
 
+    def ready(self):
+        # Register signal handlers
+        from . import http_pool  # noqa: F401
+        from . import config_snapshot  # noqa: F401
+        from . import prompt_registry  # noqa: F401
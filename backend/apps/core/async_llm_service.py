@@ -0,0 +1,487 @@
+import asyncio
+import json
+import logging
+import time
+import weakref
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+import httpx
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+
+from .config_snapshot import get_config_snapshot
+from .llm_cache import LLMResponseCache
+from .rate_limiter import RateLimitExceeded, limiter_for
+from .telemetry import TelemetryRecorder, begin_call, note_first_byte, note_retry
+from .token_budget import estimate_messages_tokens, estimate_tokens
+from .llm_service import LLMManager, LLMService, LLMServiceError, PromptService
+from .models import LLMModel, LLMProvider
+
+logger = logging.getLogger(__name__)
+
+# Clients private to one AsyncLLMService.scoped_clients() block; None uses the loop's shared ones
+_scoped_resources: ContextVar[Optional[Dict[int, '_ProviderAsyncResources']]] = ContextVar(
+    'llm_async_resources', default=None
+)
+
+
+def _off_loop(func):
+    """Run a blocking call (a shared cache round trip) in a worker thread"""
+    return sync_to_async(func, thread_sensitive=False)
+
+
+class _ProviderAsyncResources:
+    """Per-event-loop HTTP client and concurrency limit for one provider"""
+
+    def __init__(self, provider: LLMProvider):
+        size = max(provider.pool_size, 1)
+        self.size = size
+        self.fingerprint = (
+            provider.base_url, provider.timeout, provider.pool_size,
+            provider.keep_alive, provider.updated_at,
+        )
+        self.retiring = None
+        self.semaphore = asyncio.Semaphore(size)
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(provider.timeout),
+            limits=httpx.Limits(
+                max_connections=size,
+                max_keepalive_connections=size,
+                keepalive_expiry=provider.keep_alive or None,
+            ),
+        )
+
+    async def aclose_when_idle(self):
+        """Close the client once the requests already using it have finished"""
+        for _ in range(self.size):
+            await self.semaphore.acquire()
+        await self.client.aclose()
+
+
+class AsyncLLMService(LLMService):
+    """Asyncio counterpart of LLMService.
+
+    Shares request building and response parsing with LLMService; only the
+    transport differs. Concurrent calls per provider are bounded by
+    ``LLMProvider.pool_size``. Cancelling the awaiting task aborts the HTTP
+    request and releases the provider slot.
+
+    Instances must be created with ``await AsyncLLMService.create(...)`` since
+    the constructor loads configuration from the database.
+    """
+
+    # Keyed weakly by the loop itself: a closed loop's clients go with it, and a
+    # new loop never picks up a dead one's client through a recycled id()
+    _resources: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[int, _ProviderAsyncResources]]' = (
+        weakref.WeakKeyDictionary()
+    )
+
+    @classmethod
+    async def create(cls, provider: Optional[LLMProvider] = None, model: Optional[LLMModel] = None,
+                     rate_limit_wait: Optional[float] = None) -> 'AsyncLLMService':
+        return await sync_to_async(cls)(provider=provider, model=model, rate_limit_wait=rate_limit_wait)
+
+    async def _aacquire_rate_limit(self):
+        """Async version of _acquire_rate_limit"""
+        limiter = limiter_for(self.provider, self.model, self.config)
+        if limiter:
+            await limiter.aacquire(max_wait=self.rate_limit_wait)
+
+    async def _acheck_circuit(self):
+        await _off_loop(self._check_circuit)()
+
+    def _get_resources(self) -> _ProviderAsyncResources:
+        """Client and semaphore for this provider on the running event loop"""
+        loop_resources = _scoped_resources.get()
+        if loop_resources is None:
+            loop_resources = self._resources.setdefault(asyncio.get_running_loop(), {})
+        resources = loop_resources.get(self.provider.pk)
+        fingerprint = (
+            self.provider.base_url, self.provider.timeout, self.provider.pool_size,
+            self.provider.keep_alive, self.provider.updated_at,
+        )
+        if resources is None or resources.fingerprint != fingerprint:
+            previous = resources
+            resources = _ProviderAsyncResources(self.provider)
+            if previous is not None:
+                # The provider settings changed; requests in flight finish on the old client
+                resources.retiring = asyncio.get_running_loop().create_task(previous.aclose_when_idle())
+            loop_resources[self.provider.pk] = resources
+        return resources
+
+    @classmethod
+    async def aclose_clients(cls):
+        """Close every HTTP client owned by the running event loop"""
+        for resources in cls._resources.pop(asyncio.get_running_loop(), {}).values():
+            await resources.client.aclose()
+
+    @staticmethod
+    @asynccontextmanager
+    async def scoped_clients():
+        """Give the calls made in this block their own HTTP clients, closed when it ends.
+
+        For loops the caller does not own, such as the one async_to_sync runs on.
+        """
+        resources = {}
+        token = _scoped_resources.set(resources)
+        try:
+            yield
+        finally:
+            _scoped_resources.reset(token)
+            for entry in resources.values():
+                await entry.client.aclose()
+
+    async def _arequest_with_retry(self, url: str, headers: Dict, data: Dict) -> Any:
+        """Async version of _request_with_retry"""
+        self._log_request(url, headers, data)
+        client = self._get_resources().client
+        start_time = time.time()
+        response = None
+
+        for attempt in range(3):
+            try:
+                response = await client.post(url, headers=headers, json=data)
+                response.raise_for_status()
+                if response.text.strip() == "":
+                    raise ValueError("Empty response from LLM service")
+                # httpx reads the body before returning, so this is an upper bound
+                note_first_byte()
+                if self.provider.provider_type == 'ollama':
+                    # Ollama may answer with NDJSON, the first object holds the message
+                    return json.loads(response.text.splitlines()[0])
+                return response.json()
+            except (httpx.HTTPError, json.JSONDecodeError, ValueError) as e:
+                duration = time.time() - start_time
+                if attempt == 2:
+                    error_details = {
+                        "provider": self.provider.provider_type,
+                        "url": url,
+                        "status": getattr(response, 'status_code', None),
+                        "response": getattr(response, 'text', '')[:500],
+                        "error": str(e),
+                        "attempts": attempt + 1,
+                        "duration": f"{duration:.2f}s"
+                    }
+                    logger.error(
+                        "Async LLM request failed:\n" +
+                        "\n".join([f"{k}: {v}" for k, v in error_details.items()])
+                    )
+                    raise LLMServiceError(
+                        "LLM service request failed",
+                        code="NETWORK_ERROR",
+                        details=error_details
+                    ) from e
+
+                note_retry()
+                delay = self._retry_delay(response, attempt)
+                logger.warning(
+                    f"Async retry {attempt+1} after {delay}s: {str(e)}\n"
+                    f"Duration: {duration:.2f}s"
+                )
+                await asyncio.sleep(delay)
+
+    async def _aiter_stream_content(self, response: httpx.Response) -> AsyncGenerator[str, None]:
+        """Async version of _iter_stream_content"""
+        async for line in response.aiter_lines():
+            line = line.strip()
+            if not line or line.startswith(':') or line.startswith(('event:', 'id:', 'retry:')):
+                continue
+            if line.startswith('data:'):
+                line = line[5:].strip()
+            if not line:
+                continue
+            if line == '[DONE]':
+                return
+            try:
+                payload = json.loads(line)
+            except json.JSONDecodeError:
+                logger.debug(f"Skipping unparseable stream line: {line[:200]}")
+                continue
+            content, done = self._parse_stream_payload(payload)
+            if content:
+                note_first_byte()
+                yield content
+            if done:
+                return
+
+    async def generate_response(self, messages: List[Dict], use_cache: bool = True, **kwargs) -> str:
+        """Generate a complete response without blocking the event loop"""
+        kwargs['max_tokens'] = self.budget_max_tokens(messages, kwargs.get('max_tokens'))
+        cache_key = self._cache_key_for(messages, use_cache, **kwargs)
+        if cache_key:
+            cached = await _off_loop(LLMResponseCache.get)(cache_key, self.config.cache_ttl)
+            if cached is not None:
+                return cached
+
+        if self.provider.provider_type == 'ollama':
+            # Ollama answers with NDJSON when streaming, so always read it as a stream
+            # The stream is already cleaned as it arrives
+            content = "".join([chunk async for chunk in self.stream_response(messages, use_cache=False, **kwargs)])
+        else:
+            await self._acheck_circuit()
+            await self._aacquire_rate_limit()
+            start_time = time.time()
+            call = begin_call()
+            try:
+                url = self._get_endpoint_url()
+                headers = self._get_headers()
+                data = self._build_request_data(messages, stream=False, **kwargs)
+                async with self._get_resources().semaphore:
+                    response = await self._arequest_with_retry(url, headers, data)
+                content = self._sanitize_output(self._extract_content(response))
+                await _off_loop(self.circuit_breaker.record_success)(time.time() - start_time)
+                TelemetryRecorder.record(
+                    self, 'generate', call, 'success',
+                    prompt_tokens=estimate_messages_tokens(messages),
+                    completion_tokens=estimate_tokens(content)
+                )
+            except asyncio.CancelledError:
+                TelemetryRecorder.record(self, 'generate', call, 'cancelled',
+                                         prompt_tokens=estimate_messages_tokens(messages))
+                raise
+            except LLMServiceError as e:
+                TelemetryRecorder.record(self, 'generate', call, 'error',
+                                         prompt_tokens=estimate_messages_tokens(messages), error_code=e.code)
+                await _off_loop(self.circuit_breaker.record_failure)(str(e))
+                raise
+            except Exception as e:
+                TelemetryRecorder.record(self, 'generate', call, 'error',
+                                         prompt_tokens=estimate_messages_tokens(messages),
+                                         error_code=type(e).__name__)
+                await _off_loop(self.circuit_breaker.record_failure)(str(e))
+                logger.error(f"Async generation failed: {str(e)}")
+                raise LLMServiceError(
+                    "Generation failed",
+                    code="GENERATION_FAILURE",
+                    details={"error": str(e)}
+                ) from e
+
+        if cache_key:
+            await _off_loop(LLMResponseCache.set)(cache_key, content, self.config.cache_ttl)
+        return content
+
+    async def stream_response(self, messages: List[Dict], use_cache: bool = True, **kwargs) -> AsyncGenerator[str, None]:
+        """Stream response text as an async generator"""
+        kwargs['max_tokens'] = self.budget_max_tokens(messages, kwargs.get('max_tokens'))
+        cache_key = self._cache_key_for(messages, use_cache, **kwargs)
+        if cache_key:
+            cached = await _off_loop(LLMResponseCache.get)(cache_key, self.config.cache_ttl)
+            if cached is not None:
+                yield cached
+                return
+
+        await self._acheck_circuit()
+        await self._aacquire_rate_limit()
+        start_time = time.time()
+        first_chunk_latency = None
+        url = self._get_endpoint_url(stream=True)
+        headers = self._get_headers()
+        data = self._build_request_data(messages, stream=True, **kwargs)
+        self._log_request(url, headers, data)
+        resources = self._get_resources()
+        chunks = []
+        sanitizer = self._output_sanitizer()
+        output = []
+        call = begin_call()
+
+        try:
+            async with resources.semaphore:
+                async with resources.client.stream('POST', url, headers=headers, json=data) as response:
+                    if response.status_code >= 400:
+                        body = (await response.aread()).decode('utf-8', errors='replace')[:500]
+                        raise LLMServiceError(
+                            "LLM streaming request failed",
+                            code="NETWORK_ERROR",
+                            details={
+                                "provider": self.provider.provider_type,
+                                "url": url,
+                                "status": response.status_code,
+                                "response": body,
+                            }
+                        )
+                    async for chunk in self._aiter_stream_content(response):
+                        if first_chunk_latency is None:
+                            first_chunk_latency = time.time() - start_time
+                        chunks.append(chunk)
+                        clean = sanitizer.feed(chunk)
+                        if clean:
+                            output.append(clean)
+                            yield clean
+                    clean = sanitizer.finish()
+                    if clean:
+                        output.append(clean)
+                        yield clean
+        except (asyncio.CancelledError, GeneratorExit):
+            TelemetryRecorder.record(
+                self, 'stream', call, 'cancelled',
+                prompt_tokens=estimate_messages_tokens(messages),
+                completion_tokens=estimate_tokens("".join(chunks))
+            )
+            raise
+        except LLMServiceError as e:
+            TelemetryRecorder.record(
+                self, 'stream', call, 'error',
+                prompt_tokens=estimate_messages_tokens(messages),
+                completion_tokens=estimate_tokens("".join(chunks)),
+                error_code=e.code
+            )
+            await _off_loop(self.circuit_breaker.record_failure)(str(e))
+            raise
+        except Exception as e:
+            TelemetryRecorder.record(
+                self, 'stream', call, 'error',
+                prompt_tokens=estimate_messages_tokens(messages),
+                completion_tokens=estimate_tokens("".join(chunks)),
+                error_code=type(e).__name__
+            )
+            await _off_loop(self.circuit_breaker.record_failure)(str(e))
+            logger.error(f"Async streaming error: {str(e)}")
+            raise LLMServiceError(
+                "Streaming failed",
+                code="STREAM_FAILURE",
+                details={"error": str(e)}
+            ) from e
+
+        await _off_loop(self.circuit_breaker.record_success)(
+            first_chunk_latency if first_chunk_latency is not None else time.time() - start_time
+        )
+        TelemetryRecorder.record(
+            self, 'stream', call, 'success',
+            prompt_tokens=estimate_messages_tokens(messages),
+            completion_tokens=estimate_tokens("".join(chunks))
+        )
+        if cache_key:
+            await _off_loop(LLMResponseCache.set)(cache_key, "".join(output), self.config.cache_ttl)
+
+
+class AsyncLLMManager(LLMManager):
+    """Asyncio counterpart of LLMManager"""
+
+    def __init__(self, llm_service: AsyncLLMService):
+        # LLMManager.__init__ would build a sync service, so it is not called
+        self.llm_service = llm_service
+        self.prompt_service = PromptService()
+        # Hedging races worker threads over the sync service; async calls only fail over
+        self.hedge = False
+
+    @classmethod
+    async def create(cls, provider: Optional[LLMProvider] = None, model: Optional[LLMModel] = None) -> 'AsyncLLMManager':
+        return cls(await AsyncLLMService.create(provider=provider, model=model))
+
+    @classmethod
+    def generate_all_sync(cls, requests: List[Tuple[List[Dict], Dict]], provider: Optional[LLMProvider] = None,
+                          model: Optional[LLMModel] = None, max_concurrency: Optional[int] = None) -> List[str]:
+        """Blocking bridge for sync callers: run (messages, kwargs) requests concurrently, results in order"""
+        return async_to_sync(cls._generate_all)(requests, provider, model, max_concurrency)
+
+    @classmethod
+    async def _generate_all(cls, requests: List[Tuple[List[Dict], Dict]], provider: Optional[LLMProvider],
+                            model: Optional[LLMModel], max_concurrency: Optional[int]) -> List[str]:
+        # async_to_sync may run this on a loop shared with other requests, so use private clients
+        async with AsyncLLMService.scoped_clients():
+            manager = await cls.create(provider=provider, model=model)
+            limit = asyncio.Semaphore(max_concurrency or len(requests) or 1)
+
+            async def generate(messages: List[Dict], kwargs: Dict) -> str:
+                async with limit:
+                    return await manager.generate_response(messages, **kwargs)
+
+            tasks = [asyncio.ensure_future(generate(messages, kwargs)) for messages, kwargs in requests]
+            try:
+                return list(await asyncio.gather(*tasks))
+            except BaseException:
+                # One request failed; don't leave the others running against closed clients
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+
+    async def _candidate_services(self) -> AsyncGenerator[AsyncLLMService, None]:
+        """The primary service, then one per other active provider in failover order"""
+        yield self.llm_service
+        if not getattr(settings, 'LLM_FAILOVER_ENABLED', True):
+            return
+        # Rebuilding the configuration snapshot hits the ORM, which is sync-only
+        targets = await sync_to_async(
+            lambda: get_config_snapshot().failover_targets(self.llm_service.provider.pk)
+        )()
+        for provider, model in targets:
+            yield self.llm_service.with_target(provider, model)
+
+    async def generate_response(self, messages: List[Dict], **kwargs) -> str:
+        """Generate a response, failing over to other active providers on errors"""
+        last_error = None
+        async for service in self._candidate_services():
+            try:
+                return await service.generate_response(messages, **kwargs)
+            except (LLMServiceError, RateLimitExceeded) as e:
+                last_error = e
+                logger.warning(f"Provider {service.provider.name} failed ({getattr(e, 'code', 'RATE_LIMITED')}), trying next provider")
+        raise last_error
+
+    async def stream_response(self, messages: List[Dict], **kwargs) -> AsyncGenerator[str, None]:
+        """Stream a response, failing over to other providers until the first chunk is sent"""
+        last_error = None
+        async for service in self._candidate_services():
+            started = False
+            try:
+                async for chunk in service.stream_response(messages, **kwargs):
+                    started = True
+                    yield chunk
+                return
+            except (LLMServiceError, RateLimitExceeded) as e:
+                if started:
+                    raise
+                last_error = e
+                logger.warning(f"Provider {service.provider.name} failed ({getattr(e, 'code', 'RATE_LIMITED')}), trying next provider")
+        raise last_error
+
+    async def _build_messages(self, prompt_name: str, user_input: str, language: Optional[str], variables: Dict) -> Tuple[List[Dict], str]:
+        if language is None:
+            language = self.prompt_service.detect_language(user_input)
+        # Prompt lookup hits the ORM, which is sync-only
+        system_prompt = await sync_to_async(self._get_system_prompt)(prompt_name, language, variables)
+        return [
+            {'role': 'system', 'content': system_prompt},
+            {'role': 'user', 'content': user_input}
+        ], language
+
+    async def generate_with_prompt(self, prompt_name: str, user_input: str, language: Optional[str] = None, **variables) -> str:
+        """Generate response using a named prompt template"""
+        messages, language = await self._build_messages(prompt_name, user_input, language, variables)
+        try:
+            return await self.generate_response(messages)
+        except LLMServiceError as e:
+            logger.error(f"Async generation with prompt failed: {prompt_name} - {str(e)}")
+            raise LLMServiceError(
+                f"Text generation using prompt '{prompt_name}' failed",
+                code="PROMPT_GENERATION_FAILURE",
+                details={
+                    "prompt_name": prompt_name,
+                    "language": language,
+                    "original_code": e.code,
+                    **e.details
+                }
+            )
+
+    async def stream_with_prompt(self, prompt_name: str, user_input: str, language: Optional[str] = None, **variables) -> AsyncGenerator[str, None]:
+        """Stream response using a named prompt template"""
+        messages, language = await self._build_messages(prompt_name, user_input, language, variables)
+        try:
+            async for chunk in self.stream_response(messages):
+                yield chunk
+        except LLMServiceError as e:
+            logger.error(f"Async streaming with prompt failed: {prompt_name} - {str(e)}")
+            raise LLMServiceError(
+                f"Stream generation using prompt '{prompt_name}' failed",
+                code="PROMPT_STREAM_FAILURE",
+                details={
+                    "prompt_name": prompt_name,
+                    "language": language,
+                    "original_code": e.code,
+                    **e.details
+                }
+            )
+
@@ -0,0 +1,88 @@
+import logging
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Per-provider circuit breaker whose state lives in the shared cache.
+
+    closed    -> requests flow; consecutive failures (or calls slower than the
+                 latency threshold) are counted
+    open      -> requests are rejected until the cool-down expires
+    half-open -> after the cool-down a single probe request is let through;
+                 success closes the circuit, failure re-opens it
+    """
+
+    KEY_PREFIX = 'llm_circuit'
+
+    def __init__(self, scope: str, failure_threshold: Optional[int] = None,
+                 latency_threshold: Optional[float] = None, cooldown: Optional[float] = None):
+        self.scope = scope
+        self.failure_threshold = failure_threshold or getattr(settings, 'LLM_CIRCUIT_FAILURE_THRESHOLD', 3)
+        self.latency_threshold = (
+            latency_threshold if latency_threshold is not None
+            else getattr(settings, 'LLM_CIRCUIT_LATENCY_THRESHOLD', None)
+        )
+        self.cooldown = cooldown or getattr(settings, 'LLM_CIRCUIT_COOLDOWN', 30)
+
+    @classmethod
+    def for_provider(cls, provider) -> 'CircuitBreaker':
+        return cls(scope=str(provider.pk))
+
+    def _key(self, name: str) -> str:
+        return f"{self.KEY_PREFIX}:{self.scope}:{name}"
+
+    @property
+    def state(self) -> str:
+        open_until = cache.get(self._key('open_until'))
+        if open_until is None:
+            return 'closed'
+        return 'open' if time.time() < open_until else 'half_open'
+
+    def allow_request(self) -> bool:
+        """Whether a request may be sent to the provider right now"""
+        try:
+            open_until = cache.get(self._key('open_until'))
+            if open_until is None:
+                return True
+            if time.time() < open_until:
+                return False
+            # Half-open: only one worker gets to probe per cool-down period
+            return cache.add(self._key('probe'), 1, self.cooldown)
+        except Exception as e:
+            logger.warning(f"Circuit breaker unavailable for {self.scope}: {str(e)}")
+            return True
+
+    def record_success(self, latency: Optional[float] = None):
+        """Record a completed call; slow calls count as failures"""
+        if self.latency_threshold and latency is not None and latency > self.latency_threshold:
+            self.record_failure(reason=f"latency {latency:.2f}s above {self.latency_threshold}s")
+            return
+        try:
+            cache.delete_many([self._key('failures'), self._key('open_until'), self._key('probe')])
+        except Exception as e:
+            logger.warning(f"Circuit breaker unavailable for {self.scope}: {str(e)}")
+
+    def record_failure(self, reason: str = ''):
+        """Record a failed call, opening the circuit once the threshold is reached"""
+        try:
+            half_open = cache.get(self._key('open_until')) is not None
+            cache.add(self._key('failures'), 0, self.cooldown * 10)
+            failures = cache.incr(self._key('failures'))
+            if half_open or failures >= self.failure_threshold:
+                cache.set(self._key('open_until'), time.time() + self.cooldown, None)
+                cache.delete_many([self._key('failures'), self._key('probe')])
+                logger.warning(
+                    f"Circuit opened for provider {self.scope} for {self.cooldown}s"
+                    f"{': ' + reason if reason else ''}"
+                )
+        except Exception as e:
+            logger.warning(f"Circuit breaker unavailable for {self.scope}: {str(e)}")
+
+    def reset(self):
+        cache.delete_many([self._key('failures'), self._key('open_until'), self._key('probe')])
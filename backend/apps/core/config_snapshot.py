@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import LLMConfiguration, LLMModel, LLMProvider
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'llm_config:version'
+
+
+class LLMConfigSnapshot:
+    """Read-only view of the LLM configuration and the active providers/models.
+
+    The instances it holds are shared between requests and threads and must
+    not be modified.
+    """
+
+    def __init__(self, version: Optional[int]):
+        self.version = version
+        self.config, _ = LLMConfiguration.objects.select_related(
+            'default_provider', 'default_model'
+        ).get_or_create(pk=1)
+        self.providers: List[LLMProvider] = list(
+            LLMProvider.objects.filter(is_active=True).order_by(
+                'priority', '-is_default', 'name'
+            ).prefetch_related(
+                Prefetch(
+                    'models',
+                    queryset=LLMModel.objects.filter(is_active=True).order_by('-is_default', 'display_name'),
+                    to_attr='active_models'
+                )
+            )
+        )
+        self.providers_by_id: Dict[int, LLMProvider] = {provider.pk: provider for provider in self.providers}
+
+    def failover_targets(self, exclude_provider_id: Optional[int] = None) -> List[Tuple[LLMProvider, LLMModel]]:
+        """(provider, model) pairs to fail over to, in priority order"""
+        return [
+            (provider, provider.active_models[0])
+            for provider in self.providers
+            if provider.pk != exclude_provider_id and provider.active_models
+        ]
+
+    def active_target(self) -> Tuple[Optional[LLMProvider], Optional[LLMModel]]:
+        """The default active provider (or any active one) and its default active model"""
+        providers = sorted(self.providers, key=lambda provider: not provider.is_default)
+        if not providers:
+            return None, None
+        provider = providers[0]
+        return provider, provider.active_models[0] if provider.active_models else None
+
+
+# Re-entrant: building a snapshot may create the configuration row, whose
+# post_save hook invalidates from the same thread when not in a transaction
+_lock = threading.RLock()
+_snapshot: Optional[LLMConfigSnapshot] = None
+_checked_at = 0.0
+
+
+def _current_version() -> Optional[int]:
+    try:
+        cache.add(VERSION_KEY, 1, None)
+        return cache.get(VERSION_KEY)
+    except Exception as e:
+        logger.warning(f"LLM config version unavailable: {str(e)}")
+        return None
+
+
+def get_config_snapshot() -> LLMConfigSnapshot:
+    """Current snapshot, rebuilt only when another process or a local save changed the configuration.
+
+    The shared version key is consulted at most every LLM_CONFIG_SNAPSHOT_CHECK_INTERVAL
+    seconds, so steady-state requests do no database queries at all.
+    """
+    global _snapshot, _checked_at
+    snapshot = _snapshot
+    now = time.monotonic()
+    if snapshot is not None and now - _checked_at < getattr(settings, 'LLM_CONFIG_SNAPSHOT_CHECK_INTERVAL', 1.0):
+        return snapshot
+
+    version = _current_version()
+    with _lock:
+        snapshot = _snapshot
+        # Without a shared version (cache down) fall back to reloading on every check
+        if snapshot is None or version is None or snapshot.version != version:
+            snapshot = _snapshot = LLMConfigSnapshot(version)
+        _checked_at = now
+    return snapshot
+
+
+def invalidate_config_snapshot():
+    """Make every process reload its snapshot"""
+    global _snapshot
+    try:
+        cache.add(VERSION_KEY, 0, None)
+        cache.incr(VERSION_KEY)
+    except Exception as e:
+        logger.warning(f"Could not bump LLM config version: {str(e)}")
+    with _lock:
+        _snapshot = None
+
+
+@receiver([post_save, post_delete], sender=LLMConfiguration)
+@receiver([post_save, post_delete], sender=LLMProvider)
+@receiver([post_save, post_delete], sender=LLMModel)
+def bump_config_version(sender, instance, **kwargs):
+    """Invalidate snapshots once the change is visible to other workers"""
+    transaction.on_commit(invalidate_config_snapshot)
@@ -0,0 +1,280 @@
+"""
+Fake LLM Provider
+
+A self-contained stand-in for Ollama (/api/chat, NDJSON) and
+OpenAI-compatible servers (/v1/chat/completions, SSE) with configurable
+speed and failure behaviour, for load testing without a GPU or network.
+Point an LLMProvider's base_url at it.
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WORDS = (
+    'analysis results method data model study research approach significant evidence '
+    'framework theory sample effect literature performance system design process factor '
+    'however therefore furthermore moreover consequently in addition the of and to a in is that'
+).split()
+
+# Ollama unloads idle models after five minutes unless keep_alive says otherwise
+DEFAULT_KEEP_ALIVE = 300.0
+
+SECTIONS = ['Abstract', 'Introduction', 'Literature Review', 'Methodology', 'Results', 'Discussion', 'Conclusion']
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    """HTTP server holding the simulation settings and request counters"""
+
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, tokens_per_second: float = 50.0, ttft: float = 0.3, jitter: float = 0.2,
+                 response_tokens: int = 300, error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 retry_after: int = 1, stall_rate: float = 0.0, stall_seconds: float = 30.0,
+                 disconnect_rate: float = 0.0, output_format: str = 'html', think: bool = False,
+                 load_seconds: float = 0.0, seed: Optional[int] = None):
+        super().__init__(address, FakeLLMHandler)
+        self.tokens_per_second = tokens_per_second
+        self.ttft = ttft
+        self.jitter = jitter
+        self.response_tokens = response_tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.disconnect_rate = disconnect_rate
+        self.output_format = output_format
+        self.think = think
+        self.load_seconds = load_seconds
+        self._resident_until: Dict[str, float] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'completed': 0, 'errors': 0, 'rate_limited': 0,
+                      'stalled': 0, 'disconnected': 0, 'cold_loads': 0, 'tokens': 0}
+
+    def chance(self, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < rate
+
+    def jittered(self, value: float) -> float:
+        with self._lock:
+            return max(value * (1 + self._random.uniform(-self.jitter, self.jitter)), 0.0)
+
+    def count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def load(self, model: str, keep_alive: Any = None) -> float:
+        """Simulate loading the model unless it is still resident; returns the seconds spent"""
+        if isinstance(keep_alive, str):
+            units = {'s': 1, 'm': 60, 'h': 3600}
+            keep_alive = float(keep_alive[:-1]) * units[keep_alive[-1]] if keep_alive[-1] in units else float(keep_alive)
+        keep_alive = DEFAULT_KEEP_ALIVE if keep_alive is None else float(keep_alive)
+        with self._lock:
+            now = time.monotonic()
+            cold = self.load_seconds > 0 and self._resident_until.get(model, 0) < now
+            load_time = self.load_seconds if cold else 0.0
+            # A negative keep_alive keeps the model loaded forever
+            self._resident_until[model] = float('inf') if keep_alive < 0 else now + load_time + keep_alive
+            if cold:
+                self.stats['cold_loads'] += 1
+        time.sleep(load_time)
+        return load_time
+
+    def tokens_for(self, data: Dict[str, Any]) -> List[str]:
+        """The response, split into the pieces streamed as tokens"""
+        limit = data.get('max_tokens') or data.get('options', {}).get('num_predict') or self.response_tokens
+        count = max(min(self.response_tokens, int(limit)), 1)
+        with self._lock:
+            words = [self._random.choice(WORDS) for _ in range(count)]
+
+        tokens = []
+        if self.think:
+            tokens += ['<think>', 'Planning', ' the', ' answer', '.', '</think>', '\n']
+        if self.output_format == 'html':
+            tokens += ['<!DOCTYPE html>', '\n<html>', '<body>', '\n<h1>', 'Generated', ' Paper', '</h1>']
+            per_section = max(len(words) // len(SECTIONS), 1)
+            for index, section in enumerate(SECTIONS):
+                body = words[index * per_section:(index + 1) * per_section]
+                if not body:
+                    break
+                tokens += [f'\n<h2>{section}</h2>', '\n<p>'] + [f' {word}' for word in body] + ['.</p>']
+            tokens += ['\n</body>', '</html>']
+        else:
+            tokens += [f' {word}' for word in words]
+        return tokens
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: FakeLLMServer
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.startswith('/api/tags'):
+            self._send_json(200, {'models': [{'name': 'fake-model', 'model': 'fake-model', 'size': 0}]})
+        elif self.path.startswith('/v1/models'):
+            self._send_json(200, {'object': 'list', 'data': [{'id': 'fake-model', 'object': 'model'}]})
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            data = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_json(400, {'error': 'invalid JSON body'})
+            return
+
+        if self.path.startswith('/api/chat'):
+            protocol = 'ollama'
+        elif self.path.startswith('/v1/chat/completions') or self.path.startswith('/chat/completions'):
+            protocol = 'openai'
+        else:
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        server = self.server
+        server.count('requests')
+        if server.chance(server.rate_limit_rate):
+            server.count('rate_limited')
+            self._send_json(429, {'error': {'message': 'Rate limit exceeded', 'type': 'rate_limit_error'}},
+                            {'Retry-After': str(server.retry_after)})
+            return
+        if server.chance(server.error_rate):
+            server.count('errors')
+            self._send_json(500, {'error': {'message': 'Simulated server error', 'type': 'server_error'}})
+            return
+
+        # Ollama streams unless told otherwise, OpenAI only when asked
+        stream = data.get('stream', protocol == 'ollama')
+        model = data.get('model') or 'fake-model'
+        load_time = server.load(model, data.get('keep_alive'))
+        if protocol == 'ollama' and not data.get('messages'):
+            # Ollama treats a chat without messages as a request to load the model
+            self._send_json(200, {**self._ollama_message(model, '', True, load_time=load_time), 'done_reason': 'load'})
+            return
+        prompt_tokens = sum(len(str(message.get('content', '')).split()) for message in data.get('messages', []))
+        tokens = server.tokens_for(data)
+
+        if not stream:
+            time.sleep(server.jittered(server.ttft) + len(tokens) / server.tokens_per_second)
+            content = ''.join(tokens)
+            server.count('completed')
+            server.count('tokens', len(tokens))
+            if protocol == 'ollama':
+                self._send_json(200, self._ollama_message(model, content, True, prompt_tokens, len(tokens), load_time))
+            else:
+                self._send_json(200, {
+                    'id': f'chatcmpl-{uuid.uuid4().hex[:12]}',
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': model,
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content},
+                                 'finish_reason': 'stop'}],
+                    'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(tokens),
+                              'total_tokens': prompt_tokens + len(tokens)},
+                })
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson' if protocol == 'ollama' else 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for payload in self._stream(protocol, model, tokens, prompt_tokens, load_time):
+                self._write_chunk(payload)
+            self.wfile.write(b'0\r\n\r\n')
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away (e.g. cancelled a hedged request)
+            return
+
+    def _ollama_message(self, model: str, content: str, done: bool, prompt_tokens: int = 0,
+                        eval_count: int = 0, load_time: float = 0.0) -> Dict[str, Any]:
+        message = {
+            'model': model,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'message': {'role': 'assistant', 'content': content},
+            'done': done,
+        }
+        if done:
+            message.update({'done_reason': 'stop', 'prompt_eval_count': prompt_tokens, 'eval_count': eval_count,
+                            'load_duration': int(load_time * 1_000_000_000)})
+        return message
+
+    def _openai_chunk(self, model: str, completion_id: str, delta: Dict[str, Any],
+                      finish_reason: Optional[str] = None) -> bytes:
+        payload = {
+            'id': completion_id,
+            'object': 'chat.completion.chunk',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+        }
+        return b'data: ' + json.dumps(payload).encode() + b'\n\n'
+
+    def _stream(self, protocol: str, model: str, tokens: List[str], prompt_tokens: int,
+                load_time: float = 0.0) -> Iterator[bytes]:
+        """Encoded stream events, paced to the configured time to first token and token rate"""
+        server = self.server
+        completion_id = f'chatcmpl-{uuid.uuid4().hex[:12]}'
+        stall_at = len(tokens) // 2 if server.chance(server.stall_rate) else None
+        disconnect_at = len(tokens) // 3 if server.chance(server.disconnect_rate) else None
+
+        if protocol == 'openai':
+            yield self._openai_chunk(model, completion_id, {'role': 'assistant', 'content': ''})
+        started = time.monotonic() + server.jittered(server.ttft)
+        interval = 1.0 / server.tokens_per_second
+        for index, token in enumerate(tokens):
+            if index == stall_at:
+                server.count('stalled')
+                time.sleep(server.stall_seconds)
+                started += server.stall_seconds
+            if index == disconnect_at:
+                server.count('disconnected')
+                self.close_connection = True
+                raise ConnectionResetError('simulated disconnect')
+            # Pace against the schedule rather than per token so sleeps don't drift
+            delay = started + index * interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            if protocol == 'ollama':
+                yield json.dumps(self._ollama_message(model, token, False)).encode() + b'\n'
+            else:
+                yield self._openai_chunk(model, completion_id, {'content': token})
+
+        server.count('completed')
+        server.count('tokens', len(tokens))
+        if protocol == 'ollama':
+            yield json.dumps(self._ollama_message(model, '', True, prompt_tokens, len(tokens), load_time)).encode() + b'\n'
+        else:
+            yield self._openai_chunk(model, completion_id, {}, 'stop')
+            yield b'data: [DONE]\n\n'
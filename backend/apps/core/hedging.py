@@ -0,0 +1,150 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """Process-local sliding sample of recent call latencies per provider/model"""
+
+    _lock = threading.Lock()
+    _samples: Dict[Tuple[int, str, str], Deque[float]] = {}
+
+    @classmethod
+    def record(cls, provider, model, metric: str, seconds: float):
+        key = (provider.pk, model.name, metric)
+        with cls._lock:
+            samples = cls._samples.get(key)
+            if samples is None:
+                samples = cls._samples[key] = deque(maxlen=getattr(settings, 'LLM_HEDGE_WINDOW', 200))
+            samples.append(seconds)
+
+    @classmethod
+    def percentile(cls, provider, model, metric: str, pct: float, min_samples: int = 1) -> Optional[float]:
+        """pct-th percentile of the recorded samples, or None if there are too few"""
+        with cls._lock:
+            samples = sorted(cls._samples.get((provider.pk, model.name, metric), ()))
+        if len(samples) < max(min_samples, 1):
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[index]
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'LLM_HEDGE_MAX_WORKERS', 16),
+                thread_name_prefix='llm-hedge',
+            )
+        return _executor
+
+
+def hedge_delay(service) -> float:
+    """How long to wait on the primary before firing the hedge"""
+    pct = getattr(settings, 'LLM_HEDGE_PERCENTILE', 95)
+    min_samples = getattr(settings, 'LLM_HEDGE_MIN_SAMPLES', 20)
+    for metric in ('ttft', 'total'):
+        delay = LatencyTracker.percentile(service.provider, service.model, metric, pct, min_samples)
+        if delay is not None:
+            return delay
+    return getattr(settings, 'LLM_HEDGE_DEFAULT_DELAY', 5.0)
+
+
+def _run_attempt(index: int, service, messages: List[Dict], kwargs: Dict,
+                 cancel: threading.Event, events: "queue.Queue"):
+    """Stream one attempt, reporting first token / completion through the event queue"""
+    chunks = []
+    stream = service.stream_response(messages, use_cache=False, **kwargs)
+    try:
+        for chunk in stream:
+            if cancel.is_set():
+                events.put(('cancelled', index, None))
+                return
+            if not chunks:
+                events.put(('first', index, None))
+            chunks.append(chunk)
+        # Streams are cleaned by the service as they arrive
+        events.put(('done', index, "".join(chunks)))
+    except Exception as e:
+        events.put(('cancelled' if cancel.is_set() else 'error', index, e))
+    finally:
+        stream.close()
+
+
+def hedged_generate(primary, secondary, messages: List[Dict], delay: Optional[float] = None, **kwargs) -> str:
+    """Run a request on primary and, if it stalls, also on secondary; first to stream wins.
+
+    The secondary attempt is only started when the primary has produced no
+    token after ``delay`` seconds (by default the configured percentile of the
+    primary's recent time to first token), or when the primary fails outright.
+    As soon as one attempt streams its first token the other is cancelled and
+    its connection closed.
+    """
+    if delay is None:
+        delay = hedge_delay(primary)
+
+    services = [primary.with_target(primary.provider, primary.model),
+                secondary.with_target(secondary.provider, secondary.model)]
+    cancels = [threading.Event(), threading.Event()]
+    events: "queue.Queue" = queue.Queue()
+    executor = _get_executor()
+    launched = 0
+    winner = None
+    errors: Dict[int, Exception] = {}
+    hedge_at = time.monotonic() + delay
+
+    def launch():
+        nonlocal launched
+        index = launched
+        launched += 1
+        executor.submit(_run_attempt, index, services[index], messages, kwargs, cancels[index], events)
+
+    def cancel_others(keep: int):
+        for index in range(launched):
+            if index != keep and not cancels[index].is_set():
+                cancels[index].set()
+                services[index].cancel()
+
+    launch()
+    while True:
+        timeout = None
+        if launched == 1 and winner is None:
+            timeout = max(hedge_at - time.monotonic(), 0)
+        try:
+            kind, index, payload = events.get(timeout=timeout)
+        except queue.Empty:
+            logger.info(
+                f"Hedging request: {primary.provider.name} gave no token within {delay:.2f}s, "
+                f"also trying {secondary.provider.name}"
+            )
+            launch()
+            continue
+
+        if kind == 'first' and winner is None:
+            winner = index
+            cancel_others(index)
+        elif kind == 'done' and winner in (None, index):
+            cancel_others(index)
+            return payload
+        elif kind == 'error':
+            errors[index] = payload
+            if winner == index:
+                raise payload
+            if launched == 1:
+                # Primary failed before the hedge fired, don't wait for the timer
+                launch()
+            elif len(errors) == launched:
+                raise errors[0]
@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import LLMProvider
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderHTTPAdapter(HTTPAdapter):
+    """HTTP adapter that applies the provider timeout when a call doesn't pass one"""
+
+    def __init__(self, timeout: Optional[float] = None, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+class _PooledSession:
+    """A requests.Session together with the provider state it was built from"""
+
+    def __init__(self, session: requests.Session, fingerprint: Tuple, keep_alive: int):
+        self.session = session
+        self.fingerprint = fingerprint
+        self.keep_alive = keep_alive
+        self.last_used = time.monotonic()
+
+    def is_stale(self, fingerprint: Tuple) -> bool:
+        if fingerprint != self.fingerprint:
+            return True
+        return self.keep_alive > 0 and time.monotonic() - self.last_used > self.keep_alive
+
+
+class ProviderSessionPool:
+    """Process-wide registry of keep-alive HTTP sessions, one per LLMProvider"""
+
+    _lock = threading.Lock()
+    _sessions: Dict[int, _PooledSession] = {}
+
+    @staticmethod
+    def _fingerprint(provider: LLMProvider) -> Tuple:
+        """Provider attributes that require a new session when they change"""
+        return (
+            provider.base_url,
+            provider.timeout,
+            provider.pool_size,
+            provider.keep_alive,
+            provider.updated_at,
+        )
+
+    @staticmethod
+    def _build_session(provider: LLMProvider) -> requests.Session:
+        """Create a session with a connection pool sized for the provider"""
+        pool_size = max(provider.pool_size, 1)
+        adapter = ProviderHTTPAdapter(
+            timeout=provider.timeout,
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            pool_block=False,
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers['Connection'] = 'keep-alive'
+        return session
+
+    @classmethod
+    def get_session(cls, provider: LLMProvider) -> requests.Session:
+        """Return the pooled session for a provider, rebuilding it if stale"""
+        fingerprint = cls._fingerprint(provider)
+        with cls._lock:
+            pooled = cls._sessions.get(provider.pk)
+            if pooled is None or pooled.is_stale(fingerprint):
+                if pooled is not None:
+                    pooled.session.close()
+                    logger.debug(f"Rebuilding HTTP session pool for provider {provider.name}")
+                pooled = _PooledSession(cls._build_session(provider), fingerprint, provider.keep_alive)
+                cls._sessions[provider.pk] = pooled
+            pooled.last_used = time.monotonic()
+            return pooled.session
+
+    @classmethod
+    def invalidate(cls, provider_id: int):
+        """Drop the pooled session for a provider"""
+        with cls._lock:
+            pooled = cls._sessions.pop(provider_id, None)
+        if pooled is not None:
+            pooled.session.close()
+
+    @classmethod
+    def close_all(cls):
+        """Close every pooled session"""
+        with cls._lock:
+            sessions, cls._sessions = cls._sessions, {}
+        for pooled in sessions.values():
+            pooled.session.close()
+
+
+def get_provider_session(provider: LLMProvider) -> requests.Session:
+    """Shortcut for ProviderSessionPool.get_session"""
+    return ProviderSessionPool.get_session(provider)
+
+
+@receiver([post_save, post_delete], sender=LLMProvider)
+def invalidate_provider_session(sender, instance, **kwargs):
+    """Rebuild the session pool when a provider row changes"""
+    ProviderSessionPool.invalidate(instance.pk)
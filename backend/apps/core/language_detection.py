@@ -0,0 +1,132 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+from django.conf import settings
+
+# Script -> code point ranges (inclusive). 'han' and 'kana' are resolved together below.
+SCRIPT_RANGES = {
+    'latin': [(0x41, 0x5a), (0x61, 0x7a), (0xc0, 0xd6), (0xd8, 0xf6), (0xf8, 0x24f), (0x1e00, 0x1eff)],
+    'el': [(0x370, 0x3ff), (0x1f00, 0x1fff)],
+    'ru': [(0x400, 0x52f)],
+    'he': [(0x591, 0x5f4)],
+    'ar': [(0x600, 0x6ff), (0x750, 0x77f)],
+    'hi': [(0x900, 0x97f)],
+    'th': [(0xe00, 0xe7f)],
+    'ko': [(0x1100, 0x11ff), (0x3130, 0x318f), (0xac00, 0xd7a3)],
+    'kana': [(0x3040, 0x30ff), (0x31f0, 0x31ff)],
+    'han': [(0x3400, 0x4dbf), (0x4e00, 0x9fff), (0xf900, 0xfaff)],
+}
+
+# Frequent characters that differ between Simplified and Traditional Chinese (same order)
+SIMPLIFIED_ONLY = '们这个来为说时国会学发对经过还进体门问见长开关与从现实论语东电动种应书车马鸟'
+TRADITIONAL_ONLY = '們這個來為說時國會學發對經過還進體門問見長開關與從現實論語東電動種應書車馬鳥'
+
+# Share of letters a script needs before the text is attributed to it
+SCRIPT_THRESHOLD = 0.3
+# Share of kana among CJK characters above which the text is Japanese
+KANA_THRESHOLD = 0.15
+
+
+def _build_table():
+    """str.translate table mapping every classified code point to a one-character marker"""
+    scripts = list(SCRIPT_RANGES) + ['hans', 'hant']
+    # Private use area characters do not occur in extracted documents
+    markers = {script: chr(0xe000 + index) for index, script in enumerate(scripts)}
+    table = {}
+    for script, ranges in SCRIPT_RANGES.items():
+        for start, end in ranges:
+            table.update(dict.fromkeys(range(start, end + 1), markers[script]))
+    table.update(dict.fromkeys(map(ord, SIMPLIFIED_ONLY), markers['hans']))
+    table.update(dict.fromkeys(map(ord, TRADITIONAL_ONLY), markers['hant']))
+    return table, markers
+
+
+_TABLE, _MARKERS = _build_table()
+
+_cache: "OrderedDict[bytes, Dict[str, int]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _sample(text: str) -> str:
+    """Evenly spaced windows covering a large text, or the text itself"""
+    sample_size = getattr(settings, 'LANGUAGE_DETECTION_SAMPLE_SIZE', 20000)
+    if len(text) <= sample_size:
+        return text
+    windows = max(getattr(settings, 'LANGUAGE_DETECTION_SAMPLE_WINDOWS', 8), 2)
+    width = sample_size // windows
+    step = (len(text) - width) / (windows - 1)
+    return ''.join(text[int(i * step):int(i * step) + width] for i in range(windows))
+
+
+def _script_counts(sample: str) -> Dict[str, int]:
+    """Number of characters per script, memoized by content hash"""
+    key = hashlib.blake2b(sample.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+    with _cache_lock:
+        counts = _cache.get(key)
+        if counts is not None:
+            _cache.move_to_end(key)
+            return counts
+
+    translated = sample.translate(_TABLE)
+    counts = {script: translated.count(marker) for script, marker in _MARKERS.items()}
+
+    with _cache_lock:
+        _cache[key] = counts
+        while len(_cache) > getattr(settings, 'LANGUAGE_DETECTION_CACHE_SIZE', 1024):
+            _cache.popitem(last=False)
+    return counts
+
+
+def _classify(counts: Dict[str, int]) -> tuple:
+    """(language, share of letters in the language's script)"""
+    han = counts['han'] + counts['hans'] + counts['hant']
+    letters = sum(counts.values())
+    if letters == 0:
+        return 'en', 0.0
+
+    groups = {script: count for script, count in counts.items() if script not in ('latin', 'han', 'kana', 'hans', 'hant')}
+    groups['cjk'] = han + counts['kana']
+    script, count = max(groups.items(), key=lambda item: item[1])
+    share = count / letters
+    if share <= SCRIPT_THRESHOLD:
+        return 'en', counts['latin'] / letters
+    if script != 'cjk':
+        return script, share
+    if counts['kana'] / count >= KANA_THRESHOLD:
+        return 'ja', share
+    return ('zh-hant' if counts['hant'] > counts['hans'] else 'zh-hans'), share
+
+
+def detect_language_details(text: str) -> Dict[str, Any]:
+    """Language of a text with the character statistics it was decided on.
+
+    Texts longer than LANGUAGE_DETECTION_SAMPLE_SIZE are sampled; character
+    counts are then extrapolated to the whole text.
+    """
+    total_chars = len(text) - text.count(' ')
+    # Skip detection for very short text
+    if len(text) < 10:
+        return {'language': 'en', 'confidence': 0.0, 'chinese_chars': 0, 'total_chars': total_chars, 'sampled': False}
+
+    sample = _sample(text)
+    counts = _script_counts(sample)
+    language, share = _classify(counts)
+    scale = len(text) / len(sample) if sample else 1
+    return {
+        'language': language,
+        'confidence': round(min(share * 2, 1.0), 4),
+        'chinese_chars': round((counts['han'] + counts['hans'] + counts['hant']) * scale),
+        'total_chars': total_chars,
+        'sampled': sample is not text,
+    }
+
+
+def detect_language(text: str) -> str:
+    """Language code of a text: 'en' unless another script clearly dominates"""
+    return detect_language_details(text)['language']
+
+
+def detect_languages(texts: List[str]) -> List[Dict[str, Any]]:
+    return [detect_language_details(text) for text in texts]
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+def make_request_key(provider, model, messages: List[Dict], temperature: Any, max_tokens: Any) -> str:
+    """Stable content hash of everything that determines an LLM response"""
+    payload = {
+        'provider': [provider.pk, provider.provider_type],
+        'model': model.name,
+        'messages': messages,
+        'temperature': temperature,
+        'max_tokens': max_tokens,
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class LocalLRUCache:
+    """Thread-safe in-process LRU cache bounded by the total size of stored values"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _sizeof(value: str) -> int:
+        return len(value.encode('utf-8'))
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, size, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.current_bytes -= size
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: int):
+        size = self._sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (value, size, time.monotonic() + ttl)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class LLMResponseCache:
+    """Two-tier response cache: local LRU in front of the shared Django cache"""
+
+    KEY_PREFIX = 'llm_response'
+    # Counters live in the shared cache so every worker adds to the same totals
+    STATS_KEY_PREFIX = 'llm_response_stats'
+    COUNTERS = ('local_hits', 'shared_hits', 'misses', 'stores')
+
+    _local = LocalLRUCache(getattr(settings, 'LLM_CACHE_LOCAL_MAX_BYTES', 32 * 1024 * 1024))
+
+    @classmethod
+    def _stats_key(cls, name: str) -> str:
+        return f"{cls.STATS_KEY_PREFIX}:{name}"
+
+    @classmethod
+    def _count(cls, name: str):
+        try:
+            cache.add(cls._stats_key(name), 0, None)
+            cache.incr(cls._stats_key(name))
+        except Exception as e:
+            logger.warning(f"LLM response cache stats unavailable: {str(e)}")
+
+    @staticmethod
+    def is_cacheable(config, temperature: Any) -> bool:
+        """Whether a request with these settings may be served from cache"""
+        if not config.enable_caching or config.cache_ttl <= 0:
+            return False
+        max_temperature = config.cache_max_temperature
+        if max_temperature is not None and temperature is not None and temperature > max_temperature:
+            return False
+        return True
+
+    @classmethod
+    def get(cls, key: str, ttl: int) -> Optional[str]:
+        """Look a response up in the local tier, then the shared cache"""
+        value = cls._local.get(key)
+        if value is not None:
+            cls._count('local_hits')
+            return value
+        try:
+            value = cache.get(f"{cls.KEY_PREFIX}:{key}")
+        except Exception as e:
+            logger.warning(f"LLM response cache read failed: {str(e)}")
+            value = None
+        if value is not None:
+            cls._count('shared_hits')
+            cls._local.set(key, value, ttl)
+            return value
+        cls._count('misses')
+        return None
+
+    @classmethod
+    def set(cls, key: str, value: str, ttl: int):
+        """Store a response in both tiers"""
+        if not value:
+            return
+        cls._local.set(key, value, ttl)
+        try:
+            cache.set(f"{cls.KEY_PREFIX}:{key}", value, ttl)
+        except Exception as e:
+            logger.warning(f"LLM response cache write failed: {str(e)}")
+        cls._count('stores')
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        """Hit/miss counters summed over all workers, plus this process's local tier size"""
+        try:
+            counts = cache.get_many([cls._stats_key(name) for name in cls.COUNTERS])
+        except Exception as e:
+            logger.warning(f"LLM response cache stats unavailable: {str(e)}")
+            counts = {}
+        stats = {name: counts.get(cls._stats_key(name), 0) for name in cls.COUNTERS}
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['local_hits'] + stats['shared_hits']) / lookups if lookups else 0.0
+        stats['local_entries'] = len(cls._local)
+        stats['local_bytes'] = cls._local.current_bytes
+        return stats
+
+    @classmethod
+    def reset_stats(cls):
+        cache.delete_many([cls._stats_key(name) for name in cls.COUNTERS])
+
+    @classmethod
+    def clear_local(cls):
+        cls._local.clear()
@@ -1,15 +1,30 @@
 import requests
+import copy
 import json
 import logging
 import time
-import re
-from typing import Dict, List, Optional, Generator, Any
+from typing import Dict, List, Optional, Generator, Any, Tuple, Union
 from django.conf import settings
-from django.core.cache import cache
-from .models import LLMProvider, LLMModel, LLMConfiguration, PromptTemplate
+from .models import LLMProvider, LLMModel, PromptTemplate
+from .http_pool import get_provider_session
+from .llm_cache import LLMResponseCache, make_request_key
+from .rate_limiter import RateLimitExceeded, limiter_for
+from .circuit_breaker import CircuitBreaker
+from .config_snapshot import get_config_snapshot
+from .prompt_layout import anthropic_messages, anthropic_system, provider_messages
+from .prompt_registry import CompiledPrompt, get_prompt_registry
+from .language_detection import detect_language
+from .output_sanitizer import OutputSanitizer, sanitize
+from .ollama_warmup import TrafficTracker, keep_alive_for, note_ollama_load
+from .hedging import LatencyTracker, hedged_generate
+from .single_flight import SingleFlight
+from .telemetry import TelemetryRecorder, begin_call, note_first_byte, note_retry
+from .token_budget import TokenBudgetExceeded, estimate_messages_tokens, estimate_tokens, fit_max_tokens
 
 logger = logging.getLogger(__name__)
 
+ANTHROPIC_API_VERSION = '2023-06-01'
+
 
 class LLMServiceError(Exception):
     """Custom exception for LLM service failures"""
@@ -22,16 +37,85 @@ class LLMServiceError(Exception):
 class LLMService:
     """Enhanced LLM service with robust error handling for Deepseek-coder"""
     
-    def __init__(self, provider: Optional[LLMProvider] = None, model: Optional[LLMModel] = None):
-        self.config = LLMConfiguration.get_config()
+    def __init__(self, provider: Optional[LLMProvider] = None, model: Optional[LLMModel] = None,
+                 rate_limit_wait: Optional[float] = None):
+        # Cached per process, reloaded when any worker saves LLM settings
+        self.config = get_config_snapshot().config
         self.provider = provider or self.config.default_provider
         self.model = model or self.config.default_model
+        # Seconds to queue for a rate limit slot; 0 fails fast with RateLimitExceeded
+        self.rate_limit_wait = (
+            rate_limit_wait if rate_limit_wait is not None
+            else getattr(settings, 'LLM_RATE_LIMIT_MAX_WAIT', 30)
+        )
+        self._reserved_slots = 0
+        self._active_response = None
+        self._cancelled = False
         
         if not self.provider:
             raise ValueError("No LLM provider configured")
         if not self.model:
             raise ValueError("No LLM model configured")
     
+    def _acquire_rate_limit(self):
+        """Wait for a slot under LLMConfiguration.rate_limit_per_minute"""
+        if self._reserved_slots:
+            self._reserved_slots -= 1
+            return
+        limiter = limiter_for(self.provider, self.model, self.config)
+        if limiter:
+            limiter.acquire(max_wait=self.rate_limit_wait)
+    
+    def reserve_rate_limit(self):
+        """Take a rate limit slot now for the next request (e.g. before starting a stream)"""
+        self._acquire_rate_limit()
+        self._reserved_slots += 1
+    
+    @property
+    def circuit_breaker(self) -> CircuitBreaker:
+        return CircuitBreaker.for_provider(self.provider)
+    
+    def _check_circuit(self):
+        """Reject immediately while the provider's circuit is open"""
+        if not self.circuit_breaker.allow_request():
+            raise LLMServiceError(
+                f"Provider {self.provider.name} is temporarily unavailable",
+                code="CIRCUIT_OPEN",
+                details={"provider": self.provider.provider_type, "provider_id": self.provider.pk}
+            )
+    
+    def with_target(self, provider: LLMProvider, model: LLMModel) -> 'LLMService':
+        """Copy of this service pointed at another provider/model, sharing configuration"""
+        clone = copy.copy(self)
+        clone.provider = provider
+        clone.model = model
+        clone._reserved_slots = 0
+        clone._active_response = None
+        clone._cancelled = False
+        return clone
+    
+    def cancel(self):
+        """Abort this instance's in-flight streaming request; safe to call from another thread"""
+        self._cancelled = True
+        response = self._active_response
+        if response is not None:
+            response.close()
+    
+    @staticmethod
+    def _retry_delay(response: Any, attempt: int) -> float:
+        """Backoff before the next attempt, honoring Retry-After on 429 responses"""
+        if getattr(response, 'status_code', None) == 429:
+            try:
+                return min(float(response.headers.get('Retry-After')), 30.0)
+            except (TypeError, ValueError):
+                pass
+        return (2 ** attempt) + 0.1
+    
+    @property
+    def session(self) -> requests.Session:
+        """Pooled keep-alive session shared by every service using this provider"""
+        return get_provider_session(self.provider)
+    
     def _get_headers(self) -> Dict[str, str]:
         """Get headers for API requests"""
         headers = {
@@ -47,18 +131,60 @@ class LLMService:
                 headers['X-goog-api-key'] = self.provider.api_key
             elif self.provider.provider_type == 'ollama':
                 pass
+        if self.provider.provider_type == 'anthropic':
+            headers['anthropic-version'] = ANTHROPIC_API_VERSION
         return headers
     
+    def budget_max_tokens(self, messages: List[Dict], requested: Optional[int] = None) -> int:
+        """Response token limit that fits the model's context window next to the prompt"""
+        prompt_tokens = estimate_messages_tokens(messages)
+        try:
+            return fit_max_tokens(
+                prompt_tokens,
+                requested or self.config.default_max_tokens,
+                self.model.context_length,
+                self.model.max_tokens
+            )
+        except TokenBudgetExceeded as e:
+            raise LLMServiceError(
+                "Prompt is too long for the model's context window",
+                code="CONTEXT_LENGTH_EXCEEDED",
+                details={
+                    "model": self.model.name,
+                    "prompt_tokens": e.prompt_tokens,
+                    "context_length": e.context_length,
+                    "min_output_tokens": e.min_output_tokens,
+                }
+            ) from e
+    
     def _build_request_data(self, messages: List[Dict], **kwargs) -> Dict[str, Any]:
         """Build request data for LLM providers, including Gemini (Google)"""
         temperature = kwargs.get('temperature', self.config.default_temperature)
-        max_tokens = kwargs.get('max_tokens', self.config.default_max_tokens)
+        max_tokens = self.budget_max_tokens(messages, kwargs.get('max_tokens'))
         stream = kwargs.get('stream', self.config.enable_streaming)
+        if self.provider.provider_type == 'anthropic':
+            # Anthropic caches prompt prefixes only where the request marks them
+            data = {
+                'model': self.model.name,
+                'messages': anthropic_messages(messages),
+                'temperature': temperature,
+                'max_tokens': max_tokens,
+                'stream': stream,
+            }
+            system = anthropic_system(messages)
+            if system:
+                data['system'] = system
+            return data
+        # Ollama and OpenAI reuse identical prompt prefixes without hints
+        messages = provider_messages(messages)
         if self.provider.provider_type == 'ollama':
+            TrafficTracker.note_request(self.provider, self.model)
             return {
                 'model': self.model.name,
                 'messages': messages,
                 'stream': stream,
+                # Sized to recent traffic so the model stays loaded between requests
+                'keep_alive': f"{keep_alive_for(self.provider, self.model)}s",
                 'options': {
                     'temperature': temperature,
                     'num_predict': max_tokens,
@@ -88,7 +214,7 @@ class LLMService:
                 'stream': stream,
             }
     
-    def _get_endpoint_url(self) -> str:
+    def _get_endpoint_url(self, stream: bool = False) -> str:
         """Get the endpoint URL for each provider, including Gemini (Google)"""
         base_url = self.provider.base_url.rstrip('/')
         if self.provider.provider_type == 'ollama':
@@ -99,6 +225,8 @@ class LLMService:
             return f"{base_url}/v1/messages"
         elif self.provider.provider_type == 'google':
             # Gemini expects v1beta/models/{model}:generateContent
+            if stream:
+                return f"{base_url}/v1beta/models/{self.model.name}:streamGenerateContent?alt=sse"
             return f"{base_url}/v1beta/models/{self.model.name}:generateContent"
         return f"{base_url}/chat/completions"
     
@@ -155,10 +283,12 @@ class LLMService:
         self._log_request(url, headers, data)
         
         start_time = time.time()
+        response = None
         
         for attempt in range(3):
             try:
-                response = requests.post(
+                request_start = time.monotonic()
+                response = self.session.post(
                     url,
                     headers=headers,
                     json=data,
@@ -169,7 +299,9 @@ class LLMService:
                 # Check for valid response content
                 if response.text.strip() == "":
                     raise ValueError("Empty response from LLM service")
-                    
+                
+                # elapsed covers sending the request up to parsing the response headers
+                note_first_byte(request_start + response.elapsed.total_seconds())
                 return response.json()
                 
             except (requests.exceptions.RequestException, 
@@ -198,7 +330,8 @@ class LLMService:
                     ) from e
                     
                 # Exponential backoff
-                delay = (2 ** attempt) + 0.1
+                note_retry()
+                delay = self._retry_delay(response, attempt)
                 logger.warning(
                     f"Retry {attempt+1} after {delay}s: {str(e)}\n"
                     f"Duration: {duration:.2f}s"
@@ -207,6 +340,8 @@ class LLMService:
     
     def _extract_content(self, response: Any) -> str:
         """Extract and sanitize content from response"""
+        if self.provider.provider_type == 'ollama' and isinstance(response, dict):
+            note_ollama_load(response)
         # Handle Deepseek-coder's special format
         if self.provider.provider_type == 'ollama' and self.model.name.startswith('deepseek'):
             if isinstance(response, dict):
@@ -227,6 +362,12 @@ class LLMService:
                     if parts and 'text' in parts[0]:
                         return parts[0]['text']
                 return ''
+            elif self.provider.provider_type == 'anthropic' and 'content' in response:
+                # Anthropic returns a list of content blocks
+                return ''.join(
+                    block.get('text', '') for block in response['content']
+                    if block.get('type') == 'text'
+                )
             elif self.provider.provider_type in ['openai', 'anthropic']:
                 return response.get('choices', [{}])[0].get('message', {}).get('content', '')
             else:
@@ -239,20 +380,57 @@ class LLMService:
                 details={"response": str(response)[:500]}
             ) from e
     
-    def _sanitize_output(self, content: str) -> str:
-        """Clean up Deepseek-coder's special formatting"""
-        # Remove thinking tags
-        sanitized = re.sub(r'<\s*/?\s*think\s*>', '', content, flags=re.IGNORECASE)
-        
-        # Remove empty lines and trim whitespace
-        return '\n'.join(
-            line.strip() 
-            for line in sanitized.splitlines() 
-            if line.strip()
+    def _output_sanitizer(self) -> OutputSanitizer:
+        """Incremental cleaner for this model's output: drops <think> blocks"""
+        # Deepseek-coder also pads its output with blank lines and indentation
+        return OutputSanitizer(
+            compact_lines=self.provider.provider_type == 'ollama' and self.model.name.startswith('deepseek')
         )
     
-    def generate_response(self, messages: List[Dict], **kwargs) -> str:
-        """Generate a response optimized for Deepseek-coder (cache disabled)"""
+    def _sanitize_output(self, content: str) -> str:
+        """Clean a complete response with the same rules applied to streams"""
+        sanitizer = self._output_sanitizer()
+        return sanitizer.feed(content) + sanitizer.finish()
+    
+    def _read_clean_stream(self, response) -> str:
+        """Read a streamed response, cleaning chunks as they arrive so reasoning is never buffered"""
+        sanitizer = self._output_sanitizer()
+        parts = [sanitizer.feed(chunk) for chunk in self._iter_stream_content(response)]
+        parts.append(sanitizer.finish())
+        return "".join(parts)
+    
+    def _cache_key_for(self, messages: List[Dict], use_cache: bool = True, **kwargs) -> Optional[str]:
+        """Response cache key for a request, or None when it must not be cached"""
+        temperature = kwargs.get('temperature', self.config.default_temperature)
+        if not use_cache or not LLMResponseCache.is_cacheable(self.config, temperature):
+            return None
+        max_tokens = kwargs.get('max_tokens', self.config.default_max_tokens)
+        return make_request_key(self.provider, self.model, messages, temperature, max_tokens)
+    
+    def generate_response(self, messages: List[Dict], use_cache: bool = True, **kwargs) -> str:
+        """Generate a response optimized for Deepseek-coder, served from cache when possible"""
+        # Reject oversized prompts before any provider round trip
+        kwargs['max_tokens'] = self.budget_max_tokens(messages, kwargs.get('max_tokens'))
+        cache_key = self._cache_key_for(messages, use_cache, **kwargs)
+        if cache_key:
+            cached = LLMResponseCache.get(cache_key, self.config.cache_ttl)
+            if cached is not None:
+                logger.debug(f"LLM response cache hit: {cache_key[:12]}")
+                return cached
+        if use_cache and getattr(settings, 'LLM_SINGLE_FLIGHT_ENABLED', True):
+            # Identical concurrent requests (double clicks, client retries) share one generation
+            temperature = kwargs.get('temperature', self.config.default_temperature)
+            max_tokens = kwargs.get('max_tokens', self.config.default_max_tokens)
+            flight_key = make_request_key(self.provider, self.model, messages, temperature, max_tokens)
+            return SingleFlight.do(flight_key, lambda: self._generate_uncached(messages, cache_key, **kwargs))
+        return self._generate_uncached(messages, cache_key, **kwargs)
+    
+    def _generate_uncached(self, messages: List[Dict], cache_key: Optional[str], **kwargs) -> str:
+        """Call the provider and store the result under cache_key when given"""
+        self._check_circuit()
+        self._acquire_rate_limit()
+        start_time = time.time()
+        call = begin_call()
         try:
             url = self._get_endpoint_url()
             headers = self._get_headers()
@@ -260,9 +438,16 @@ class LLMService:
             # For Ollama streaming, use the streaming handler
             if self.provider.provider_type == 'ollama' and self.model.name.startswith('deepseek'):
                 content = self._generate_deepseek_response(url, headers, data)
+            elif self.provider.provider_type == 'ollama' and data.get('stream'):
+                # Ollama streams NDJSON when streaming is enabled
+                response = self._open_stream(url, headers, data)
+                try:
+                    content = self._read_clean_stream(response)
+                finally:
+                    response.close()
             elif self.provider.provider_type == 'ollama':
                 # For non-streaming Ollama, parse only the first line as JSON
-                response = requests.post(
+                response = self.session.post(
                     url,
                     headers=headers,
                     json=data,
@@ -271,12 +456,28 @@ class LLMService:
                 response.raise_for_status()
                 first_line = response.text.splitlines()[0]
                 response_json = json.loads(first_line)
-                content = self._extract_content(response_json)
+                content = self._sanitize_output(self._extract_content(response_json))
             else:
                 response = self._request_with_retry(url, headers, data)
-                content = self._extract_content(response)
+                content = self._sanitize_output(self._extract_content(response))
+            latency = time.time() - start_time
+            self.circuit_breaker.record_success(latency)
+            LatencyTracker.record(self.provider, self.model, 'total', latency)
+            TelemetryRecorder.record(
+                self, 'generate', call, 'success',
+                prompt_tokens=estimate_messages_tokens(messages),
+                completion_tokens=estimate_tokens(content)
+            )
+            if cache_key:
+                LLMResponseCache.set(cache_key, content, self.config.cache_ttl)
             return content
         except Exception as e:
+            TelemetryRecorder.record(
+                self, 'generate', call, 'error',
+                prompt_tokens=estimate_messages_tokens(messages),
+                error_code=getattr(e, 'code', type(e).__name__)
+            )
+            self.circuit_breaker.record_failure(str(e))
             logger.error(f"Generation failed: {str(e)}")
             if isinstance(e, LLMServiceError):
                 raise e
@@ -289,33 +490,11 @@ class LLMService:
     def _generate_deepseek_response(self, url: str, headers: Dict, data: Dict) -> str:
         """Special handling for Deepseek-coder's sequential token format"""
         try:
-            response = requests.post(
-                url,
-                headers=headers,
-                json=data,
-                timeout=self.provider.timeout,
-                stream=True
-            )
-            response.raise_for_status()
-            
-            content_parts = []
-            for line in response.iter_lines():
-                if line:
-                    decoded = line.decode('utf-8')
-                    if decoded.startswith('data: '):
-                        decoded = decoded[6:]
-                    
-                    if decoded.strip() and decoded.strip() != '[DONE]':
-                        try:
-                            chunk = json.loads(decoded)
-                            if not chunk.get('done'):
-                                content = chunk.get('message', {}).get('content', '')
-                                if content:
-                                    content_parts.append(content)
-                        except json.JSONDecodeError:
-                            continue
-            
-            return self._sanitize_output("".join(content_parts))
+            response = self._open_stream(url, headers, data)
+            try:
+                return self._read_clean_stream(response)
+            finally:
+                response.close()
             
         except requests.exceptions.RequestException as e:
             raise LLMServiceError(
@@ -324,21 +503,209 @@ class LLMService:
                 details={"error": str(e)}
             ) from e
     
-    def stream_response(self, messages: List[Dict], **kwargs) -> Generator[str, None, None]:
-        """Streaming supported for providers except Deepseek-coder/Ollama"""
-        # Only block streaming for Deepseek/Ollama
-        if self.provider.provider_type == 'ollama' and self.model.name.startswith('deepseek'):
+    def _open_stream(self, url: str, headers: Dict, data: Dict) -> requests.Response:
+        """Open a streaming response, retrying only until the connection is established"""
+        self._log_request(url, headers, data)
+        
+        start_time = time.time()
+        
+        for attempt in range(3):
+            try:
+                response = self.session.post(
+                    url,
+                    headers=headers,
+                    json=data,
+                    timeout=self.provider.timeout,
+                    stream=True
+                )
+                if response.status_code >= 400:
+                    # Error bodies are small, read them for diagnostics
+                    body = response.text[:500]
+                    response.close()
+                    raise requests.exceptions.HTTPError(
+                        f"{response.status_code} Error: {body}", response=response
+                    )
+                return response
+            except requests.exceptions.RequestException as e:
+                duration = time.time() - start_time
+                if attempt == 2:
+                    error_details = {
+                        "provider": self.provider.provider_type,
+                        "url": url,
+                        "status": getattr(e.response, 'status_code', None),
+                        "error": str(e),
+                        "attempts": attempt + 1,
+                        "duration": f"{duration:.2f}s"
+                    }
+                    logger.error(
+                        "LLM stream request failed:\n" +
+                        "\n".join([f"{k}: {v}" for k, v in error_details.items()])
+                    )
+                    raise LLMServiceError(
+                        "LLM streaming request failed",
+                        code="NETWORK_ERROR",
+                        details=error_details
+                    ) from e
+                
+                note_retry()
+                delay = self._retry_delay(e.response, attempt)
+                logger.warning(
+                    f"Stream retry {attempt+1} after {delay}s: {str(e)}\n"
+                    f"Duration: {duration:.2f}s"
+                )
+                time.sleep(delay)
+    
+    def _iter_stream_content(self, response: requests.Response) -> Generator[str, None, None]:
+        """Incrementally parse a streaming response and yield text chunks as they arrive.
+        
+        Handles Ollama NDJSON, OpenAI SSE ``data:`` frames, Anthropic event
+        streams and Gemini ``streamGenerateContent`` (SSE mode).
+        """
+        # chunk_size=None hands over each network chunk as soon as it is read
+        for raw_line in response.iter_lines(chunk_size=None):
+            if not raw_line:
+                continue
+            line = raw_line.decode('utf-8', errors='replace').strip()
+            
+            # SSE framing: only data lines carry payloads
+            if line.startswith(':') or line.startswith(('event:', 'id:', 'retry:')):
+                continue
+            if line.startswith('data:'):
+                line = line[5:].strip()
+            if not line:
+                continue
+            if line == '[DONE]':
+                return
+            
+            try:
+                payload = json.loads(line)
+            except json.JSONDecodeError:
+                logger.debug(f"Skipping unparseable stream line: {line[:200]}")
+                continue
+            
+            content, done = self._parse_stream_payload(payload)
+            if content:
+                note_first_byte()
+                yield content
+            if done:
+                return
+    
+    def _parse_stream_payload(self, payload: Dict[str, Any]) -> Tuple[str, bool]:
+        """Extract (text, done) from one decoded stream frame"""
+        if not isinstance(payload, dict):
+            return '', False
+        
+        error = payload.get('error')
+        if error:
+            message = error.get('message') if isinstance(error, dict) else str(error)
             raise LLMServiceError(
-                "Streaming not supported for Deepseek-coder/Ollama models",
-                code="DEEPSEEK_STREAM_NOT_SUPPORTED"
+                "LLM provider reported a streaming error",
+                code="STREAM_PROVIDER_ERROR",
+                details={"provider": self.provider.provider_type, "error": message}
             )
+        
+        provider_type = self.provider.provider_type
+        if provider_type == 'ollama':
+            content = payload.get('message', {}).get('content', '')
+            if payload.get('done'):
+                note_ollama_load(payload)
+            return content, bool(payload.get('done'))
+        
+        if provider_type == 'google':
+            text = ''
+            for candidate in payload.get('candidates', [])[:1]:
+                parts = candidate.get('content', {}).get('parts', [])
+                text = ''.join(part.get('text', '') for part in parts)
+            return text, False
+        
+        if provider_type == 'anthropic':
+            event_type = payload.get('type')
+            if event_type == 'content_block_delta':
+                return payload.get('delta', {}).get('text', ''), False
+            if event_type == 'message_stop':
+                return '', True
+            if event_type is not None:
+                return '', False
+        
+        # OpenAI-compatible chat completion chunks
+        choices = payload.get('choices') or [{}]
+        choice = choices[0]
+        content = choice.get('delta', {}).get('content') or ''
+        return content, False
+    
+    def stream_response(self, messages: List[Dict], use_cache: bool = True, **kwargs) -> Generator[str, None, None]:
+        """Stream response text incrementally for every provider type"""
+        kwargs['max_tokens'] = self.budget_max_tokens(messages, kwargs.get('max_tokens'))
+        cache_key = self._cache_key_for(messages, use_cache, **kwargs)
+        if cache_key:
+            cached = LLMResponseCache.get(cache_key, self.config.cache_ttl)
+            if cached is not None:
+                yield cached
+                return
+        self._check_circuit()
+        self._acquire_rate_limit()
+        start_time = time.time()
+        first_chunk_latency = None
+        call = begin_call()
+        chunks = []
+        # Reasoning is dropped as it streams in; only cleaned text reaches the caller and the cache
+        sanitizer = self._output_sanitizer()
+        output = []
         try:
-            url = self._get_endpoint_url()
+            url = self._get_endpoint_url(stream=True)
             headers = self._get_headers()
             data = self._build_request_data(messages, stream=True, **kwargs)
-            response = self._request_with_retry(url, headers, data)
-            yield from self._extract_stream_content(response)
+            response = self._open_stream(url, headers, data)
+            self._active_response = response
+            try:
+                for chunk in self._iter_stream_content(response):
+                    if first_chunk_latency is None:
+                        first_chunk_latency = time.time() - start_time
+                        LatencyTracker.record(self.provider, self.model, 'ttft', first_chunk_latency)
+                    chunks.append(chunk)
+                    clean = sanitizer.feed(chunk)
+                    if clean:
+                        output.append(clean)
+                        yield clean
+                clean = sanitizer.finish()
+                if clean:
+                    output.append(clean)
+                    yield clean
+            finally:
+                self._active_response = None
+                response.close()
+            # Streams are judged on time to first chunk, not total duration
+            self.circuit_breaker.record_success(
+                first_chunk_latency if first_chunk_latency is not None else time.time() - start_time
+            )
+            TelemetryRecorder.record(
+                self, 'stream', call, 'success',
+                prompt_tokens=estimate_messages_tokens(messages),
+                completion_tokens=estimate_tokens("".join(chunks))
+            )
+            if cache_key:
+                LLMResponseCache.set(cache_key, "".join(output), self.config.cache_ttl)
+        except GeneratorExit:
+            # The consumer stopped reading (client disconnected)
+            TelemetryRecorder.record(
+                self, 'stream', call, 'cancelled',
+                prompt_tokens=estimate_messages_tokens(messages),
+                completion_tokens=estimate_tokens("".join(chunks))
+            )
+            raise
         except Exception as e:
+            if self._cancelled:
+                # Aborted on purpose (e.g. lost a hedged race), not a provider failure
+                TelemetryRecorder.record(self, 'stream', call, 'cancelled',
+                                         prompt_tokens=estimate_messages_tokens(messages))
+                raise
+            TelemetryRecorder.record(
+                self, 'stream', call, 'error',
+                prompt_tokens=estimate_messages_tokens(messages),
+                completion_tokens=estimate_tokens("".join(chunks)),
+                error_code=getattr(e, 'code', type(e).__name__)
+            )
+            self.circuit_breaker.record_failure(str(e))
             logger.error(f"Streaming error: {str(e)}")
             if isinstance(e, LLMServiceError):
                 raise e
@@ -350,56 +717,20 @@ class LLMService:
 
 
 class PromptService:
-    """Enhanced prompt service with caching and more robust language detection"""
-    
-    _CACHE_TIMEOUT = 3600  # 1 hour
-    
-    @staticmethod
-    def _cache_key(name: str, language: str, prompt_type: str) -> str:
-        """Generate consistent cache key for prompts"""
-        return f"prompt_template:{name}:{language}:{prompt_type}"
+    """Enhanced prompt service backed by the in-memory prompt registry and more robust language detection"""
     
     @classmethod
-    def get_prompt_template(cls, name: str, language: str = 'en', prompt_type: str = 'system') -> Optional[PromptTemplate]:
-        """Get a prompt template (cache disabled)"""
-        try:
-            template = PromptTemplate.objects.get(
-                name=name,
-                language=language,
-                prompt_type=prompt_type,
-                is_active=True
-            )
-            return template
-        except PromptTemplate.DoesNotExist:
-            return None
+    def get_prompt_template(cls, name: str, language: str = 'en', prompt_type: str = 'system') -> Optional[CompiledPrompt]:
+        """Get an active prompt template from the registry"""
+        return get_prompt_registry().get(name, language, prompt_type)
     
     @classmethod
-    def get_default_prompt(cls, language: str = 'en', prompt_type: str = 'system') -> Optional[PromptTemplate]:
-        """Get default prompt template with caching"""
-        cache_key = f"default_prompt:{language}:{prompt_type}"
-        template = cache.get(cache_key)
-        
-        if template:
-            return template
-        
-        try:
-            template = PromptTemplate.objects.get(
-                language=language,
-                prompt_type=prompt_type,
-                is_default=True,
-                is_active=True
-            )
-            cache.set(cache_key, template, cls._CACHE_TIMEOUT)
-            return template
-        except PromptTemplate.DoesNotExist:
-            # Fallback to English default
-            if language != 'en':
-                return cls.get_default_prompt('en', prompt_type)
-            cache.set(cache_key, None, 300)  # 5 minutes
-            return None
+    def get_default_prompt(cls, language: str = 'en', prompt_type: str = 'system') -> Optional[CompiledPrompt]:
+        """Get default prompt template, falling back to the English default"""
+        return get_prompt_registry().get_default(language, prompt_type)
     
     @staticmethod
-    def render_prompt(template: PromptTemplate, **variables) -> str:
+    def render_prompt(template: Union[PromptTemplate, CompiledPrompt], **variables) -> str:
         """Render a prompt template with safe variable substitution"""
         try:
             return template.render(**variables)
@@ -410,50 +741,81 @@ class PromptService:
     
     @staticmethod
     def detect_language(text: str) -> str:
-        """Improved language detection with more languages"""
-        # Skip detection for very short text
-        if len(text) < 10:
-            return 'en'
-        
-        # Count language-specific characters
-        char_ranges = {
-            'zh': ('\u4e00', '\u9fff'),       # Chinese
-            'ja': ('\u3040', '\u30ff'),       # Japanese (Hiragana + Katakana)
-            'ko': ('\uac00', '\ud7a3'),       # Korean Hangyll
-            'ru': ('\u0400', '\u04ff'),       # Cyrillic (Russian, etc.)
-            'ar': ('\u0600', '\u06ff'),       # Arabic
-        }
-        
-        lang_counts = {lang: 0 for lang in char_ranges}
-        total_alpha = sum(1 for char in text if char.isalpha())
-        
-        if total_alpha == 0:
-            return 'en'
-        
-        # Count characters in each language range
-        for char in text:
-            for lang, (start, end) in char_ranges.items():
-                if start <= char <= end:
-                    lang_counts[lang] += 1
-        
-        # Calculate ratios
-        lang_ratios = {lang: count / total_alpha for lang, count in lang_counts.items()}
-        
-        # Detect if any language has significant presence
-        for lang, ratio in lang_ratios.items():
-            if ratio > 0.3:
-                return lang
-        
-        # Default to English
-        return 'en'
+        """Detect the language of a text from the scripts it is written in"""
+        return detect_language(text)
 
 
 class LLMManager:
     """Enhanced LLM manager with better error handling and prompt validation"""
     
-    def __init__(self, provider: Optional[LLMProvider] = None, model: Optional[LLMModel] = None):
-        self.llm_service = LLMService(provider=provider, model=model)
+    def __init__(self, provider: Optional[LLMProvider] = None, model: Optional[LLMModel] = None,
+                 rate_limit_wait: Optional[float] = None, hedge: bool = False):
+        self.llm_service = LLMService(provider=provider, model=model, rate_limit_wait=rate_limit_wait)
         self.prompt_service = PromptService()
+        # Opt-in: race a second provider when the primary is slower than usual
+        self.hedge = hedge and getattr(settings, 'LLM_HEDGING_ENABLED', True)
+    
+    def _candidate_services(self) -> Generator[LLMService, None, None]:
+        """The primary service, then one per other active provider in failover order"""
+        yield self.llm_service
+        if not getattr(settings, 'LLM_FAILOVER_ENABLED', True):
+            return
+        for provider, model in get_config_snapshot().failover_targets(self.llm_service.provider.pk):
+            yield self.llm_service.with_target(provider, model)
+    
+    def generate_response(self, messages: List[Dict], **kwargs) -> str:
+        """Generate a response, failing over to other active providers on errors"""
+        if self.hedge:
+            return self._generate_hedged(messages, **kwargs)
+        last_error = None
+        for service in self._candidate_services():
+            try:
+                return service.generate_response(messages, **kwargs)
+            except (LLMServiceError, RateLimitExceeded) as e:
+                last_error = e
+                logger.warning(f"Provider {service.provider.name} failed ({getattr(e, 'code', 'RATE_LIMITED')}), trying next provider")
+        raise last_error
+    
+    def _generate_hedged(self, messages: List[Dict], use_cache: bool = True, **kwargs) -> str:
+        """Hedge the primary against the next failover candidate"""
+        primary = self.llm_service
+        cache_key = primary._cache_key_for(messages, use_cache, **kwargs)
+        if cache_key:
+            cached = LLMResponseCache.get(cache_key, primary.config.cache_ttl)
+            if cached is not None:
+                return cached
+        
+        candidates = self._candidate_services()
+        next(candidates)
+        secondary = next(
+            (service for service in candidates if service.circuit_breaker.state == 'closed'),
+            None
+        )
+        if secondary is None:
+            # Nothing to hedge against, behave like a normal call
+            return primary.generate_response(messages, use_cache=use_cache, **kwargs)
+        
+        content = hedged_generate(primary, secondary, messages, **kwargs)
+        if cache_key:
+            LLMResponseCache.set(cache_key, content, primary.config.cache_ttl)
+        return content
+    
+    def stream_response(self, messages: List[Dict], **kwargs) -> Generator[str, None, None]:
+        """Stream a response, failing over to other providers until the first chunk is sent"""
+        last_error = None
+        for service in self._candidate_services():
+            started = False
+            try:
+                for chunk in service.stream_response(messages, **kwargs):
+                    started = True
+                    yield chunk
+                return
+            except (LLMServiceError, RateLimitExceeded) as e:
+                if started:
+                    raise
+                last_error = e
+                logger.warning(f"Provider {service.provider.name} failed ({getattr(e, 'code', 'RATE_LIMITED')}), trying next provider")
+        raise last_error
     
     def _get_system_prompt(self, prompt_name: str, language: str, variables: Dict) -> str:
         """Get and render the system prompt with proper validation"""
@@ -487,7 +849,7 @@ class LLMManager:
         ]
         
         try:
-            return self.llm_service.generate_response(messages)
+            return self.generate_response(messages)
         except LLMServiceError as e:
             logger.error(f"Generation with prompt failed: {prompt_name} - {str(e)}")
             # Wrap LLM service error with additional context
@@ -518,7 +880,7 @@ class LLMManager:
         ]
         
         try:
-            yield from self.llm_service.stream_response(messages)
+            yield from self.stream_response(messages)
         except LLMServiceError as e:
             logger.error(f"Streaming with prompt failed: {prompt_name} - {str(e)}")
             # Wrap LLM service error with additional context
@@ -537,12 +899,6 @@ class LLMManager:
 def extract_html_from_response(text: str) -> str:
     """
     Remove any LLM explanation/thinking and return only the HTML content.
+    Text without an HTML document is returned as is, minus <think> blocks.
     """
-    # Try to find the start of the HTML document
-    html_start = text.find('<!DOCTYPE html>')
-    if html_start == -1:
-        html_start = text.find('<html')
-    if html_start == -1:
-        # fallback: return the whole text if no HTML found
-        return text
-    return text[html_start:].strip()
\ No newline at end of file
+    return sanitize(text, html_only=True)
\ No newline at end of file
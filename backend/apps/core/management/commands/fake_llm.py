@@ -0,0 +1,111 @@
+from django.core.management.base import BaseCommand
+from apps.core.fake_provider import FakeLLMServer
+from apps.core.models import LLMProvider, LLMModel, LLMConfiguration
+
+
+class Command(BaseCommand):
+    help = 'Run a fake Ollama/OpenAI-compatible LLM server for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=11435)
+        parser.add_argument('--tokens-per-second', type=float, default=50.0,
+                            help='Streaming speed per request')
+        parser.add_argument('--ttft', type=float, default=0.3,
+                            help='Seconds before the first token')
+        parser.add_argument('--jitter', type=float, default=0.2,
+                            help='Relative random variation of the time to first token')
+        parser.add_argument('--response-tokens', type=int, default=300,
+                            help='Words per response (capped by the request max_tokens)')
+        parser.add_argument('--format', dest='output_format', choices=['html', 'text'], default='html',
+                            help='Respond with an HTML paper or plain text')
+        parser.add_argument('--think', action='store_true',
+                            help='Start every response with a <think> block, like reasoning models')
+        parser.add_argument('--error-rate', type=float, default=0.0,
+                            help='Fraction of requests answered with HTTP 500')
+        parser.add_argument('--rate-limit-rate', type=float, default=0.0,
+                            help='Fraction of requests answered with HTTP 429')
+        parser.add_argument('--retry-after', type=int, default=1,
+                            help='Retry-After seconds sent with 429 responses')
+        parser.add_argument('--stall-rate', type=float, default=0.0,
+                            help='Fraction of streams that pause halfway')
+        parser.add_argument('--stall-seconds', type=float, default=30.0,
+                            help='Length of a stall')
+        parser.add_argument('--disconnect-rate', type=float, default=0.0,
+                            help='Fraction of streams cut off a third of the way through')
+        parser.add_argument('--load-seconds', type=float, default=0.0,
+                            help='Model load time paid by the first request after the model was unloaded '
+                                 '(honours keep_alive, default 5 minutes)')
+        parser.add_argument('--seed', type=int, default=None,
+                            help='Random seed for reproducible runs')
+        parser.add_argument('--register', action='store_true',
+                            help='Create or update "Fake Ollama" and "Fake OpenAI" providers pointing at this server')
+        parser.add_argument('--make-default', action='store_true',
+                            help='With --register, make the fake Ollama provider the default')
+
+    def handle(self, *args, **options):
+        server = FakeLLMServer(
+            (options['host'], options['port']),
+            tokens_per_second=options['tokens_per_second'],
+            ttft=options['ttft'],
+            jitter=options['jitter'],
+            response_tokens=options['response_tokens'],
+            error_rate=options['error_rate'],
+            rate_limit_rate=options['rate_limit_rate'],
+            retry_after=options['retry_after'],
+            stall_rate=options['stall_rate'],
+            stall_seconds=options['stall_seconds'],
+            disconnect_rate=options['disconnect_rate'],
+            output_format=options['output_format'],
+            think=options['think'],
+            load_seconds=options['load_seconds'],
+            seed=options['seed'],
+        )
+        base_url = f"http://{options['host']}:{server.server_address[1]}"
+
+        if options['register']:
+            self._register(base_url, options['make_default'])
+
+        self.stdout.write(self.style.SUCCESS(f'Fake LLM server listening on {base_url}'))
+        self.stdout.write(f'  Ollama:  {base_url}/api/chat')
+        self.stdout.write(f'  OpenAI:  {base_url}/v1/chat/completions')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            stats = ', '.join(f'{key}={value}' for key, value in server.stats.items())
+            self.stdout.write(f'Stopped. {stats}')
+
+    def _register(self, base_url: str, make_default: bool):
+        for name, provider_type in [('Fake Ollama', 'ollama'), ('Fake OpenAI', 'openai')]:
+            provider, created = LLMProvider.objects.update_or_create(
+                name=name,
+                defaults={
+                    'provider_type': provider_type,
+                    'base_url': base_url,
+                    'api_key': 'fake' if provider_type == 'openai' else '',
+                    'is_active': True,
+                    'timeout': 120,
+                }
+            )
+            model, _ = LLMModel.objects.update_or_create(
+                provider=provider,
+                name='fake-model',
+                defaults={
+                    'display_name': f'{name} model',
+                    'context_length': 32768,
+                    'max_tokens': 4096,
+                    'is_active': True,
+                    'is_default': True,
+                }
+            )
+            self.stdout.write(self.style.SUCCESS(f'{"Created" if created else "Updated"} provider: {name}'))
+
+            if make_default and provider_type == 'ollama':
+                config = LLMConfiguration.get_config()
+                config.default_provider = provider
+                config.default_model = model
+                config.save()
+                self.stdout.write(self.style.SUCCESS(f'{name} is now the default provider'))
@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.core.ollama_warmup import heartbeat
+from apps.core.telemetry import TelemetryRecorder
+
+
+class Command(BaseCommand):
+    help = 'Load the default and active Ollama models into memory, optionally keeping them warm'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--default-only', action='store_true',
+                            help='Only warm the default model')
+        parser.add_argument('--heartbeat', action='store_true',
+                            help='Keep running and re-touch hot models every LLM_OLLAMA_HEARTBEAT_INTERVAL seconds')
+
+    def handle(self, *args, **options):
+        self._warm(preload=True, default_only=options['default_only'])
+        if not options['heartbeat']:
+            return
+        interval = settings.LLM_OLLAMA_HEARTBEAT_INTERVAL
+        self.stdout.write(f'Heartbeat every {interval}s, press Ctrl+C to stop')
+        try:
+            while True:
+                time.sleep(interval)
+                self._warm(preload=False, default_only=options['default_only'])
+        except KeyboardInterrupt:
+            pass
+
+    def _warm(self, preload: bool, default_only: bool):
+        results = heartbeat(preload=preload, force=preload, default_only=default_only)
+        if preload and not results:
+            self.stdout.write(self.style.WARNING('No active Ollama models to warm up'))
+        for name, seconds in results.items():
+            if seconds is None:
+                self.stdout.write(self.style.ERROR(f'{name}: warm-up failed'))
+            elif seconds >= settings.LLM_COLD_START_THRESHOLD:
+                self.stdout.write(self.style.SUCCESS(f'{name}: loaded in {seconds:.1f}s (cold)'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name}: already loaded'))
+        # Write warm-up telemetry before the command exits
+        TelemetryRecorder.flush()
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llmprovider',
+            name='keep_alive',
+            field=models.PositiveIntegerField(default=60, help_text='Idle time after which pooled connections are discarded and reopened', verbose_name='Keep-Alive (seconds)'),
+        ),
+        migrations.AddField(
+            model_name='llmprovider',
+            name='pool_size',
+            field=models.PositiveIntegerField(default=10, help_text='Maximum number of pooled HTTP connections kept open to this provider', verbose_name='Connection Pool Size'),
+        ),
+    ]
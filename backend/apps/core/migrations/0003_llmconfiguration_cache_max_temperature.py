@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_llmprovider_pool_size_keep_alive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llmconfiguration',
+            name='cache_max_temperature',
+            field=models.FloatField(blank=True, help_text='Responses requested above this temperature are not cached. Leave empty to cache regardless of temperature.', null=True, verbose_name='Cache Max Temperature'),
+        ),
+    ]
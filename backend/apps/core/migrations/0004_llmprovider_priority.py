@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_llmconfiguration_cache_max_temperature'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llmprovider',
+            name='priority',
+            field=models.IntegerField(default=0, help_text='Lower values are tried first when failing over from an unavailable provider', verbose_name='Failover Priority'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_llmprovider_priority'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMCallRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider_name', models.CharField(max_length=100, verbose_name='Provider Name')),
+                ('model_name', models.CharField(max_length=100, verbose_name='Model Name')),
+                ('call_type', models.CharField(choices=[('generate', 'Generate'), ('stream', 'Stream')], max_length=10, verbose_name='Call Type')),
+                ('prompt_tokens', models.PositiveIntegerField(default=0, help_text='Estimated', verbose_name='Prompt Tokens')),
+                ('completion_tokens', models.PositiveIntegerField(default=0, help_text='Estimated', verbose_name='Completion Tokens')),
+                ('ttfb', models.FloatField(blank=True, null=True, verbose_name='Time to First Byte (s)')),
+                ('latency', models.FloatField(verbose_name='Total Latency (s)')),
+                ('tokens_per_second', models.FloatField(blank=True, null=True, verbose_name='Tokens per Second')),
+                ('retries', models.PositiveSmallIntegerField(default=0, verbose_name='Retries')),
+                ('outcome', models.CharField(choices=[('success', 'Success'), ('error', 'Error'), ('cancelled', 'Cancelled')], max_length=10, verbose_name='Outcome')),
+                ('error_code', models.CharField(blank=True, max_length=50, verbose_name='Error Code')),
+                ('created_at', models.DateTimeField(db_index=True, verbose_name='Created At')),
+                ('provider', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='call_records', to='core.llmprovider', verbose_name='Provider')),
+            ],
+            options={
+                'verbose_name': 'LLM Call Record',
+                'verbose_name_plural': 'LLM Call Records',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['provider_name', 'model_name', 'created_at'], name='core_llmcal_provide_b71643_idx')],
+            },
+        ),
+    ]
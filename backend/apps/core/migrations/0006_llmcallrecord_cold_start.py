@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_llmcallrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llmcallrecord',
+            name='cold_start',
+            field=models.BooleanField(default=False, help_text='The model had to be loaded before answering', verbose_name='Cold Start'),
+        ),
+        migrations.AddField(
+            model_name='llmcallrecord',
+            name='load_time',
+            field=models.FloatField(blank=True, help_text='Reported by the provider (Ollama load_duration)', null=True, verbose_name='Model Load Time (s)'),
+        ),
+        migrations.AlterField(
+            model_name='llmcallrecord',
+            name='call_type',
+            field=models.CharField(choices=[('generate', 'Generate'), ('stream', 'Stream'), ('warmup', 'Warm-up')], max_length=10, verbose_name='Call Type'),
+        ),
+    ]
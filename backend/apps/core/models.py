@@ -40,6 +40,18 @@ class LLMProvider(models.Model):
     is_default = models.BooleanField(_('Is Default'), default=False)
     timeout = models.IntegerField(_('Timeout (seconds)'), default=30)
     max_retries = models.IntegerField(_('Max Retries'), default=3)
+    pool_size = models.PositiveIntegerField(
+        _('Connection Pool Size'), default=10,
+        help_text=_('Maximum number of pooled HTTP connections kept open to this provider')
+    )
+    keep_alive = models.PositiveIntegerField(
+        _('Keep-Alive (seconds)'), default=60,
+        help_text=_('Idle time after which pooled connections are discarded and reopened')
+    )
+    priority = models.IntegerField(
+        _('Failover Priority'), default=0,
+        help_text=_('Lower values are tried first when failing over from an unavailable provider')
+    )
     created_at = models.DateTimeField(_('Created At'), auto_now_add=True)
     updated_at = models.DateTimeField(_('Updated At'), auto_now=True)
     
@@ -171,6 +183,10 @@ class LLMConfiguration(models.Model):
     enable_streaming = models.BooleanField(_('Enable Streaming'), default=True)
     enable_caching = models.BooleanField(_('Enable Caching'), default=True)
     cache_ttl = models.IntegerField(_('Cache TTL (seconds)'), default=3600)
+    cache_max_temperature = models.FloatField(
+        _('Cache Max Temperature'), null=True, blank=True,
+        help_text=_('Responses requested above this temperature are not cached. Leave empty to cache regardless of temperature.')
+    )
     rate_limit_per_minute = models.IntegerField(_('Rate Limit per Minute'), default=60)
     enable_logging = models.BooleanField(_('Enable Logging'), default=True)
     log_level = models.CharField(
@@ -200,3 +216,54 @@ class LLMConfiguration(models.Model):
         config, created = cls.objects.get_or_create(pk=1)
         return config
 
+
+
+class LLMCallRecord(models.Model):
+    """Telemetry for a single call made to an LLM provider"""
+    
+    CALL_TYPE_CHOICES = [
+        ('generate', _('Generate')),
+        ('stream', _('Stream')),
+        ('warmup', _('Warm-up')),
+    ]
+    OUTCOME_CHOICES = [
+        ('success', _('Success')),
+        ('error', _('Error')),
+        ('cancelled', _('Cancelled')),
+    ]
+    
+    provider = models.ForeignKey(
+        LLMProvider,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='call_records',
+        verbose_name=_('Provider')
+    )
+    provider_name = models.CharField(_('Provider Name'), max_length=100)
+    model_name = models.CharField(_('Model Name'), max_length=100)
+    call_type = models.CharField(_('Call Type'), max_length=10, choices=CALL_TYPE_CHOICES)
+    prompt_tokens = models.PositiveIntegerField(_('Prompt Tokens'), default=0, help_text=_('Estimated'))
+    completion_tokens = models.PositiveIntegerField(_('Completion Tokens'), default=0, help_text=_('Estimated'))
+    ttfb = models.FloatField(_('Time to First Byte (s)'), null=True, blank=True)
+    latency = models.FloatField(_('Total Latency (s)'))
+    tokens_per_second = models.FloatField(_('Tokens per Second'), null=True, blank=True)
+    retries = models.PositiveSmallIntegerField(_('Retries'), default=0)
+    outcome = models.CharField(_('Outcome'), max_length=10, choices=OUTCOME_CHOICES)
+    error_code = models.CharField(_('Error Code'), max_length=50, blank=True)
+    load_time = models.FloatField(_('Model Load Time (s)'), null=True, blank=True,
+                                  help_text=_('Reported by the provider (Ollama load_duration)'))
+    cold_start = models.BooleanField(_('Cold Start'), default=False,
+                                     help_text=_('The model had to be loaded before answering'))
+    created_at = models.DateTimeField(_('Created At'), db_index=True)
+    
+    class Meta:
+        verbose_name = _('LLM Call Record')
+        verbose_name_plural = _('LLM Call Records')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['provider_name', 'model_name', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.provider_name}/{self.model_name} {self.call_type} {self.latency:.2f}s ({self.outcome})"
@@ -0,0 +1,209 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+from .config_snapshot import get_config_snapshot
+from .telemetry import TelemetryRecorder, begin_call, note_model_load
+
+logger = logging.getLogger(__name__)
+
+NANOSECONDS = 1_000_000_000
+
+
+class TrafficTracker:
+    """Arrival times of recent requests per Ollama provider/model, shared through the cache.
+
+    The heartbeat may run in its own process (manage.py warm_llm --heartbeat),
+    so it has to see the requests that the web and job workers received. That
+    takes a cache shared between processes, such as the Redis one.
+    """
+
+    KEY_PREFIX = 'llm_traffic'
+
+    @classmethod
+    def _key(cls, provider, model, name) -> str:
+        return f"{cls.KEY_PREFIX}:{provider.pk}:{model.name}:{name}"
+
+    @staticmethod
+    def _timeout() -> int:
+        return getattr(settings, 'LLM_OLLAMA_HOT_WINDOW', 6 * 3600)
+
+    @classmethod
+    def note_request(cls, provider, model):
+        now = time.time()
+        window = getattr(settings, 'LLM_OLLAMA_TRAFFIC_WINDOW', 50)
+        counter = cls._key(provider, model, 'count')
+        try:
+            # A ring of the last `window` arrivals; incr gives every worker its own slot
+            cache.add(counter, 0, cls._timeout())
+            slot = cache.incr(counter) % window
+            cache.set_many({
+                cls._key(provider, model, slot): now,
+                cls._key(provider, model, 'last'): now,
+            }, cls._timeout())
+        except Exception as e:
+            # Never block generation because the cache is unavailable
+            logger.warning(f"Could not record Ollama traffic: {str(e)}")
+
+    @classmethod
+    def last_request(cls, provider, model) -> Optional[float]:
+        try:
+            return cache.get(cls._key(provider, model, 'last'))
+        except Exception as e:
+            logger.warning(f"Could not read Ollama traffic: {str(e)}")
+            return None
+
+    @classmethod
+    def typical_gap(cls, provider, model) -> Optional[float]:
+        """90th percentile of the gaps between recent requests, None without enough traffic"""
+        window = getattr(settings, 'LLM_OLLAMA_TRAFFIC_WINDOW', 50)
+        try:
+            arrivals = sorted(cache.get_many([cls._key(provider, model, slot) for slot in range(window)]).values())
+        except Exception as e:
+            logger.warning(f"Could not read Ollama traffic: {str(e)}")
+            return None
+        if len(arrivals) < 3:
+            return None
+        gaps = sorted(later - earlier for earlier, later in zip(arrivals, arrivals[1:]))
+        return gaps[min(len(gaps) - 1, int(round(0.9 * (len(gaps) - 1))))]
+
+
+def keep_alive_for(provider, model) -> int:
+    """Seconds Ollama should keep the model loaded to bridge the usual pause between requests"""
+    default = getattr(settings, 'LLM_OLLAMA_KEEP_ALIVE_DEFAULT', 600)
+    gap = TrafficTracker.typical_gap(provider, model)
+    seconds = default if gap is None else gap * 2
+    return int(min(max(seconds, getattr(settings, 'LLM_OLLAMA_KEEP_ALIVE_MIN', 300)),
+                   getattr(settings, 'LLM_OLLAMA_KEEP_ALIVE_MAX', 3600)))
+
+
+def note_ollama_load(payload: Dict):
+    """Pass Ollama's load_duration (nanoseconds) on to telemetry"""
+    load_duration = payload.get('load_duration')
+    if load_duration is not None:
+        note_model_load(load_duration / NANOSECONDS)
+
+
+def warm_model(provider, model, keep_alive: Optional[int] = None) -> Optional[float]:
+    """Load a model into memory on its Ollama server; returns the seconds it took, None on failure"""
+    from .llm_service import LLMService
+
+    service = LLMService(provider=provider, model=model)
+    call = begin_call()
+    started = time.monotonic()
+    try:
+        # A chat request without messages only loads the model
+        response = service.session.post(
+            service._get_endpoint_url(),
+            headers=service._get_headers(),
+            json={
+                'model': model.name,
+                'messages': [],
+                'stream': False,
+                'keep_alive': f"{keep_alive or keep_alive_for(provider, model)}s",
+            },
+            timeout=max(provider.timeout, getattr(settings, 'LLM_OLLAMA_WARMUP_TIMEOUT', 300)),
+        )
+        response.raise_for_status()
+        payload = response.json()
+    except Exception as e:
+        logger.warning(f"Warm-up of {model.name} on {provider.name} failed: {str(e)}")
+        TelemetryRecorder.record(service, 'warmup', call, 'error', error_code=type(e).__name__)
+        return None
+
+    elapsed = time.monotonic() - started
+    # Older servers don't report load_duration; the round trip is close enough
+    note_model_load(payload['load_duration'] / NANOSECONDS if 'load_duration' in payload else elapsed)
+    TelemetryRecorder.record(service, 'warmup', call, 'success')
+    return call['load_time']
+
+
+def warm_targets(default_only: bool = False) -> List[Tuple]:
+    """(provider, model) pairs to keep loaded: the default model and every active Ollama model"""
+    snapshot = get_config_snapshot()
+    targets = []
+    config = snapshot.config
+    if config.default_provider and config.default_model and config.default_provider.provider_type == 'ollama':
+        targets.append((config.default_provider, config.default_model))
+    if not default_only:
+        for provider in snapshot.providers:
+            if provider.provider_type != 'ollama':
+                continue
+            for model in provider.active_models:
+                if not any(p.pk == provider.pk and m.name == model.name for p, m in targets):
+                    targets.append((provider, model))
+    return targets
+
+
+def is_hot(provider, model, default) -> bool:
+    """Worth keeping resident: the default model, or one used within LLM_OLLAMA_HOT_WINDOW"""
+    if default is not None and default == (provider.pk, model.name):
+        return True
+    last = TrafficTracker.last_request(provider, model)
+    return last is not None and time.time() - last < getattr(settings, 'LLM_OLLAMA_HOT_WINDOW', 6 * 3600)
+
+
+def heartbeat(preload: bool = False, force: bool = False,
+              default_only: Optional[bool] = None) -> Dict[str, Optional[float]]:
+    """Touch hot models (all targets when preloading) so Ollama keeps them in memory.
+
+    Unless forced, only one worker pings a given model per interval.
+    """
+    interval = getattr(settings, 'LLM_OLLAMA_HEARTBEAT_INTERVAL', 240)
+    config = get_config_snapshot().config
+    default = (config.default_provider_id, config.default_model.name) if config.default_model else None
+    results = {}
+    if default_only is None:
+        default_only = getattr(settings, 'LLM_OLLAMA_WARMUP_DEFAULT_ONLY', False)
+    for provider, model in warm_targets(default_only):
+        if not preload and not is_hot(provider, model, default):
+            continue
+        if not cache.add(f'ollama_heartbeat:{provider.pk}:{model.name}', 1, max(int(interval * 0.9), 1)) and not force:
+            continue
+        # Stay resident at least until the next heartbeat
+        keep_alive = max(keep_alive_for(provider, model), interval * 2)
+        results[f'{provider.name}/{model.name}'] = warm_model(provider, model, keep_alive)
+    return results
+
+
+_thread: Optional[threading.Thread] = None
+_thread_lock = threading.Lock()
+
+
+def _run():
+    preload = True
+    while True:
+        try:
+            close_old_connections()
+            for name, seconds in heartbeat(preload=preload).items():
+                if seconds is not None and seconds >= getattr(settings, 'LLM_COLD_START_THRESHOLD', 1.0):
+                    logger.info(f"Loaded {name} in {seconds:.1f}s")
+            preload = False
+        except Exception as e:
+            logger.warning(f"Ollama heartbeat failed: {str(e)}")
+        finally:
+            close_old_connections()
+        time.sleep(getattr(settings, 'LLM_OLLAMA_HEARTBEAT_INTERVAL', 240))
+
+
+def start_warmup():
+    """Preload Ollama models and keep them warm from a background thread (once per process)"""
+    global _thread
+    if not getattr(settings, 'LLM_OLLAMA_WARMUP_ENABLED', False):
+        return
+    try:
+        if not warm_targets(getattr(settings, 'LLM_OLLAMA_WARMUP_DEFAULT_ONLY', False)):
+            logger.info("No Ollama models configured, skipping warm-up")
+            return
+    except Exception as e:
+        logger.warning(f"Ollama warm-up skipped: {str(e)}")
+        return
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_run, name='ollama-warmup', daemon=True)
+            _thread.start()
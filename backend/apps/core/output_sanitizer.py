@@ -0,0 +1,140 @@
+import re
+from typing import Optional
+
+THINK_CLOSE = re.compile(r'<\s*/\s*think\s*>', re.IGNORECASE)
+THINK_TAG = re.compile(r'<\s*(/?)\s*think\s*>', re.IGNORECASE)
+HTML_START = re.compile(r'<!DOCTYPE html>|<html')
+LINE_BREAK = re.compile(r'[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+# Longest possibly-incomplete think tag withheld at the end of a chunk
+MAX_TAG_LENGTH = 32
+
+
+def _partial_tag_start(text: str) -> int:
+    """Index of a think tag cut off at the end of text, or len(text) when there is none"""
+    start = text.rfind('<', max(0, len(text) - MAX_TAG_LENGTH))
+    if start == -1:
+        return len(text)
+    fragment = re.sub(r'\s+', '', text[start:]).lower()
+    if '<think>'.startswith(fragment) or '</think>'.startswith(fragment):
+        return start
+    return len(text)
+
+
+class OutputSanitizer:
+    """Incrementally cleans model output: feed() chunks as they arrive, then finish().
+
+    Text inside <think>...</think> is dropped as soon as it is seen, so
+    reasoning is neither forwarded nor buffered. Optionally squeezes out
+    blank lines and indentation (compact_lines) and withholds anything
+    before the HTML document (html_only), looking ahead at most max_preamble
+    characters before giving up and passing the text through.
+    """
+
+    def __init__(self, compact_lines: bool = False, html_only: bool = False, max_preamble: Optional[int] = None):
+        self.compact_lines = compact_lines
+        self.html_only = html_only
+        self.max_preamble = max_preamble
+        self._tail = ''
+        self._thinking = False
+        # Line compaction
+        self._line_has_content = False
+        self._newline_due = False
+        self._held_space = ''
+        # HTML extraction
+        self._preamble = ''
+        self._in_document = not html_only
+        self._passthrough = not html_only
+        self._trailing_space = ''
+
+    def feed(self, chunk: str) -> str:
+        """Clean text that is safe to emit after this chunk"""
+        text = self._tail + chunk
+        cut = _partial_tag_start(text)
+        self._tail = text[cut:]
+        return self._postprocess(self._strip_think(text[:cut]))
+
+    def finish(self) -> str:
+        """Whatever is still withheld once the output is complete"""
+        text, self._tail = self._tail, ''
+        cleaned = self._postprocess(self._strip_think(text))
+        if not self._in_document:
+            # No HTML document at all: return the text as it was
+            cleaned, self._preamble = self._preamble, ''
+        self._trailing_space = ''
+        self._held_space = ''
+        return cleaned
+
+    def _strip_think(self, text: str) -> str:
+        parts = []
+        pos = 0
+        while True:
+            if self._thinking:
+                match = THINK_CLOSE.search(text, pos)
+                if not match:
+                    return ''.join(parts)
+                self._thinking = False
+            else:
+                match = THINK_TAG.search(text, pos)
+                if not match:
+                    parts.append(text[pos:])
+                    return ''.join(parts)
+                parts.append(text[pos:match.start()])
+                # A closing tag without an opening one is simply dropped
+                self._thinking = not match.group(1)
+            pos = match.end()
+
+    def _postprocess(self, text: str) -> str:
+        if self.compact_lines:
+            text = self._compact(text)
+        if self.html_only:
+            text = self._extract_html(text)
+        return text
+
+    def _compact(self, text: str) -> str:
+        """Strip every line and drop empty ones, across chunk boundaries"""
+        parts = []
+        for index, line in enumerate(LINE_BREAK.split(text)):
+            if index:
+                if self._line_has_content:
+                    self._newline_due = True
+                self._line_has_content = False
+                self._held_space = ''
+            if not self._line_has_content:
+                line = line.lstrip()
+            content = line.rstrip()
+            if not content:
+                self._held_space += line
+                continue
+            parts.append(('\n' if self._newline_due else '') + self._held_space + content)
+            self._newline_due = False
+            self._line_has_content = True
+            self._held_space = line[len(content):]
+        return ''.join(parts)
+
+    def _extract_html(self, text: str) -> str:
+        if not self._in_document:
+            self._preamble += text
+            match = HTML_START.search(self._preamble)
+            if match:
+                text = self._preamble[match.start():]
+                self._in_document = True
+                self._passthrough = False
+            elif self.max_preamble is not None and len(self._preamble) > self.max_preamble:
+                text = self._preamble
+                self._in_document = True
+            else:
+                return ''
+            self._preamble = ''
+        if self._passthrough:
+            return text
+        # Trailing whitespace is only emitted once more content follows it
+        text = self._trailing_space + text
+        content = text.rstrip()
+        self._trailing_space = text[len(content):]
+        return content
+
+
+def sanitize(text: str, **options) -> str:
+    """Clean a complete response with the same rules used for streams"""
+    sanitizer = OutputSanitizer(**options)
+    return sanitizer.feed(text) + sanitizer.finish()
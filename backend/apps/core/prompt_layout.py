@@ -0,0 +1,71 @@
+import json
+from typing import Any, Dict, List
+
+from django.conf import settings
+
+# Message key holding the length of the content prefix shared between requests
+CACHE_PREFIX_KEY = 'cache_prefix'
+CACHE_CONTROL = {'type': 'ephemeral'}
+# Anthropic accepts at most four cache breakpoints per request; one goes to the system prompt
+MAX_MESSAGE_BREAKPOINTS = 3
+
+
+def canonical_json(value: Any) -> str:
+    """Serialize a format spec the same way every time, so prompts embedding it stay byte-identical"""
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, indent=2, default=str)
+
+
+def prefixed_message(prefix: str, content: str, role: str = 'user') -> Dict[str, Any]:
+    """Message made of a stable prefix (instructions, format spec) followed by per-request content.
+
+    Providers with explicit prompt caching get a cache breakpoint after the
+    prefix; the others match identical prefixes on their own.
+    """
+    return {'role': role, 'content': prefix + content, CACHE_PREFIX_KEY: len(prefix)}
+
+
+def split_rendered(rendered: str, marker: str) -> tuple:
+    """(prefix, suffix) around the placeholder marker of a rendered template"""
+    prefix, _, suffix = rendered.partition(marker)
+    return prefix, suffix
+
+
+def provider_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Messages with layout hints removed, as sent to providers without cache hints"""
+    return [
+        {key: value for key, value in message.items() if key != CACHE_PREFIX_KEY}
+        if CACHE_PREFIX_KEY in message else message
+        for message in messages
+    ]
+
+
+def cache_hints_enabled() -> bool:
+    return getattr(settings, 'LLM_PROMPT_CACHE_HINTS', True)
+
+
+def anthropic_system(messages: List[Dict[str, Any]]):
+    """Anthropic system field, cached as a block when hints are enabled"""
+    system = "\n\n".join(m['content'] for m in messages if m['role'] == 'system')
+    if not system or not cache_hints_enabled():
+        return system
+    return [{'type': 'text', 'text': system, 'cache_control': CACHE_CONTROL}]
+
+
+def anthropic_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Anthropic messages with a cache breakpoint after each stable prefix"""
+    result = []
+    breakpoints = MAX_MESSAGE_BREAKPOINTS if cache_hints_enabled() else 0
+    for message in messages:
+        if message['role'] == 'system':
+            continue
+        prefix_length = message.get(CACHE_PREFIX_KEY)
+        if not prefix_length or not breakpoints:
+            result.append({'role': message['role'], 'content': message['content']})
+            continue
+        breakpoints -= 1
+        content = message['content']
+        blocks = [{'type': 'text', 'text': content[:prefix_length], 'cache_control': CACHE_CONTROL}]
+        if content[prefix_length:]:
+            blocks.append({'type': 'text', 'text': content[prefix_length:]})
+        result.append({'role': message['role'], 'content': blocks})
+    return result
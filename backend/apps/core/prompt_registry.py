@@ -0,0 +1,141 @@
+import logging
+import re
+import threading
+import time
+from string import Formatter
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import PromptTemplate
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'prompt_templates:version'
+# Variable a replacement field looks up: "data" in {data[key]} or {data.attr}
+FIELD_ROOT = re.compile(r'[^.\[]*')
+
+
+class CompiledPrompt:
+    """An active PromptTemplate parsed once into literal text and variable slots"""
+
+    def __init__(self, template: PromptTemplate):
+        self.pk = template.pk
+        self.name = template.name
+        self.language = template.language
+        self.prompt_type = template.prompt_type
+        self.is_default = template.is_default
+        self.template = template.template
+        self.error: Optional[str] = None
+        # Literal chunks and plain {name} slots; anything fancier goes through str.format
+        self._parts: List[Tuple[str, Optional[str]]] = []
+        self._simple = True
+        variables = set()
+        try:
+            for literal, field, spec, conversion in Formatter().parse(self.template):
+                if field is not None:
+                    # {data[key]} and {obj.attr} need the data/obj variable; {0} and {} stay str.format's business
+                    root = FIELD_ROOT.match(field).group()
+                    if root.isidentifier():
+                        variables.add(root)
+                    self._simple = self._simple and field.isidentifier() and not spec and not conversion
+                self._parts.append((literal, field))
+        except ValueError as e:
+            self.error = str(e)
+            logger.error(f"Prompt template {self.name} ({self.language}/{self.prompt_type}) is invalid: {self.error}")
+        self.variables: FrozenSet[str] = frozenset(variables)
+
+    def render(self, **kwargs) -> str:
+        """Render the template with provided variables"""
+        if self.error:
+            raise ValueError(f"Invalid prompt template '{self.name}': {self.error}")
+        missing = self.variables.difference(kwargs)
+        if missing:
+            raise ValueError(f"Missing variable: {', '.join(sorted(missing))}")
+        if not self._simple:
+            try:
+                return self.template.format(**kwargs)
+            except KeyError as e:
+                # A name used only inside a format spec, e.g. {value:{width}}
+                raise ValueError(f"Missing variable: {e}")
+        return ''.join(
+            literal + (str(kwargs[field]) if field is not None else '')
+            for literal, field in self._parts
+        )
+
+    def __str__(self):
+        return f"{self.name} ({self.language})"
+
+
+class PromptRegistry:
+    """Every active prompt template for one version of the prompt_templates table"""
+
+    def __init__(self, version: Optional[int]):
+        self.version = version
+        self.templates: Dict[Tuple[str, str, str], CompiledPrompt] = {}
+        self.defaults: Dict[Tuple[str, str], CompiledPrompt] = {}
+        for template in PromptTemplate.objects.filter(is_active=True):
+            compiled = CompiledPrompt(template)
+            self.templates[(compiled.name, compiled.language, compiled.prompt_type)] = compiled
+            if compiled.is_default:
+                self.defaults[(compiled.language, compiled.prompt_type)] = compiled
+
+    def get(self, name: str, language: str = 'en', prompt_type: str = 'system') -> Optional[CompiledPrompt]:
+        return self.templates.get((name, language, prompt_type))
+
+    def get_default(self, language: str = 'en', prompt_type: str = 'system') -> Optional[CompiledPrompt]:
+        """Default template for the language, falling back to the English default"""
+        return self.defaults.get((language, prompt_type)) or self.defaults.get(('en', prompt_type))
+
+
+_lock = threading.Lock()
+_registry: Optional[PromptRegistry] = None
+_checked_at = 0.0
+
+
+def _current_version() -> Optional[int]:
+    try:
+        cache.add(VERSION_KEY, 1, None)
+        return cache.get(VERSION_KEY)
+    except Exception as e:
+        logger.warning(f"Prompt template version unavailable: {str(e)}")
+        return None
+
+
+def get_prompt_registry() -> PromptRegistry:
+    """Current registry, reloaded only after a prompt template was changed by any worker"""
+    global _registry, _checked_at
+    registry = _registry
+    now = time.monotonic()
+    if registry is not None and now - _checked_at < getattr(settings, 'LLM_PROMPT_REGISTRY_CHECK_INTERVAL', 1.0):
+        return registry
+
+    version = _current_version()
+    with _lock:
+        registry = _registry
+        if registry is None or version is None or registry.version != version:
+            registry = _registry = PromptRegistry(version)
+        _checked_at = now
+    return registry
+
+
+def invalidate_prompt_registry():
+    """Make every process reload its prompt templates"""
+    global _registry
+    try:
+        cache.add(VERSION_KEY, 0, None)
+        cache.incr(VERSION_KEY)
+    except Exception as e:
+        logger.warning(f"Could not bump prompt template version: {str(e)}")
+    with _lock:
+        _registry = None
+
+
+@receiver([post_save, post_delete], sender=PromptTemplate)
+def bump_prompt_version(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_prompt_registry)
+
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import math
+import time
+from typing import Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request cannot be admitted within the allowed wait"""
+
+    def __init__(self, message: str, retry_after: float, scope: str = ''):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.scope = scope
+
+    @property
+    def retry_after_header(self) -> str:
+        """Value for the HTTP Retry-After header (whole seconds)"""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class SlidingWindowRateLimiter:
+    """Sliding-window limiter shared across workers through the cache backend.
+
+    Uses two fixed one-window counters and weights the previous one by how much
+    of it still overlaps the sliding window. Counters rely on the atomic
+    ``add``/``incr`` of the cache backend (Redis, Memcached), so every worker
+    sees the same budget.
+    """
+
+    KEY_PREFIX = 'llm_rate'
+
+    def __init__(self, scope: str, limit: int, window: int = 60):
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+
+    def _key(self, window_index: int) -> str:
+        return f"{self.KEY_PREFIX}:{self.scope}:{window_index}"
+
+    def try_acquire(self) -> Tuple[bool, float]:
+        """Try to take one slot; returns (admitted, seconds until a retry may succeed)"""
+        if self.limit <= 0:
+            return True, 0.0
+
+        now = time.time()
+        window_index = int(now // self.window)
+        elapsed = now - window_index * self.window
+        current_key = self._key(window_index)
+
+        try:
+            cache.add(current_key, 0, self.window * 2)
+            current = cache.incr(current_key)
+            previous = cache.get(self._key(window_index - 1), 0)
+        except Exception as e:
+            # Never block generation because the cache is unavailable
+            logger.warning(f"Rate limiter unavailable for {self.scope}: {str(e)}")
+            return True, 0.0
+
+        weight = (self.window - elapsed) / self.window
+        estimated = previous * weight + current
+        if estimated <= self.limit:
+            return True, 0.0
+
+        try:
+            cache.decr(current_key)
+        except Exception:
+            pass
+
+        # Time until the previous window has decayed enough to free one slot
+        if previous > 0:
+            excess = estimated - self.limit
+            retry_after = min(excess * self.window / previous, self.window - elapsed)
+        else:
+            retry_after = self.window - elapsed
+        return False, max(retry_after, 0.05)
+
+    def acquire(self, max_wait: float = 0) -> None:
+        """Take a slot, sleeping up to max_wait seconds; raises RateLimitExceeded otherwise"""
+        deadline = time.monotonic() + max_wait
+        while True:
+            admitted, retry_after = self.try_acquire()
+            if admitted:
+                return
+            remaining = deadline - time.monotonic()
+            if retry_after > remaining:
+                raise RateLimitExceeded(
+                    f"Rate limit of {self.limit} requests per {self.window}s exceeded for {self.scope}",
+                    retry_after=retry_after,
+                    scope=self.scope,
+                )
+            time.sleep(retry_after)
+
+    async def aacquire(self, max_wait: float = 0) -> None:
+        """Async version of acquire"""
+        deadline = time.monotonic() + max_wait
+        while True:
+            # Cache round trips block, keep them off the event loop
+            admitted, retry_after = await sync_to_async(self.try_acquire, thread_sensitive=False)()
+            if admitted:
+                return
+            remaining = deadline - time.monotonic()
+            if retry_after > remaining:
+                raise RateLimitExceeded(
+                    f"Rate limit of {self.limit} requests per {self.window}s exceeded for {self.scope}",
+                    retry_after=retry_after,
+                    scope=self.scope,
+                )
+            await asyncio.sleep(retry_after)
+
+
+def limiter_for(provider, model, config) -> Optional[SlidingWindowRateLimiter]:
+    """Limiter enforcing LLMConfiguration.rate_limit_per_minute for a provider/model pair"""
+    limit = config.rate_limit_per_minute
+    if not limit or limit <= 0:
+        return None
+    return SlidingWindowRateLimiter(scope=f"{provider.pk}:{model.name}", limit=limit, window=60)
@@ -0,0 +1,14 @@
+from rest_framework.renderers import JSONRenderer
+
+from .serialization import dumps
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer backed by orjson; output is always compact UTF-8 unless an indent is requested"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        return dumps(data, indent=bool(indent))
@@ -0,0 +1,60 @@
+import datetime
+import decimal
+import ipaddress
+
+import orjson
+from django.db.models import Model, QuerySet
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+
+# Same output as json.dumps for what DRF renders: "Z" for UTC, int dict keys allowed
+OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+IP_TYPES = (
+    ipaddress.IPv4Address, ipaddress.IPv6Address,
+    ipaddress.IPv4Network, ipaddress.IPv6Network,
+    ipaddress.IPv4Interface, ipaddress.IPv6Interface,
+)
+
+
+def default(obj):
+    """Types orjson does not handle natively, encoded like DRF's JSONEncoder"""
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, decimal.Decimal):
+        # Serializers coerce decimals to strings; bare Decimals in response data become numbers
+        return float(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, Model):
+        # Model references are sent as their primary key
+        return obj.pk
+    if isinstance(obj, QuerySet):
+        return list(obj)
+    if isinstance(obj, IP_TYPES):
+        return str(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, 'items'):
+        return dict(obj.items())
+    if hasattr(obj, '__iter__'):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(data, indent: bool = False) -> bytes:
+    """UTF-8 encoded JSON"""
+    return orjson.dumps(data, default=default, option=(OPTIONS | orjson.OPT_INDENT_2) if indent else OPTIONS)
+
+
+def loads(data):
+    return orjson.loads(data)
+
+
+def sse_event(data) -> bytes:
+    """One server-sent event carrying data as JSON"""
+    return b'data: ' + orjson.dumps(data, default=default, option=OPTIONS) + b'\n\n'
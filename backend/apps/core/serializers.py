@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from django.conf import settings
 from drf_spectacular.utils import extend_schema_field
 from .models import LLMProvider, LLMModel, PromptTemplate, LLMConfiguration
 
@@ -50,7 +51,7 @@ class LLMConfigurationSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'default_provider', 'default_provider_name', 'default_model', 'default_model_name',
             'default_temperature', 'default_max_tokens', 'enable_streaming', 'enable_caching',
-            'cache_ttl', 'rate_limit_per_minute', 'enable_logging', 'log_level'
+            'cache_ttl', 'cache_max_temperature', 'rate_limit_per_minute', 'enable_logging', 'log_level'
         ]
         read_only_fields = ['id']
 
@@ -92,10 +93,26 @@ class LLMGenerateResponseSerializer(serializers.Serializer):
     error = serializers.CharField(required=False, help_text="Error message if any")
 
 class LanguageDetectionRequestSerializer(serializers.Serializer):
-    content = serializers.CharField(help_text="Text content to analyze for language detection")
+    content = serializers.CharField(required=False, help_text="Text content to analyze for language detection")
+    contents = serializers.ListField(
+        child=serializers.CharField(),
+        required=False,
+        min_length=1,
+        max_length=settings.LANGUAGE_DETECTION_BATCH_MAX_ITEMS,
+        help_text="Several texts to analyze in one request (batch mode)"
+    )
+
+    def validate(self, attrs):
+        if ('content' in attrs) == ('contents' in attrs):
+            raise serializers.ValidationError("Provide either 'content' or 'contents'")
+        return attrs
 
 class LanguageDetectionResponseSerializer(serializers.Serializer):
     language = serializers.CharField(help_text="Detected language code")
     confidence = serializers.FloatField(help_text="Confidence score (0.0 to 1.0)")
     chinese_chars = serializers.IntegerField(help_text="Number of Chinese characters")
-    total_chars = serializers.IntegerField(help_text="Total number of characters")
\ No newline at end of file
+    total_chars = serializers.IntegerField(help_text="Total number of characters")
+    sampled = serializers.BooleanField(help_text="Whether only a sample of a long text was analyzed")
+
+class LanguageDetectionBatchResponseSerializer(serializers.Serializer):
+    results = LanguageDetectionResponseSerializer(many=True, help_text="One result per text, in request order")
\ No newline at end of file
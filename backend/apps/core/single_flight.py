@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """An in-flight call that duplicate callers in this process wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Run a function once per key while identical calls are in flight.
+
+    Within a process, duplicates block on the leader's call and receive its
+    result (or exception). Across workers, the leader holds a lock in the
+    shared cache and publishes its result there, tagged with the lock token so
+    that waiters only accept the result of the call they actually waited on.
+    If the leader fails or the wait times out, the waiter does the work itself.
+    """
+
+    KEY_PREFIX = 'llm_flight'
+
+    _lock = threading.Lock()
+    _calls: Dict[str, _Call] = {}
+
+    @classmethod
+    def do(cls, key: str, fn: Callable[[], Any]) -> Any:
+        with cls._lock:
+            call = cls._calls.get(key)
+            leader = call is None
+            if leader:
+                call = cls._calls[key] = _Call()
+
+        if not leader:
+            logger.debug(f"Joining in-flight LLM request {key[:12]}")
+            if call.event.wait(cls._wait_timeout()):
+                if call.error is not None:
+                    raise call.error
+                return call.result
+            logger.warning(f"Timed out waiting for in-flight LLM request {key[:12]}, running it again")
+            return fn()
+
+        try:
+            call.result = cls._do_shared(key, fn)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with cls._lock:
+                cls._calls.pop(key, None)
+            call.event.set()
+
+    @staticmethod
+    def _lock_timeout() -> int:
+        return getattr(settings, 'LLM_SINGLE_FLIGHT_LOCK_TIMEOUT', 180)
+
+    @classmethod
+    def _wait_timeout(cls) -> float:
+        return getattr(settings, 'LLM_SINGLE_FLIGHT_WAIT_TIMEOUT', cls._lock_timeout())
+
+    @classmethod
+    def _do_shared(cls, key: str, fn: Callable[[], Any]) -> Any:
+        """Coalesce with other workers through the shared cache"""
+        lock_key = f"{cls.KEY_PREFIX}:{key}:lock"
+        result_key = f"{cls.KEY_PREFIX}:{key}:result"
+        token = uuid.uuid4().hex
+        try:
+            acquired = cache.add(lock_key, token, cls._lock_timeout())
+            holder = None if acquired else cache.get(lock_key)
+        except Exception as e:
+            logger.warning(f"Single-flight lock unavailable: {str(e)}")
+            return fn()
+
+        if acquired:
+            try:
+                result = fn()
+                try:
+                    cache.set(result_key, {'token': token, 'value': result},
+                              getattr(settings, 'LLM_SINGLE_FLIGHT_RESULT_TTL', 30))
+                except Exception as e:
+                    logger.warning(f"Single-flight result handoff failed: {str(e)}")
+                return result
+            finally:
+                try:
+                    if cache.get(lock_key) == token:
+                        cache.delete(lock_key)
+                except Exception:
+                    pass
+
+        if holder is None:
+            # Lock released between add and get, nothing left to wait for
+            return fn()
+
+        logger.debug(f"Waiting for LLM request {key[:12]} running in another worker")
+        deadline = time.monotonic() + cls._wait_timeout()
+        interval = 0.05
+        try:
+            while time.monotonic() < deadline:
+                handoff = cache.get(result_key)
+                if handoff is not None and handoff.get('token') == holder:
+                    return handoff['value']
+                if cache.get(lock_key) != holder:
+                    # Leader finished; a last look for its result before giving up
+                    handoff = cache.get(result_key)
+                    if handoff is not None and handoff.get('token') == holder:
+                        return handoff['value']
+                    break
+                time.sleep(interval)
+                interval = min(interval * 2, 0.5)
+        except Exception as e:
+            logger.warning(f"Single-flight result handoff failed: {str(e)}")
+        return fn()
@@ -0,0 +1,207 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from contextvars import ContextVar
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Per-call counters, isolated per thread and per asyncio task
+_current_call: ContextVar[Optional[Dict[str, Any]]] = ContextVar('llm_current_call', default=None)
+
+
+def begin_call() -> Dict[str, Any]:
+    """Start tracking retries and first byte for the call running in this context"""
+    stats = {'started': time.monotonic(), 'retries': 0, 'ttfb': None, 'load_time': None}
+    _current_call.set(stats)
+    return stats
+
+
+def note_retry():
+    stats = _current_call.get()
+    if stats is not None:
+        stats['retries'] += 1
+
+
+def note_first_byte(at: Optional[float] = None):
+    """Record when the first byte of the response arrived (time.monotonic(), default now)"""
+    stats = _current_call.get()
+    if stats is not None and stats['ttfb'] is None:
+        stats['ttfb'] = max((at if at is not None else time.monotonic()) - stats['started'], 0.0)
+
+
+def note_model_load(seconds: Optional[float]):
+    """Record how long the provider spent loading the model for this call"""
+    stats = _current_call.get()
+    if stats is not None and seconds is not None:
+        stats['load_time'] = seconds
+
+
+class TelemetryRecorder:
+    """Buffers LLMCallRecord rows and writes them in batches from a background thread.
+
+    Recording never blocks the caller: when the buffer is full, records are
+    dropped and counted instead.
+    """
+
+    _queue: "queue.Queue" = queue.Queue(maxsize=getattr(settings, 'LLM_TELEMETRY_QUEUE_SIZE', 10000))
+    _thread: Optional[threading.Thread] = None
+    _lock = threading.Lock()
+    dropped = 0
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return getattr(settings, 'LLM_TELEMETRY_ENABLED', True)
+
+    @classmethod
+    def record(cls, service, call_type: str, stats: Dict[str, Any], outcome: str,
+               prompt_tokens: int = 0, completion_tokens: int = 0, error_code: str = ''):
+        """Queue a record for a finished call"""
+        if not cls.enabled():
+            return
+        latency = time.monotonic() - stats['started']
+        ttfb = stats['ttfb']
+        # Generation speed excludes the wait for the first token when it is known
+        generating = latency - ttfb if ttfb is not None else latency
+        load_time = stats.get('load_time')
+        record = {
+            'provider_id': service.provider.pk,
+            'provider_name': service.provider.name,
+            'model_name': service.model.name,
+            'call_type': call_type,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'ttfb': ttfb,
+            'latency': latency,
+            'tokens_per_second': completion_tokens / generating if completion_tokens and generating > 0 else None,
+            'retries': stats['retries'],
+            'outcome': outcome,
+            'error_code': error_code[:50],
+            'load_time': load_time,
+            'cold_start': load_time is not None and load_time >= getattr(settings, 'LLM_COLD_START_THRESHOLD', 1.0),
+            'created_at': timezone.now(),
+        }
+        cls._ensure_worker()
+        try:
+            cls._queue.put_nowait(record)
+        except queue.Full:
+            cls.dropped += 1
+
+    @classmethod
+    def _ensure_worker(cls):
+        if cls._thread is not None and cls._thread.is_alive():
+            return
+        with cls._lock:
+            if cls._thread is None or not cls._thread.is_alive():
+                cls._thread = threading.Thread(target=cls._run, name='llm-telemetry', daemon=True)
+                cls._thread.start()
+
+    @classmethod
+    def _drain(cls, first: Optional[Dict] = None) -> List[Dict]:
+        batch = [first] if first is not None else []
+        batch_size = getattr(settings, 'LLM_TELEMETRY_BATCH_SIZE', 200)
+        while len(batch) < batch_size:
+            try:
+                batch.append(cls._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    @classmethod
+    def _write(cls, batch: List[Dict]):
+        from .models import LLMCallRecord
+
+        if not batch:
+            return
+        try:
+            LLMCallRecord.objects.bulk_create([LLMCallRecord(**record) for record in batch])
+        except Exception as e:
+            logger.warning(f"Dropping {len(batch)} LLM telemetry records: {str(e)}")
+
+    @classmethod
+    def _run(cls):
+        interval = getattr(settings, 'LLM_TELEMETRY_FLUSH_INTERVAL', 5)
+        while True:
+            try:
+                first = cls._queue.get(timeout=interval)
+            except queue.Empty:
+                continue
+            # Let a burst accumulate so it is written in one statement
+            time.sleep(min(interval, 1))
+            close_old_connections()
+            cls._write(cls._drain(first))
+
+    @classmethod
+    def flush(cls):
+        """Write everything buffered so far from the calling thread"""
+        while not cls._queue.empty():
+            cls._write(cls._drain())
+
+
+atexit.register(TelemetryRecorder.flush)
+
+
+# Reporting windows offered by the admin and the stats endpoint
+WINDOWS = {
+    '15m': timedelta(minutes=15),
+    '1h': timedelta(hours=1),
+    '6h': timedelta(hours=6),
+    '24h': timedelta(hours=24),
+    '7d': timedelta(days=7),
+}
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return round(values[index], 4)
+
+
+def latency_summary(window: timedelta, provider_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """p50/p95/p99 of latency, time to first byte and tokens/sec per provider and model.
+
+    Counts are aggregated by the database; percentiles come from at most
+    LLM_TELEMETRY_SUMMARY_MAX_SAMPLES of the most recent successful calls per model.
+    """
+    from .models import LLMCallRecord
+
+    # Warm-up calls are not user traffic
+    queryset = LLMCallRecord.objects.filter(created_at__gte=timezone.now() - window).exclude(call_type='warmup')
+    if provider_id:
+        queryset = queryset.filter(provider_id=provider_id)
+    groups = queryset.values('provider_name', 'model_name').annotate(
+        calls=Count('id'),
+        errors=Count('id', filter=Q(outcome='error')),
+        retries=Sum('retries'),
+        cold_starts=Count('id', filter=Q(cold_start=True)),
+    ).order_by('provider_name', 'model_name')
+    max_samples = getattr(settings, 'LLM_TELEMETRY_SUMMARY_MAX_SAMPLES', 5000)
+
+    summary = []
+    for group in groups:
+        # Cancelled and failed calls say nothing about provider speed
+        samples = list(queryset.filter(
+            provider_name=group['provider_name'], model_name=group['model_name'], outcome='success'
+        ).order_by('-created_at').values_list('latency', 'ttfb', 'tokens_per_second')[:max_samples])
+        entry = {
+            'provider': group['provider_name'],
+            'model': group['model_name'],
+            'calls': group['calls'],
+            'error_rate': round(group['errors'] / group['calls'], 4),
+            'retries': group['retries'] or 0,
+            'cold_starts': group['cold_starts'],
+        }
+        for position, metric in enumerate(('latency', 'ttfb', 'tokens_per_second')):
+            values = sorted(sample[position] for sample in samples if sample[position] is not None)
+            entry[metric] = {f'p{pct}': _percentile(values, pct) for pct in (50, 95, 99)}
+        summary.append(entry)
+    return summary
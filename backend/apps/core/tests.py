@@ -1,3 +1,105 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .llm_cache import LLMResponseCache, LocalLRUCache
+from .models import LLMConfiguration
+
+
+class LocalLRUCacheTests(SimpleTestCase):
+
+    def test_total_size_stays_within_max_bytes(self):
+        local = LocalLRUCache(max_bytes=10)
+        local.set('a', 'aaaa', ttl=60)
+        local.set('b', 'bbbb', ttl=60)
+        local.get('a')  # 'b' is now the least recently used
+        local.set('c', 'cccc', ttl=60)
+
+        self.assertEqual(local.current_bytes, 8)
+        self.assertIsNone(local.get('b'))
+        self.assertEqual(local.get('a'), 'aaaa')
+        self.assertEqual(local.get('c'), 'cccc')
+
+    def test_values_are_measured_in_encoded_bytes(self):
+        local = LocalLRUCache(max_bytes=6)
+        local.set('zh', '论文', ttl=60)
+        self.assertEqual(local.current_bytes, 6)
+        local.set('en', 'x', ttl=60)
+        self.assertIsNone(local.get('zh'))
+        self.assertEqual(local.current_bytes, 1)
+
+    def test_oversized_value_is_not_stored(self):
+        local = LocalLRUCache(max_bytes=4)
+        local.set('a', 'aa', ttl=60)
+        local.set('big', 'x' * 5, ttl=60)
+        self.assertIsNone(local.get('big'))
+        self.assertEqual(local.get('a'), 'aa')
+        self.assertEqual(local.current_bytes, 2)
+
+    def test_entries_expire_after_ttl(self):
+        local = LocalLRUCache(max_bytes=100)
+        with mock.patch('apps.core.llm_cache.time.monotonic', return_value=1000.0):
+            local.set('a', 'aaaa', ttl=30)
+        with mock.patch('apps.core.llm_cache.time.monotonic', return_value=1029.0):
+            self.assertEqual(local.get('a'), 'aaaa')
+        with mock.patch('apps.core.llm_cache.time.monotonic', return_value=1031.0):
+            self.assertIsNone(local.get('a'))
+        self.assertEqual(local.current_bytes, 0)
+        self.assertEqual(len(local), 0)
+
+
+class LLMResponseCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        LLMResponseCache.clear_local()
+        self.addCleanup(LLMResponseCache.clear_local)
+
+    def test_temperature_above_limit_opts_out(self):
+        config = LLMConfiguration(enable_caching=True, cache_ttl=3600, cache_max_temperature=0.3)
+        self.assertTrue(LLMResponseCache.is_cacheable(config, 0.2))
+        self.assertTrue(LLMResponseCache.is_cacheable(config, 0.3))
+        self.assertFalse(LLMResponseCache.is_cacheable(config, 0.7))
+
+    def test_no_temperature_limit_caches_any_temperature(self):
+        config = LLMConfiguration(enable_caching=True, cache_ttl=3600, cache_max_temperature=None)
+        self.assertTrue(LLMResponseCache.is_cacheable(config, 1.5))
+
+    def test_disabled_or_zero_ttl_is_not_cacheable(self):
+        self.assertFalse(LLMResponseCache.is_cacheable(LLMConfiguration(enable_caching=False), 0.0))
+        self.assertFalse(LLMResponseCache.is_cacheable(LLMConfiguration(cache_ttl=0), 0.0))
+
+    def test_shared_tier_is_written_with_ttl(self):
+        with mock.patch('apps.core.llm_cache.cache.set') as shared_set:
+            LLMResponseCache.set('key', 'answer', ttl=45)
+        shared_set.assert_called_once_with(f"{LLMResponseCache.KEY_PREFIX}:key", 'answer', 45)
+
+    def test_stats_count_both_tiers_in_the_shared_cache(self):
+        LLMResponseCache.get('key', ttl=60)
+        LLMResponseCache.set('key', 'answer', ttl=60)
+        LLMResponseCache.get('key', ttl=60)
+        # Another worker has an empty local tier and falls through to the shared cache
+        LLMResponseCache.clear_local()
+        self.assertEqual(LLMResponseCache.get('key', ttl=60), 'answer')
+
+        stats = LLMResponseCache.stats()
+        self.assertEqual(
+            {name: stats[name] for name in LLMResponseCache.COUNTERS},
+            {'local_hits': 1, 'shared_hits': 1, 'misses': 1, 'stores': 1},
+        )
+        self.assertAlmostEqual(stats['hit_ratio'], 2 / 3)
+
+    def test_telemetry_stats_endpoint_reports_cache_counters(self):
+        admin = get_user_model().objects.create_superuser(email='admin@example.com', password='pass')
+        LLMResponseCache.get('key', ttl=60)
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        response = client.get(reverse('llm_telemetry_stats'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['response_cache']['misses'], 1)
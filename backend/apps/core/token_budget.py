@@ -0,0 +1,87 @@
+import math
+import re
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+# One token per CJK ideograph/kana/hangul syllable or full-width symbol
+CJK_CHARS = r'\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef'
+TOKEN_PATTERN = re.compile(
+    rf'[{CJK_CHARS}]'        # CJK character
+    r'|\d{1,3}'              # digits are split in groups of up to three
+    rf'|[^\W\d_{CJK_CHARS}]+'  # a run of letters (any script)
+    r'|\n+'                  # line breaks
+    r'|\s+'                  # other whitespace merges into the next token
+    r'|[^\w\s]'              # punctuation and symbols
+)
+
+# Chat formats add a few tokens per message for role and separators
+MESSAGE_OVERHEAD = 4
+REPLY_PRIMING = 3
+
+
+class TokenBudgetExceeded(ValueError):
+    """Raised when a prompt leaves no room for the response in the model's context window"""
+
+    def __init__(self, prompt_tokens: int, context_length: int, min_output_tokens: int):
+        super().__init__(
+            f"Prompt of ~{prompt_tokens} tokens leaves less than {min_output_tokens} tokens "
+            f"for the response in a {context_length} token context window"
+        )
+        self.prompt_tokens = prompt_tokens
+        self.context_length = context_length
+        self.min_output_tokens = min_output_tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate BPE token count of text without a model-specific tokenizer.
+
+    Tuned to slightly over-estimate for English and Chinese so that budgets
+    computed from it stay on the safe side.
+    """
+    if not text:
+        return 0
+    count = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        piece = match.group()
+        first = piece[0]
+        if first.isspace() and first != '\n':
+            continue
+        if first.isalpha() and len(piece) > 1:
+            # Common words are one token, longer words split every ~5 characters
+            count += 1 + (len(piece) - 1) // 5
+        else:
+            count += 1
+    return count
+
+
+def estimate_messages_tokens(messages: List[Dict]) -> int:
+    """Approximate prompt size of a chat request"""
+    total = REPLY_PRIMING
+    for message in messages:
+        content = message.get('content') or ''
+        if not isinstance(content, str):
+            content = str(content)
+        total += estimate_tokens(content) + MESSAGE_OVERHEAD
+    return total
+
+
+def fit_max_tokens(prompt_tokens: int, requested: Optional[int], context_length: int,
+                   model_max_tokens: Optional[int] = None) -> int:
+    """Largest allowed response size for a prompt, capped at what was requested.
+
+    Raises TokenBudgetExceeded when fewer than LLM_MIN_OUTPUT_TOKENS would remain.
+    """
+    margin = getattr(settings, 'LLM_TOKEN_ESTIMATE_MARGIN', 1.1)
+    min_output = getattr(settings, 'LLM_MIN_OUTPUT_TOKENS', 256)
+    padded_prompt = math.ceil(prompt_tokens * margin)
+    available = context_length - padded_prompt
+    if available < min_output:
+        raise TokenBudgetExceeded(prompt_tokens, context_length, min_output)
+
+    limits = [available]
+    if requested:
+        limits.append(requested)
+    if model_max_tokens:
+        limits.append(model_max_tokens)
+    return min(limits)
@@ -16,6 +16,9 @@ urlpatterns = [
     # Language Detection
     path('detect-language/', views.detect_language, name='detect_language'),
     
+    # Telemetry
+    path('telemetry/stats/', views.llm_telemetry_stats, name='llm_telemetry_stats'),
+    
     # Configuration
     # path('prompt-templates/', views.get_prompt_templates, name='get_prompt_templates'),
     # path('providers/', views.get_llm_providers, name='get_llm_providers'),  # legacy, active only
@@ -1,19 +1,24 @@
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
-from drf_spectacular.utils import extend_schema, OpenApiParameter
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
+from drf_spectacular.utils import extend_schema, OpenApiParameter, PolymorphicProxySerializer
 from drf_spectacular.openapi import OpenApiTypes
 from django.http import StreamingHttpResponse
-import json
 import logging
 
 from apps.core.llm_service import LLMManager, PromptService
+from apps.core.llm_cache import LLMResponseCache
+from apps.core.language_detection import detect_language_details, detect_languages
+from apps.core.rate_limiter import RateLimitExceeded
+from apps.core.serialization import sse_event
+from apps.core.telemetry import WINDOWS, TelemetryRecorder, latency_summary
 from apps.core.models import PromptTemplate, LLMProvider, LLMModel
 from .serializers import (
     LLMGenerateRequestSerializer, LLMGenerateResponseSerializer,
     PromptTemplateSerializer, LLMProviderSerializer, LLMModelSerializer,
-    LanguageDetectionRequestSerializer, LanguageDetectionResponseSerializer
+    LanguageDetectionRequestSerializer, LanguageDetectionResponseSerializer,
+    LanguageDetectionBatchResponseSerializer
 )
 
 logger = logging.getLogger(__name__)
@@ -37,7 +42,9 @@ def generate_content(request):
     variables = serializer.validated_data.get('variables', {})
     
     try:
-        llm_manager = LLMManager()
+        # Fail fast when over the provider rate limit so the client can retry later;
+        # short interactive calls are hedged against a second provider
+        llm_manager = LLMManager(rate_limit_wait=0, hedge=True)
         
         # Generate response with prompt guiding
         response = llm_manager.generate_with_prompt(
@@ -57,6 +64,11 @@ def generate_content(request):
             'success': True
         })
         
+    except RateLimitExceeded as e:
+        return Response({
+            'error': str(e),
+            'success': False
+        }, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': e.retry_after_header})
     except Exception as e:
         logger.error(f"Error generating content: {e}")
         return Response({
@@ -83,12 +95,14 @@ def stream_content(request):
     variables = serializer.validated_data.get('variables', {})
     
     try:
-        llm_manager = LLMManager()
+        llm_manager = LLMManager(rate_limit_wait=0)
+        # Take the rate limit slot before the stream starts so we can still answer 429
+        llm_manager.llm_service.reserve_rate_limit()
         
         def generate():
             # Send initial metadata
             detected_language = PromptService.detect_language(user_input) if not language else language
-            yield f"data: {json.dumps({'type': 'metadata', 'detected_language': detected_language, 'prompt_name': prompt_name})}\n\n"
+            yield sse_event({'type': 'metadata', 'detected_language': detected_language, 'prompt_name': prompt_name})
             
             # Stream the response
             for chunk in llm_manager.stream_with_prompt(
@@ -97,10 +111,10 @@ def stream_content(request):
                 language=language,
                 **variables
             ):
-                yield f"data: {json.dumps({'type': 'content', 'chunk': chunk})}\n\n"
+                yield sse_event({'type': 'content', 'chunk': chunk})
             
             # Send completion signal
-            yield f"data: {json.dumps({'type': 'done'})}\n\n"
+            yield sse_event({'type': 'done'})
         
         response = StreamingHttpResponse(
             generate(),
@@ -108,8 +122,15 @@ def stream_content(request):
         )
         response['Cache-Control'] = 'no-cache'
         response['Connection'] = 'keep-alive'
+        # Disable proxy buffering so chunks reach the client immediately
+        response['X-Accel-Buffering'] = 'no'
         return response
         
+    except RateLimitExceeded as e:
+        return Response({
+            'error': str(e),
+            'success': False
+        }, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': e.retry_after_header})
     except Exception as e:
         logger.error(f"Error streaming content: {e}")
         return Response({
@@ -162,9 +183,16 @@ def get_prompt_templates(request):
 
 @extend_schema(
     summary="Detect language of text",
-    description="Detect the language of provided text (Chinese vs English)",
+    description=(
+        "Detect the language of provided text from the scripts it uses. "
+        "Send 'contents' instead of 'content' to analyze several texts at once."
+    ),
     request=LanguageDetectionRequestSerializer,
-    responses={200: LanguageDetectionResponseSerializer}
+    responses={200: PolymorphicProxySerializer(
+        component_name='LanguageDetectionResult',
+        serializers=[LanguageDetectionResponseSerializer, LanguageDetectionBatchResponseSerializer],
+        resource_type_field_name=None
+    )}
 )
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -172,28 +200,50 @@ def detect_language(request):
     """Detect language of provided text"""
     serializer = LanguageDetectionRequestSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
-    content = serializer.validated_data['content']
     
-    detected_language = PromptService.detect_language(content)
-    
-    # Calculate confidence based on character analysis
-    chinese_chars = sum(1 for char in content if '\u4e00' <= char <= '\u9fff')
-    total_chars = len(content.replace(' ', ''))
-    
-    if total_chars == 0:
-        confidence = 0.0
-    else:
-        chinese_ratio = chinese_chars / total_chars
-        if detected_language == 'zh-hans':
-            confidence = min(chinese_ratio * 2, 1.0)  # Scale up confidence for Chinese
-        else:
-            confidence = min((1 - chinese_ratio) * 2, 1.0)  # Scale up confidence for English
+    if 'contents' in serializer.validated_data:
+        return Response({'results': detect_languages(serializer.validated_data['contents'])})
+    return Response(detect_language_details(serializer.validated_data['content']))
+
+
+@extend_schema(
+    summary="LLM call latency statistics",
+    description="p50/p95/p99 latency, time to first byte and tokens/sec per provider and model, "
+                "plus response cache hit/miss counters",
+    parameters=[
+        OpenApiParameter(
+            name='window',
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            description='Time window: 15m, 1h, 6h, 24h or 7d (default 1h)'
+        ),
+        OpenApiParameter(
+            name='provider',
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            description='Limit to one provider ID'
+        ),
+    ],
+    responses={200: OpenApiTypes.OBJECT}
+)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def llm_telemetry_stats(request):
+    """Latency percentiles of recent LLM calls"""
+    window = request.query_params.get('window', '1h')
+    if window not in WINDOWS:
+        return Response({
+            'error': f"Invalid window, choose one of: {', '.join(WINDOWS)}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+    provider_id = request.query_params.get('provider')
+    if provider_id and not provider_id.isdigit():
+        return Response({'error': 'provider must be an ID'}, status=status.HTTP_400_BAD_REQUEST)
     
     return Response({
-        'language': detected_language,
-        'confidence': confidence,
-        'chinese_chars': chinese_chars,
-        'total_chars': total_chars
+        'window': window,
+        'results': latency_summary(WINDOWS[window], provider_id=int(provider_id) if provider_id else None),
+        'dropped_records': TelemetryRecorder.dropped,
+        'response_cache': LLMResponseCache.stats()
     })
 
 
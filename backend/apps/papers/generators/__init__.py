@@ -7,6 +7,11 @@ This module initializes the paper generation system.
 from .paper_generator import PaperGenerator, PaperGenerationError, PaperFormatManager, PaperExportService
 from .template_manager import TemplateManager, TemplateValidator, TemplateRecommendationEngine
 from .format_service import PaperFormatService, FormatTemplateGenerator
+from .chunked_formatter import ChunkedPaperFormatter
+from .batch_generator import BatchPaperGenerator
+from .section_generator import SectionedPaperGenerator, generator_for
+from .job_queue import PaperJobQueue
+from .section_parser import SectionParser
 from .utils import ContentProcessor, CitationFormatter, PaperValidator, PaperMetrics, FileNameGenerator
 
 __all__ = [
@@ -19,6 +24,12 @@ __all__ = [
     'TemplateRecommendationEngine',
     'PaperFormatService',
     'FormatTemplateGenerator',
+    'ChunkedPaperFormatter',
+    'BatchPaperGenerator',
+    'SectionedPaperGenerator',
+    'generator_for',
+    'PaperJobQueue',
+    'SectionParser',
     'ContentProcessor',
     'CitationFormatter',
     'PaperValidator',
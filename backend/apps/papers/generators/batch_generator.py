@@ -0,0 +1,98 @@
+"""
+Batch Paper Generation
+
+This module handles many papers for one user at once. Batches are normally
+queued as paper jobs; streamed batches generate their items concurrently,
+with the concurrency bounded by the capacity of the LLM provider serving them.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Generator, List
+
+from django.conf import settings
+from django.db import connections
+
+from apps.core.llm_service import LLMService, extract_html_from_response
+from apps.papers.models import PaperTemplate
+from .job_queue import PaperJobQueue
+from .paper_generator import PaperGenerationError
+from .section_generator import generator_for
+
+logger = logging.getLogger(__name__)
+
+
+class BatchPaperGenerator:
+    """Generate papers from many (template, user_inputs) items through a per-provider worker pool"""
+
+    _executors: Dict[int, tuple] = {}
+    _executors_lock = threading.Lock()
+
+    def __init__(self, user):
+        self.user = user
+        self.provider = LLMService().provider
+
+    @classmethod
+    def executor_for(cls, provider) -> ThreadPoolExecutor:
+        """Worker pool shared by every batch on a provider, sized by its pool_size"""
+        size = max(min(provider.pool_size, getattr(settings, 'PAPER_BATCH_MAX_WORKERS', 8)), 1)
+        with cls._executors_lock:
+            entry = cls._executors.get(provider.pk)
+            if entry is None or entry[0] != size:
+                if entry is not None:
+                    entry[1].shutdown(wait=False)
+                entry = (size, ThreadPoolExecutor(max_workers=size, thread_name_prefix=f'paper-batch-{provider.pk}'))
+                cls._executors[provider.pk] = entry
+            return entry[1]
+
+    def prepare(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Attach templates to the items, loading them in one query"""
+        template_ids = {item['template_id'] for item in items}
+        templates = PaperTemplate.objects.select_related('format').filter(
+            id__in=template_ids, is_active=True, is_deleted=False
+        ).in_bulk()
+        missing = template_ids - set(templates)
+        if missing:
+            raise PaperGenerationError(f"Invalid template IDs: {sorted(missing)}")
+        return [{**item, 'template': templates[item['template_id']]} for item in items]
+
+    @staticmethod
+    def required_credits(prepared: List[Dict[str, Any]]) -> int:
+        return sum(item['template'].estimated_credits for item in prepared)
+
+    def _run_item(self, index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            # Credit holds are atomic in the database, so items can charge the shared user concurrently
+            generator = generator_for(item['template'], self.user, item.get('mode'))
+            paper = generator.generate(item['user_inputs'], item.get('title'))
+            if paper.content:
+                paper.content = extract_html_from_response(paper.content)
+                paper.save(update_fields=['content'])
+            return {'index': index, 'status': 'completed', 'paper_id': paper.id, 'title': paper.title}
+        except Exception as e:
+            logger.warning(f"Batch item {index} failed: {str(e)}")
+            return {'index': index, 'status': 'failed', 'error': str(e)}
+        finally:
+            # Worker threads keep their own DB connections
+            connections.close_all()
+
+    def enqueue(self, prepared: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Charge for and queue every item as a paper job; workers generate them"""
+        results = []
+        for index, item in enumerate(prepared):
+            try:
+                paper = PaperJobQueue.enqueue(item['template'], self.user, item['user_inputs'],
+                                              item.get('title'), mode=item.get('mode'))
+                results.append({'index': index, 'status': paper.status, 'paper_id': paper.id, 'title': paper.title})
+            except PaperGenerationError as e:
+                logger.warning(f"Batch item {index} could not be queued: {str(e)}")
+                results.append({'index': index, 'status': 'failed', 'error': str(e)})
+        return results
+
+    def iter_results(self, prepared: List[Dict[str, Any]]) -> Generator[Dict[str, Any], None, None]:
+        """Yield per-item results as they complete"""
+        executor = self.executor_for(self.provider)
+        futures = [executor.submit(self._run_item, index, item) for index, item in enumerate(prepared)]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,205 @@
+"""
+Chunked Paper Formatter
+
+This module formats documents that do not fit a single LLM call by splitting
+them on structural boundaries, formatting the parts concurrently and stitching
+the results back together in order.
+"""
+
+import logging
+import re
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+
+from apps.core.async_llm_service import AsyncLLMManager
+from apps.core.token_budget import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Builds the chat messages for one piece of text plus extra instructions
+MessageBuilder = Callable[[str, str], List[Dict]]
+
+CJK_PATTERN = re.compile(r'[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]')
+SENTENCE_END = re.compile(r'(?<=[.!?。！？；;])\s+|(?<=[。！？])')
+HEADING_PATTERNS = [
+    re.compile(r'^#{1,6}\s+\S'),                                         # Markdown
+    re.compile(r'^(\d+(\.\d+)*\.?|[IVXLC]+\.)\s+\S.{0,80}$'),            # 1. / 2.3 / IV.
+    re.compile(r'^(chapter|section|part|appendix)\s+[\dIVXLC]+\b', re.I),
+    re.compile(r'^第[一二三四五六七八九十百\d]+[章节部分]'),
+    re.compile(r'^(abstract|introduction|background|related work|literature review|methods?|methodology|'
+               r'results?|discussion|conclusions?|references|bibliography|acknowledge?ments?|appendix|'
+               r'摘要|引言|绪论|结论|参考文献|致谢)\s*:?$', re.I),
+]
+
+
+def _is_heading(line: str) -> bool:
+    line = line.strip()
+    if not line or len(line) > 120:
+        return False
+    if any(pattern.match(line) for pattern in HEADING_PATTERNS):
+        return True
+    # Short ALL-CAPS lines are headings in most extracted PDFs
+    letters = [c for c in line if c.isalpha()]
+    return len(letters) >= 3 and len(line) <= 80 and all(c.isupper() for c in letters)
+
+
+class ChunkedPaperFormatter:
+    """Format a document with as many parallel LLM calls as its length requires"""
+
+    PART_NOTE = "This is part {index} of {total} of a longer document."
+
+    def __init__(self, llm_manager, output_format: str = 'html', max_workers: Optional[int] = None,
+                 citation_style: str = ''):
+        self.llm_manager = llm_manager
+        self.output_format = (output_format or 'html').lower()
+        self.citation_style = citation_style
+        service = llm_manager.llm_service
+        self.model = service.model
+        self.max_workers = max_workers or min(
+            getattr(settings, 'LLM_CHUNK_MAX_WORKERS', 4),
+            max(service.provider.pool_size, 1)
+        )
+
+    def _overhead(self, build_messages: MessageBuilder, outline: List[str]) -> int:
+        """Tokens taken by everything in a chunk request except the chunk text"""
+        overhead = sum(estimate_tokens(m['content']) for m in build_messages('', self._part_note(1, 2, outline)))
+        return overhead + getattr(settings, 'LLM_CHUNK_PROMPT_RESERVE', 256)
+
+    def chunk_budget(self, build_messages: MessageBuilder, outline: Optional[List[str]] = None) -> int:
+        """Input tokens a single chunk may use so that prompt and output fit the model"""
+        overhead = self._overhead(build_messages, outline or [])
+        ratio = getattr(settings, 'LLM_CHUNK_OUTPUT_RATIO', 1.5)
+        # The formatted output is roughly as long as the input plus markup
+        by_context = (self.model.context_length - overhead) / (1 + ratio)
+        by_output = self.model.max_tokens / ratio
+        return max(int(min(by_context, by_output)), getattr(settings, 'LLM_CHUNK_MIN_TOKENS', 256))
+
+    def split(self, text: str, budget: int) -> List[str]:
+        """Split text into chunks of at most ``budget`` tokens, preferring section breaks"""
+        chunks: List[str] = []
+        current: List[str] = []
+        current_tokens = 0
+
+        def flush():
+            nonlocal current, current_tokens
+            if current:
+                chunks.append('\n'.join(current).strip('\n'))
+            current, current_tokens = [], 0
+
+        for unit in self._units(text, budget):
+            tokens = estimate_tokens(unit) + 1
+            heading = _is_heading(unit)
+            # Start a new chunk at a heading once the current one is reasonably full
+            if current and (current_tokens + tokens > budget or (heading and current_tokens > budget // 2)):
+                flush()
+            current.append(unit)
+            current_tokens += tokens
+        flush()
+        return [chunk for chunk in chunks if chunk.strip()]
+
+    def _units(self, text: str, budget: int):
+        """Paragraphs (lines) of the text, with oversized ones cut at sentence boundaries"""
+        for line in text.splitlines():
+            if estimate_tokens(line) <= budget:
+                yield line
+                continue
+            piece = ''
+            for sentence in SENTENCE_END.split(line):
+                if piece and estimate_tokens(piece + sentence) > budget:
+                    yield piece
+                    piece = ''
+                while estimate_tokens(sentence) > budget:
+                    # A single run-on "sentence" larger than the budget: hard cut
+                    cut = max(budget, 1) * (1 if CJK_PATTERN.search(sentence) else 4)
+                    yield sentence[:cut]
+                    sentence = sentence[cut:]
+                piece = f"{piece} {sentence}" if piece else sentence
+            if piece:
+                yield piece
+
+    @staticmethod
+    def outline(text: str, limit: int = 60) -> List[str]:
+        """Headings of the source document, shared with every chunk for consistency"""
+        headings = [line.strip()[:100] for line in text.splitlines() if _is_heading(line)]
+        return headings[:limit]
+
+    def _part_note(self, index: int, total: int, outline: List[str]) -> str:
+        lines = [self.PART_NOTE.format(index=index, total=total)]
+        if index == 1:
+            lines.append("Start the document (title, preamble, document opening) but do not close it.")
+        elif index == total:
+            lines.append("Continue the document without repeating the title or preamble, and close it properly.")
+        else:
+            lines.append("Continue the document: no title, no preamble, no document opening or closing.")
+        lines.append("Format only the text of this part; do not summarize, skip or invent content.")
+        lines.append(
+            "Keep in-text citation markers exactly as they appear in the source"
+            + (f" and follow the {self.citation_style} citation style." if self.citation_style else ".")
+            + " Only produce a reference list if this part contains the source's references."
+        )
+        if outline:
+            lines.append(
+                "Outline of the whole document, use it for consistent heading levels and numbering:\n"
+                + "\n".join(f"- {heading}" for heading in outline)
+            )
+        return "\n".join(lines)
+
+    def format(self, text: str, build_messages: MessageBuilder, **kwargs) -> str:
+        """Format the text, in one call when it fits and map-reduce style otherwise"""
+        if estimate_tokens(text) <= self.chunk_budget(build_messages):
+            return self.llm_manager.generate_response(build_messages(text, ''), **kwargs)
+
+        outline = self.outline(text)
+        budget = self.chunk_budget(build_messages, outline)
+        overhead = self._overhead(build_messages, outline)
+        chunks = self.split(text, budget)
+        total = len(chunks)
+        logger.info(
+            f"Formatting document of ~{estimate_tokens(text)} tokens in {total} chunks "
+            f"(budget {budget}, {self.max_workers} workers)"
+        )
+
+        requests = []
+        for index, chunk in enumerate(chunks):
+            messages = build_messages(chunk, self._part_note(index + 1, total, outline))
+            # Leave the rest of the context window to the output
+            room = self.model.context_length - overhead - estimate_tokens(chunk)
+            requests.append((messages, {'max_tokens': max(min(self.model.max_tokens, room), 1), **kwargs}))
+
+        # The chunks run concurrently on one event loop rather than a thread each
+        service = self.llm_manager.llm_service
+        results = AsyncLLMManager.generate_all_sync(
+            requests, provider=service.provider, model=service.model, max_concurrency=self.max_workers
+        )
+        return self.stitch(results)
+
+    def stitch(self, parts: List[str]) -> str:
+        """Join formatted parts, dropping per-part wrappers the model repeated at the seams"""
+        cleaned = []
+        last = len(parts) - 1
+        title = None
+        for index, part in enumerate(parts):
+            part = re.sub(r'^\s*```[a-zA-Z]*\s*\n|\n\s*```\s*$', '', part.strip())
+            if self.output_format == 'latex':
+                if index > 0:
+                    part = re.sub(r'^[\s\S]*?\\begin\{document\}', '', part, count=1)
+                    part = re.sub(r'\\maketitle\s*', '', part, count=1)
+                if index < last:
+                    part = part.replace('\\end{document}', '')
+            elif self.output_format in ('html', 'pdf', 'docx') and '<' in part:
+                if index > 0:
+                    part = re.sub(r'^[\s\S]*?<body[^>]*>', '', part, count=1, flags=re.I)
+                    part = re.sub(r'^\s*<!DOCTYPE[^>]*>|^\s*<html[^>]*>', '', part, flags=re.I)
+                if index < last:
+                    part = re.sub(r'</body>\s*</html>\s*$|</html>\s*$', '', part, flags=re.I)
+            part = part.strip()
+
+            # Drop a repeated document title at the start of later parts
+            if index == 0:
+                body = re.sub(r'^[\s\S]*?(\\begin\{document\}|<body[^>]*>)', '', part, count=1, flags=re.I)
+                title = next((line.strip() for line in body.splitlines() if line.strip()), None)
+            elif title and part and part.splitlines()[0].strip() == title:
+                part = part[len(part.splitlines()[0]):].lstrip()
+            cleaned.append(part)
+        return '\n\n'.join(part for part in cleaned if part)
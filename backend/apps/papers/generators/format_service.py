@@ -6,6 +6,7 @@ This module handles paper format operations and structure management.
 
 from typing import Dict, List, Any, Optional
 from apps.papers.models import PaperFormat, PaperTemplate
+from apps.core.prompt_layout import canonical_json
 
 
 class PaperFormatService:
@@ -329,10 +330,10 @@ Key requirements:
 - Ensure logical flow and coherent arguments
 
 Style Guidelines:
-{format_obj.style_guidelines}
+{(format_obj.style_guidelines or '').strip()}
 
 Paper Structure:
-{format_obj.template_structure}
+{canonical_json(format_obj.template_structure)}
 
 Generate a complete, well-structured academic paper that meets all requirements."""
     
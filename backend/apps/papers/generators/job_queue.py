@@ -0,0 +1,190 @@
+"""
+Paper Generation Jobs
+
+The API creates papers in 'pending' state and returns immediately; workers
+generate them in the background. With PAPER_JOB_BACKEND = 'celery' each
+paper is handed to a Celery task, otherwise `manage.py run_paper_worker`
+processes claim pending papers straight from the database.
+"""
+
+import logging
+from contextlib import nullcontext
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.billing.credits import CreditLedger
+from apps.core.llm_service import extract_html_from_response
+from apps.papers.models import GeneratedPaper
+from .paper_generator import PaperGenerationError
+from .section_generator import generator_for
+
+logger = logging.getLogger(__name__)
+
+
+class PaperJobQueue:
+    """Queue of papers waiting to be generated"""
+
+    @staticmethod
+    def backend() -> str:
+        return getattr(settings, 'PAPER_JOB_BACKEND', 'database')
+
+    @classmethod
+    def enqueue(cls, template, user, user_inputs: Dict[str, Any], title: str = None,
+                mode: Optional[str] = None) -> GeneratedPaper:
+        """Create and charge for a pending paper; a worker picks it up once the transaction commits"""
+        generator = generator_for(template, user, mode)
+        try:
+            paper = generator.create_paper(user_inputs, title, status='pending')
+        except PaperGenerationError:
+            raise
+        except Exception as e:
+            raise PaperGenerationError(f"Generation failed: {str(e)}")
+
+        cls._dispatch(paper.pk)
+        return paper
+
+    @classmethod
+    def resume(cls, paper: GeneratedPaper) -> bool:
+        """Queue a failed paper again; the worker continues from its checkpoint.
+
+        Its credits were refunded when it failed, so they are held again.
+        False when the paper is not failed (anymore); raises
+        InsufficientCreditsError when the user cannot afford it.
+        """
+        with transaction.atomic():
+            resumed = GeneratedPaper.objects.filter(pk=paper.pk, status='failed', is_deleted=False).update(
+                status='pending',
+                error_message='',
+                attempts=0,
+                updated_at=timezone.now()
+            )
+            if not resumed:
+                return False
+            CreditLedger.hold(paper.user, paper.template.estimated_credits,
+                              f"Paper generation (resumed): {paper.title}", paper=paper)
+        paper.status, paper.error_message, paper.attempts = 'pending', '', 0
+        cls._dispatch(paper.pk)
+        return True
+
+    @classmethod
+    def _dispatch(cls, paper_id: int):
+        if cls.backend() != 'celery':
+            return
+        from apps.papers.tasks import generate_paper_task
+
+        def send():
+            try:
+                generate_paper_task.delay(paper_id)
+            except Exception as e:
+                # Nothing would ever pick the paper up; fail it (it can be resumed) and refund it
+                logger.error(f"Could not queue paper {paper_id}: {str(e)}")
+                cls._fail_unqueued(paper_id)
+
+        transaction.on_commit(send)
+
+    @staticmethod
+    def _fail_unqueued(paper_id: int):
+        error_message = 'Generation could not be queued; please try again'
+        if GeneratedPaper.objects.filter(pk=paper_id, status='pending').update(
+            status='failed', error_message=error_message, updated_at=timezone.now()
+        ):
+            CreditLedger.release_paper(paper_id, error_message)
+
+    @staticmethod
+    def _stale() -> Q:
+        """Jobs in progress whose worker is presumed dead"""
+        timeout = timedelta(seconds=getattr(settings, 'PAPER_JOB_TIMEOUT', 1800))
+        # Only queued jobs have attempts; papers generated inside a request are left alone
+        return Q(status='generating', attempts__gt=0, started_at__lt=timezone.now() - timeout)
+
+    @classmethod
+    def claim(cls, paper_id: Optional[int] = None) -> Optional[int]:
+        """Mark a pending paper (the oldest one unless paper_id is given) as generating; None when there is none.
+
+        A task for a given paper may also take it over from a worker that died
+        mid-generation, as long as the paper has attempts left.
+
+        SKIP LOCKED keeps workers from queueing behind each other's row locks;
+        the conditional update settles races on databases without it (SQLite,
+        where a read-then-write transaction would only fail with "locked").
+        """
+        claimable = Q(status='pending')
+        if paper_id is not None:
+            claimable |= cls._stale() & Q(attempts__lt=getattr(settings, 'PAPER_JOB_MAX_ATTEMPTS', 3))
+        skip_locked = connection.features.has_select_for_update_skip_locked
+        while True:
+            with transaction.atomic() if skip_locked else nullcontext():
+                pending = GeneratedPaper.objects.filter(claimable, is_deleted=False)
+                if paper_id is not None:
+                    pending = pending.filter(pk=paper_id)
+                if skip_locked:
+                    pending = pending.select_for_update(skip_locked=True)
+                candidate = pending.order_by('created_at').values_list('pk', flat=True).first()
+                if candidate is None:
+                    return None
+                claimed = GeneratedPaper.objects.filter(claimable, pk=candidate).update(
+                    status='generating',
+                    started_at=timezone.now(),
+                    attempts=F('attempts') + 1,
+                    updated_at=timezone.now()
+                )
+            if claimed:
+                return candidate
+            if paper_id is not None:
+                return None
+
+    @staticmethod
+    def run(paper_id: int) -> Optional[GeneratedPaper]:
+        """Generate a claimed paper; failures are recorded on the paper"""
+        try:
+            paper = GeneratedPaper.objects.select_related('template', 'template__format', 'user').get(pk=paper_id)
+            generator = generator_for(paper.template, paper.user, paper.generation_parameters.get('mode', 'single'))
+            try:
+                generator.run(paper)
+            except PaperGenerationError as e:
+                logger.warning(f"Paper {paper_id} failed: {str(e)}")
+                return paper
+            if paper.content:
+                paper.content = extract_html_from_response(paper.content)
+                paper.save(update_fields=['content'])
+            return paper
+        finally:
+            close_old_connections()
+
+    @classmethod
+    def process_next(cls) -> bool:
+        """Claim and generate the oldest pending paper; False when the queue is empty"""
+        paper_id = cls.claim()
+        if paper_id is None:
+            return False
+        cls.run(paper_id)
+        return True
+
+    @classmethod
+    def requeue_stale(cls) -> int:
+        """Put papers back in the queue whose worker died mid-generation, or fail them after too many attempts"""
+        max_attempts = getattr(settings, 'PAPER_JOB_MAX_ATTEMPTS', 3)
+        stale = GeneratedPaper.objects.filter(cls._stale())
+        requeue_ids = list(stale.filter(attempts__lt=max_attempts).values_list('pk', flat=True))
+        requeued = GeneratedPaper.objects.filter(cls._stale(), pk__in=requeue_ids).update(
+            status='pending', updated_at=timezone.now()
+        )
+        # Celery will not redeliver a task that was acknowledged or lost with its worker
+        for paper_id in requeue_ids:
+            cls._dispatch(paper_id)
+        error_message = 'Generation did not finish; the worker stopped responding'
+        failed = 0
+        for paper in stale.filter(attempts__gte=max_attempts):
+            if GeneratedPaper.objects.filter(pk=paper.pk, status='generating').update(
+                status='failed', error_message=error_message, updated_at=timezone.now()
+            ):
+                CreditLedger.release_paper(paper, error_message)
+                failed += 1
+        if requeued or failed:
+            logger.warning(f"Requeued {requeued} and failed {failed} stale paper jobs")
+        return requeued
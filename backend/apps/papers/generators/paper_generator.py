@@ -4,15 +4,28 @@ Paper Generation Service
 This module handles the generation of academic papers using AI templates.
 """
 
+import hashlib
 import json
+import re
 import time
 from typing import Dict, Any, Optional, Generator
 from datetime import datetime, timedelta
 from django.conf import settings
+from django.db.models import F
 from django.utils import timezone
 from apps.papers.models import PaperTemplate, GeneratedPaper, PaperSection
+from apps.billing.credits import CreditLedger, InsufficientCreditsError
 from apps.billing.models import CreditTransaction
-from apps.core.llm_service import LLMManager, PromptService
+from apps.core.llm_service import LLMManager, LLMServiceError, PromptService
+from apps.core.output_sanitizer import OutputSanitizer, sanitize
+from apps.core.token_budget import estimate_messages_tokens
+from .section_parser import SectionParser
+
+
+CONTINUE_INSTRUCTION = (
+    "Your previous answer was cut off. Continue the document exactly where it stops, "
+    "without repeating anything already written."
+)
 
 
 class PaperGenerationError(Exception):
@@ -20,9 +33,20 @@ class PaperGenerationError(Exception):
     pass
 
 
+def prompt_hash(*parts: str) -> str:
+    """Fingerprint of the prompts a checkpoint was written for"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
 class PaperGenerator:
     """Main paper generation class"""
     
+    mode = 'single'
+    
     def __init__(self, template: PaperTemplate, user):
         self.template = template
         self.user = user
@@ -107,33 +131,106 @@ class PaperGenerator:
         
         return system_prompt, user_prompt
     
+    def build_generation_parameters(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+        """Model settings for the request, with max_tokens fitted to the model's context window"""
+        service = self.llm_manager.llm_service
+        messages = [
+            {'role': 'system', 'content': system_prompt},
+            {'role': 'user', 'content': user_prompt}
+        ]
+        try:
+            max_tokens = service.budget_max_tokens(messages)
+        except LLMServiceError as e:
+            raise PaperGenerationError(
+                f"Inputs are too long for model {service.model.name}: "
+                f"~{e.details['prompt_tokens']} prompt tokens, context window is {e.details['context_length']}"
+            )
+        return {
+            'model': service.model.name,
+            'temperature': service.config.default_temperature,
+            'max_tokens': max_tokens,
+            'prompt_tokens': estimate_messages_tokens(messages),
+        }
+    
+    def checkpoint(self, paper: GeneratedPaper, **state) -> Dict[str, Any]:
+        """Save generation progress to recovery_context so a failed paper can be resumed"""
+        context = {**(paper.recovery_context or {}), **state, 'mode': self.mode, 'updated_at': timezone.now().isoformat()}
+        paper.recovery_context = context
+        # Only this field: the paper row may be saved elsewhere while generation is running
+        GeneratedPaper.objects.filter(pk=paper.pk).update(recovery_context=context)
+        return context
+    
+    def restore(self, paper: GeneratedPaper, fingerprint: str) -> Dict[str, Any]:
+        """Checkpoint of an earlier attempt with the same prompts; empty when there is none"""
+        context = paper.recovery_context or {}
+        if context.get('mode') != self.mode or context.get('prompt_hash') != fingerprint:
+            return {}
+        return context
+    
+    def stream_continuation(self, user_prompt: str, language: str, partial: str) -> Generator[str, None, None]:
+        """Stream the rest of a paper from the part saved before the previous attempt failed"""
+        messages = [
+            {'role': 'system', 'content': self.llm_manager._get_system_prompt('academic_paper_formatter', language, {})},
+            {'role': 'user', 'content': user_prompt},
+            {'role': 'assistant', 'content': partial},
+            {'role': 'user', 'content': CONTINUE_INSTRUCTION}
+        ]
+        return self.llm_manager.stream_response(messages)
+    
+    @staticmethod
+    def clean_continuation(continuation: str) -> str:
+        return re.sub(r'^\s*```[a-zA-Z]*\s*\n|\n\s*```\s*$', '', sanitize(continuation))
+    
     def check_user_credits(self) -> bool:
         """Check if user has enough credits"""
         return self.user.credits >= self.template.estimated_credits
     
-    def deduct_credits(self, paper: GeneratedPaper) -> CreditTransaction:
-        """Deduct credits from user account"""
+    def hold_credits(self, paper: GeneratedPaper) -> CreditTransaction:
+        """Reserve the paper's credits; they are charged when it completes and refunded if it fails"""
+        try:
+            return CreditLedger.hold(
+                self.user,
+                self.template.estimated_credits,
+                f"Paper generation: {paper.title}",
+                paper=paper
+            )
+        except InsufficientCreditsError:
+            raise PaperGenerationError("Insufficient credits")
+    
+    def create_paper(self, user_inputs: Dict[str, Any], title: str = None, status: str = 'generating') -> GeneratedPaper:
+        """Validate the request, create the paper record and charge for it"""
+        
+        # Validate inputs
+        validated_inputs = self.validate_inputs(user_inputs)
+        
+        # Check credits
         if not self.check_user_credits():
             raise PaperGenerationError("Insufficient credits")
         
-        # Create credit transaction
-        transaction = CreditTransaction.objects.create(
+        # Build prompts and reject oversized ones before charging anything
+        system_prompt, user_prompt = self.build_prompts(validated_inputs)
+        generation_parameters = self.build_generation_parameters(system_prompt, user_prompt)
+        
+        # Create paper record
+        paper = GeneratedPaper.objects.create(
             user=self.user,
-            transaction_type='usage',
-            status='completed',
-            credits=-self.template.estimated_credits,
-            paper=paper,
-            description=f"Paper generation: {paper.title}",
-            balance_before=self.user.credits,
-            balance_after=self.user.credits - self.template.estimated_credits
+            template=self.template,
+            title=title or f"Generated Paper - {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+            status=status,
+            user_inputs=validated_inputs,
+            generation_parameters=generation_parameters
         )
         
-        # Update user credits
-        self.user.credits -= self.template.estimated_credits
-        self.user.total_credits_used += self.template.estimated_credits
-        self.user.save()
+        # Hold credits
+        try:
+            self.hold_credits(paper)
+        except Exception as e:
+            paper.status = 'failed'
+            paper.error_message = str(e)
+            paper.save()
+            raise
         
-        return transaction
+        return paper
     
     def generate(self, user_inputs: Dict[str, Any], title: str = None) -> GeneratedPaper:
         """Generate paper synchronously"""
@@ -141,55 +238,65 @@ class PaperGenerator:
         start_time = timezone.now()
         
         try:
-            # Validate inputs
-            validated_inputs = self.validate_inputs(user_inputs)
-            
-            # Check credits
-            if not self.check_user_credits():
-                raise PaperGenerationError("Insufficient credits")
-            
-            # Create paper record
-            paper = GeneratedPaper.objects.create(
-                user=self.user,
-                template=self.template,
-                title=title or f"Generated Paper - {datetime.now().strftime('%Y-%m-%d %H:%M')}",
-                status='generating',
-                user_inputs=validated_inputs,
-                generation_parameters={
-                    'model': 'gpt-4',
-                    'temperature': 0.7,
-                    'max_tokens': 4000
-                }
-            )
-            
-            # Deduct credits
-            self.deduct_credits(paper)
-            
-            # Build prompts
-            system_prompt, user_prompt = self.build_prompts(validated_inputs)
+            paper = self.create_paper(user_inputs, title)
+        except Exception as e:
+            raise PaperGenerationError(f"Generation failed: {str(e)}")
+        
+        return self.run(paper, start_time)
+    
+    def run(self, paper: GeneratedPaper, start_time: Optional[datetime] = None) -> GeneratedPaper:
+        """Generate the content of a paper that has already been created and paid for"""
+        
+        start_time = start_time or timezone.now()
+        fingerprint = None
+        partial = ''
+        content_chunks = []
+        
+        try:
+            _, user_prompt = self.build_prompts(paper.user_inputs)
             
             # Detect language for prompt selection
-            combined_input = ' '.join(str(v) for v in validated_inputs.values())
+            combined_input = ' '.join(str(v) for v in paper.user_inputs.values())
             detected_language = PromptService.detect_language(combined_input)
             
-            # Generate content using LLM service with prompt guiding
-            content = self.llm_manager.generate_with_prompt(
-                prompt_name='academic_paper_formatter',
-                user_input=user_prompt,
-                language=detected_language
-            )
+            # Continue from the checkpoint of a failed attempt instead of paying for the whole paper again
+            fingerprint = prompt_hash(user_prompt, detected_language)
+            partial = self.restore(paper, fingerprint).get('partial_content') or ''
+            if partial:
+                stream = self.stream_continuation(user_prompt, detected_language, partial)
+            else:
+                # Generate content using LLM service with prompt guiding
+                stream = self.llm_manager.stream_with_prompt(
+                    prompt_name='academic_paper_formatter',
+                    user_input=user_prompt,
+                    language=detected_language
+                )
+            
+            # Streamed so progress can be saved every few seconds, like stream_generate
+            checkpoint_interval = getattr(settings, 'PAPER_CHECKPOINT_INTERVAL', 5.0)
+            last_checkpoint = time.monotonic()
+            for chunk in stream:
+                content_chunks.append(chunk)
+                if time.monotonic() - last_checkpoint >= checkpoint_interval:
+                    self.checkpoint(paper, prompt_hash=fingerprint, partial_content=partial + ''.join(content_chunks))
+                    last_checkpoint = time.monotonic()
+            
+            content = ''.join(content_chunks)
+            if partial:
+                content = partial + self.clean_continuation(content)
             
             # Update paper with generated content
             paper.content = content
+            paper.recovery_context = None
             paper.status = 'completed'
             paper.generation_time = timezone.now() - start_time
             paper.credits_used = self.template.estimated_credits
             paper.calculate_word_count()
             paper.save()
+            CreditLedger.commit_paper(paper)
             
-            # Update user statistics
-            self.user.total_papers_generated += 1
-            self.user.save()
+            # Update user statistics in the database; jobs for the same user may run concurrently
+            type(self.user).objects.filter(pk=self.user.pk).update(total_papers_generated=F('total_papers_generated') + 1)
             
             # Parse and create sections if template defines structure
             self._create_paper_sections(paper)
@@ -197,12 +304,10 @@ class PaperGenerator:
             return paper
             
         except Exception as e:
-            # Update paper status to failed
-            if 'paper' in locals():
-                paper.status = 'failed'
-                paper.error_message = str(e)
-                paper.generation_time = timezone.now() - start_time
-                paper.save()
+            # Update paper status to failed, keeping what was written so it can be resumed
+            if content_chunks:
+                self.checkpoint(paper, prompt_hash=fingerprint, partial_content=partial + ''.join(content_chunks))
+            self._fail(paper, start_time, e)
             
             raise PaperGenerationError(f"Generation failed: {str(e)}")
     
@@ -219,6 +324,10 @@ class PaperGenerator:
             if not self.check_user_credits():
                 raise PaperGenerationError("Insufficient credits")
             
+            # Build prompts and reject oversized ones before charging anything
+            system_prompt, user_prompt = self.build_prompts(validated_inputs)
+            generation_parameters = self.build_generation_parameters(system_prompt, user_prompt)
+            
             # Create paper record
             paper = GeneratedPaper.objects.create(
                 user=self.user,
@@ -226,18 +335,11 @@ class PaperGenerator:
                 title=title or f"Generated Paper - {datetime.now().strftime('%Y-%m-%d %H:%M')}",
                 status='generating',
                 user_inputs=validated_inputs,
-                generation_parameters={
-                    'model': 'gpt-4',
-                    'temperature': 0.7,
-                    'max_tokens': 4000
-                }
+                generation_parameters=generation_parameters
             )
             
-            # Deduct credits
-            self.deduct_credits(paper)
-            
-            # Build prompts
-            system_prompt, user_prompt = self.build_prompts(validated_inputs)
+            # Hold credits
+            self.hold_credits(paper)
             
             # Detect language for prompt selection
             combined_input = ' '.join(str(v) for v in validated_inputs.values())
@@ -251,13 +353,35 @@ class PaperGenerator:
                 'detected_language': detected_language
             }
             
-            # Generate content using LLM service streaming
+            # Generate content using LLM service streaming, forwarding only the HTML document
+            html_filter = OutputSanitizer(
+                html_only=True,
+                max_preamble=getattr(settings, 'LLM_SANITIZER_MAX_PREAMBLE', 16384)
+            )
             content_chunks = []
+            # Save what has been written every few seconds, so a failed stream can be resumed from there
+            fingerprint = prompt_hash(user_prompt, detected_language)
+            checkpoint_interval = getattr(settings, 'PAPER_CHECKPOINT_INTERVAL', 5.0)
+            last_checkpoint = time.monotonic()
             for chunk in self.llm_manager.stream_with_prompt(
                 prompt_name='academic_paper_formatter',
                 user_input=user_prompt,
                 language=detected_language
             ):
+                chunk = html_filter.feed(chunk)
+                if not chunk:
+                    continue
+                content_chunks.append(chunk)
+                if time.monotonic() - last_checkpoint >= checkpoint_interval:
+                    self.checkpoint(paper, prompt_hash=fingerprint, partial_content=''.join(content_chunks))
+                    last_checkpoint = time.monotonic()
+                yield {
+                    'type': 'content',
+                    'chunk': chunk,
+                    'paper_id': paper.id
+                }
+            chunk = html_filter.finish()
+            if chunk:
                 content_chunks.append(chunk)
                 yield {
                     'type': 'content',
@@ -270,15 +394,16 @@ class PaperGenerator:
             
             # Update paper with final content
             paper.content = content
+            paper.recovery_context = None
             paper.status = 'completed'
             paper.generation_time = timezone.now() - start_time
             paper.credits_used = self.template.estimated_credits
             paper.calculate_word_count()
             paper.save()
+            CreditLedger.commit_paper(paper)
             
-            # Update user statistics
-            self.user.total_papers_generated += 1
-            self.user.save()
+            # Update user statistics in the database; a full save would overwrite concurrent credit changes
+            type(self.user).objects.filter(pk=self.user.pk).update(total_papers_generated=F('total_papers_generated') + 1)
             
             # Parse and create sections
             self._create_paper_sections(paper)
@@ -292,13 +417,20 @@ class PaperGenerator:
             
             return paper
             
+        except GeneratorExit:
+            # The client went away; keep what was written so the paper can be resumed
+            if 'paper' in locals() and paper.status != 'completed':
+                if locals().get('content_chunks'):
+                    self.checkpoint(paper, prompt_hash=fingerprint, partial_content=''.join(content_chunks))
+                self._fail(paper, start_time, 'Generation was interrupted')
+            raise
+            
         except Exception as e:
             # Update paper status to failed
             if 'paper' in locals():
-                paper.status = 'failed'
-                paper.error_message = str(e)
-                paper.generation_time = timezone.now() - start_time
-                paper.save()
+                if locals().get('content_chunks'):
+                    self.checkpoint(paper, prompt_hash=fingerprint, partial_content=''.join(content_chunks))
+                self._fail(paper, start_time, e)
             
             # Yield error status
             yield {
@@ -308,62 +440,40 @@ class PaperGenerator:
             
             raise PaperGenerationError(f"Generation failed: {str(e)}")
     
+    def _fail(self, paper: GeneratedPaper, start_time: datetime, error):
+        paper.status = 'failed'
+        paper.error_message = str(error)
+        paper.generation_time = timezone.now() - start_time
+        paper.save()
+        CreditLedger.release_paper(paper, str(error))
+    
     def _create_paper_sections(self, paper: GeneratedPaper):
         """Parse generated content and create sections based on template structure"""
         
-        if not self.template.format.template_structure:
-            return
-        
-        structure = self.template.format.template_structure
-        sections = structure.get('sections', [])
-        
-        if not sections:
+        structure = (self.template.format.template_structure if self.template.format else None) or {}
+        names = [section.get('name', '') for section in structure.get('sections', []) if isinstance(section, dict)]
+        if not any(names):
             return
         
-        content = paper.content
-        
-        # Simple section parsing based on headers
-        current_section = None
-        current_content = ""
-        section_order = 0
-        
-        for line in content.split('\n'):
-            line = line.strip()
-            
-            # Check if line is a section header
-            is_header = False
-            for section in sections:
-                section_name = section.get('name', '')
-                if section_name.lower() in line.lower() and (line.startswith('#') or line.isupper()):
-                    # Save previous section
-                    if current_section and current_content.strip():
-                        PaperSection.objects.create(
-                            paper=paper,
-                            section_name=current_section,
-                            content=current_content.strip(),
-                            order=section_order,
-                            word_count=len(current_content.split())
-                        )
-                        section_order += 1
-                    
-                    # Start new section
-                    current_section = section_name
-                    current_content = ""
-                    is_header = True
-                    break
-            
-            if not is_header and current_section:
-                current_content += line + "\n"
+        # A section named twice (e.g. in a table of contents and the body) is stored once
+        merged = {}
+        for section in SectionParser(names).parse(paper.content):
+            if section['name'] in merged:
+                merged[section['name']]['content'] += '\n' + section['content']
+                merged[section['name']]['word_count'] += section['word_count']
+            else:
+                merged[section['name']] = section
         
-        # Save last section
-        if current_section and current_content.strip():
-            PaperSection.objects.create(
+        PaperSection.objects.bulk_create([
+            PaperSection(
                 paper=paper,
-                section_name=current_section,
-                content=current_content.strip(),
-                order=section_order,
-                word_count=len(current_content.split())
+                section_name=section['name'],
+                content=section['content'],
+                order=order,
+                word_count=section['word_count']
             )
+            for order, section in enumerate(merged.values())
+        ])
 
 
 class PaperFormatManager:
@@ -0,0 +1,276 @@
+"""
+Section-Parallel Paper Generation
+
+This module generates a paper as a short outline followed by one LLM call
+per section of the format's template_structure, run concurrently. Sections
+are reported as soon as each one is written, and the paper takes about as
+long as its slowest section instead of the sum of all of them.
+"""
+
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Dict, Generator, List, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+from django.utils import timezone
+from django.utils.html import escape, strip_tags
+
+from apps.billing.credits import CreditLedger
+from apps.core.output_sanitizer import sanitize
+from apps.core.prompt_layout import prefixed_message
+from apps.papers.models import GeneratedPaper, PaperSection, PaperTemplate
+from .format_service import PaperFormatService
+from .paper_generator import PaperGenerator, PaperGenerationError, prompt_hash
+
+logger = logging.getLogger(__name__)
+
+SECTION_INSTRUCTIONS = (
+    "The paper is written one section at a time. Write only the section requested below, "
+    "as an HTML fragment that starts with an <h2> heading. Do not write other sections and "
+    "do not add <html>, <head> or <body> tags."
+)
+
+
+class SectionedPaperGenerator(PaperGenerator):
+    """Generate a paper section by section, with bounded parallelism"""
+
+    mode = 'sections'
+
+    def __init__(self, template: PaperTemplate, user, max_workers: Optional[int] = None):
+        super().__init__(template, user)
+        service = self.llm_manager.llm_service
+        self.max_workers = max_workers or min(
+            getattr(settings, 'PAPER_SECTION_MAX_WORKERS', 4),
+            max(service.provider.pool_size, 1)
+        )
+
+    def sections(self) -> List[Dict[str, Any]]:
+        """Sections of the format in order, each name once"""
+        structure = (self.template.format.template_structure if self.template.format else None) or {}
+        seen = set()
+        sections = []
+        for section in sorted(
+            (s for s in structure.get('sections', []) if isinstance(s, dict) and s.get('name')),
+            key=lambda s: s.get('order', 0)
+        ):
+            if section['name'] not in seen:
+                seen.add(section['name'])
+                sections.append(section)
+        return sections
+
+    def build_generation_parameters(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+        parameters = super().build_generation_parameters(system_prompt, user_prompt)
+        parameters['mode'] = self.mode
+        return parameters
+
+    def build_outline(self, system_prompt: str, user_prompt: str, sections: List[Dict[str, Any]]) -> str:
+        """Short plan of every section, shared by the section calls so they stay consistent"""
+        names = "\n".join(f"- {section['name']}" for section in sections)
+        messages = [
+            {'role': 'system', 'content': system_prompt},
+            {'role': 'user', 'content': (
+                f"{user_prompt}\n\n"
+                "Before the paper is written, draft a brief outline: for each section below give two or three "
+                "bullet points on what it covers. Plain text only, no introduction.\n\n"
+                f"Sections:\n{names}"
+            )}
+        ]
+        outline = self.llm_manager.generate_response(
+            messages, max_tokens=getattr(settings, 'PAPER_OUTLINE_MAX_TOKENS', 800)
+        )
+        return sanitize(outline).strip()
+
+    @staticmethod
+    def clean_section(name: str, text: str) -> str:
+        """HTML fragment of one section, without the document wrappers a model may add"""
+        text = sanitize(text).strip()
+        text = re.sub(r'^```[a-zA-Z]*\s*\n|\n\s*```$', '', text)
+        text = re.sub(r'^[\s\S]*?<body[^>]*>', '', text, count=1, flags=re.I)
+        text = re.sub(r'</body>[\s\S]*$', '', text, count=1, flags=re.I).strip()
+        if not re.match(r'<h[1-6][\s>]', text, re.I):
+            text = f"<h2>{escape(name)}</h2>\n{text}"
+        return text
+
+    def _write_section(self, messages: List[Dict]) -> str:
+        try:
+            return self.llm_manager.generate_response(
+                messages, max_tokens=getattr(settings, 'PAPER_SECTION_MAX_TOKENS', 2000)
+            )
+        finally:
+            # Worker threads may have opened DB connections during failover
+            connections.close_all()
+
+    def _generate(self, paper: GeneratedPaper, start_time: datetime) -> Generator[Dict[str, Any], None, None]:
+        """Outline, sections and assembly; yields progress events"""
+        sections = self.sections()
+        system_prompt, user_prompt = self.build_prompts(paper.user_inputs)
+        topic = paper.user_inputs.get('topic') or paper.title
+
+        # A resumed paper keeps its outline and every section written for the same prompts
+        fingerprint = prompt_hash(system_prompt, user_prompt)
+        state = self.restore(paper, fingerprint)
+        written = dict(state.get('sections', {}))
+
+        yield {
+            'type': 'status',
+            'message': 'Resuming generation...' if state else 'Writing outline...',
+            'paper_id': paper.id,
+            'sections': [section['name'] for section in sections]
+        }
+        outline = state.get('outline') or self.build_outline(system_prompt, user_prompt, sections)
+        self.checkpoint(paper, prompt_hash=fingerprint, outline=outline, sections=written)
+        yield {'type': 'outline', 'outline': outline, 'paper_id': paper.id}
+
+        # Everything up to the section request is identical across sections and can be served from prompt caches
+        prefix = f"{user_prompt}\n\nOutline of the whole paper:\n{outline}\n\n{SECTION_INSTRUCTIONS}\n\n"
+        section_prompts = PaperFormatService.generate_section_prompts(self.template.format, topic)
+        results: List[Optional[str]] = [None] * len(sections)
+        requests = {}
+        completed = 0
+
+        for index, section in enumerate(sections):
+            name = section['name']
+            request = f"Section: {name}\n{section_prompts[name]}"
+            section_hash = prompt_hash(prefix, request)
+            saved = written.get(name)
+            if saved and saved.get('prompt_hash') == section_hash:
+                results[index] = saved['content']
+                completed += 1
+                yield {
+                    'type': 'section',
+                    'name': name,
+                    'order': index,
+                    'content': results[index],
+                    'completed': completed,
+                    'total': len(sections),
+                    'resumed': True,
+                    'paper_id': paper.id
+                }
+            else:
+                requests[index] = (request, section_hash)
+
+        if requests:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(requests))) as executor:
+                futures = {
+                    executor.submit(self._write_section, [
+                        {'role': 'system', 'content': system_prompt},
+                        prefixed_message(prefix, request)
+                    ]): index
+                    for index, (request, _) in requests.items()
+                }
+                error = None
+                try:
+                    for future in as_completed(futures):
+                        if future.cancelled():
+                            continue
+                        index = futures[future]
+                        name = sections[index]['name']
+                        try:
+                            text = future.result()
+                        except Exception as e:
+                            # Stop starting new sections, but keep the ones in flight for the checkpoint
+                            error = error or e
+                            for pending in futures:
+                                pending.cancel()
+                            continue
+                        results[index] = self.clean_section(name, text)
+                        written[name] = {'content': results[index], 'prompt_hash': requests[index][1]}
+                        self.checkpoint(paper, sections=written)
+                        completed += 1
+                        yield {
+                            'type': 'section',
+                            'name': name,
+                            'order': index,
+                            'content': results[index],
+                            'completed': completed,
+                            'total': len(sections),
+                            'paper_id': paper.id
+                        }
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+                if error:
+                    raise error
+
+        title = escape(paper.title)
+        paper.content = (
+            f"<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n<title>{title}</title>\n</head>\n"
+            f"<body>\n<h1>{title}</h1>\n" + "\n".join(results) + "\n</body>\n</html>"
+        )
+        paper.recovery_context = None
+        paper.status = 'completed'
+        paper.generation_time = timezone.now() - start_time
+        paper.credits_used = self.template.estimated_credits
+        paper.calculate_word_count()
+        paper.save()
+        CreditLedger.commit_paper(paper)
+
+        PaperSection.objects.bulk_create([
+            PaperSection(
+                paper=paper,
+                section_name=section['name'],
+                content=content,
+                order=index,
+                word_count=len(strip_tags(content).split())
+            )
+            for index, (section, content) in enumerate(zip(sections, results))
+        ])
+
+        # Update user statistics in the database; jobs for the same user may run concurrently
+        type(self.user).objects.filter(pk=self.user.pk).update(total_papers_generated=F('total_papers_generated') + 1)
+
+        yield {
+            'type': 'completed',
+            'message': 'Generation completed successfully',
+            'paper': paper
+        }
+
+    def run(self, paper: GeneratedPaper, start_time: Optional[datetime] = None) -> GeneratedPaper:
+        if not self.sections():
+            return super().run(paper, start_time)
+
+        start_time = start_time or timezone.now()
+        try:
+            for _ in self._generate(paper, start_time):
+                pass
+            return paper
+        except Exception as e:
+            self._fail(paper, start_time, e)
+            raise PaperGenerationError(f"Generation failed: {str(e)}")
+
+    def stream_generate(self, user_inputs: Dict[str, Any], title: str = None) -> Generator[Dict[str, Any], None, GeneratedPaper]:
+        """Stream progress, one event per finished section (in completion order)"""
+        if not self.sections():
+            return (yield from super().stream_generate(user_inputs, title))
+
+        start_time = timezone.now()
+        try:
+            paper = self.create_paper(user_inputs, title)
+            yield from self._generate(paper, start_time)
+            return paper
+        except GeneratorExit:
+            # The client went away; finished sections are already checkpointed
+            if 'paper' in locals() and paper.status != 'completed':
+                self._fail(paper, start_time, 'Generation was interrupted')
+            raise
+        except Exception as e:
+            if 'paper' in locals():
+                self._fail(paper, start_time, e)
+            yield {
+                'type': 'error',
+                'message': str(e)
+            }
+            raise PaperGenerationError(f"Generation failed: {str(e)}")
+
+
+def generator_for(template: PaperTemplate, user, mode: Optional[str] = None) -> PaperGenerator:
+    """Generator for a generation mode, PAPER_GENERATION_MODE by default"""
+    mode = mode or getattr(settings, 'PAPER_GENERATION_MODE', 'single')
+    if mode == 'sections':
+        return SectionedPaperGenerator(template, user)
+    return PaperGenerator(template, user)
@@ -0,0 +1,92 @@
+"""
+Paper Section Parser
+
+This module splits generated papers into sections at their headings. One
+compiled pattern finds Markdown (# Heading), HTML (<h1>-<h6>) and ALL-CAPS
+headings in a single scan of the document; with a list of expected section
+names, only headings naming one of them start a section.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# No branch may backtrack over a line: the text comes from an LLM and one odd
+# line must not stall the worker. Caps candidates are lines without lowercase
+# ASCII letters; headings() checks the rest. HTML headings are capped in length
+# so an unclosed <hN> is not rescanned to the end of the document.
+HEADING = re.compile(
+    r'<h(?P<level>[1-6])\b[^>]*>(?P<html>[\s\S]{0,300}?)</h(?P=level)\s*>'
+    r'|^[ \t]*#{1,6}[ \t]+(?P<markdown>[^\n]+)$'
+    r'|^(?P<caps>[^a-z\n<>]+)$',
+    re.M
+)
+# Document wrappers left after the last section of an HTML paper
+TRAILER = re.compile(r'\s*(?:</(?:body|html)>\s*)+$', re.I)
+TAG = re.compile(r'<[^>]*>')
+WORD = re.compile(r'\w\S*')
+MARKUP = re.compile(r'[#*_`]+')
+# Longer ALL-CAPS lines are shouting text rather than headings
+MAX_CAPS_HEADING_WORDS = 5
+
+
+@lru_cache(maxsize=128)
+def _name_matcher(names: Tuple[str, ...]) -> re.Pattern:
+    # Longest names first, so "Methodology" wins over "Method" at the same position
+    alternation = '|'.join(re.escape(name) for name in sorted(names, key=len, reverse=True))
+    return re.compile(rf'(?<!\w)(?P<name>{alternation})(?:e?s)?(?!\w)', re.I)
+
+
+class SectionParser:
+    """Split paper content into sections, optionally restricted to known section names"""
+
+    def __init__(self, section_names: Optional[Iterable[str]] = None):
+        names = tuple(dict.fromkeys(name.strip() for name in section_names or [] if name and name.strip()))
+        self.names = {name.lower(): name for name in names}
+        self.matcher = _name_matcher(names) if names else None
+
+    def headings(self, content: str) -> Iterator[Tuple[int, int, str]]:
+        """(start, end, section name) of every heading that starts a section"""
+        for match in HEADING.finditer(content):
+            text = match.group('html') or match.group('markdown') or match.group('caps')
+            if match.group('caps') is not None and not self._is_caps_heading(text):
+                continue
+            text = ' '.join(MARKUP.sub('', TAG.sub(' ', text)).split())
+            if not text:
+                continue
+            if self.matcher:
+                found = self.matcher.search(text)
+                if not found:
+                    continue
+                text = self.names[found.group('name').lower()]
+            yield match.start(), match.end(), text
+
+    @staticmethod
+    def _is_caps_heading(text: str) -> bool:
+        return (
+            text.isupper()
+            and sum(1 for char in text if 'A' <= char <= 'Z') >= 2
+            and len(text.split()) <= MAX_CAPS_HEADING_WORDS
+        )
+
+    def parse(self, content: str) -> List[Dict[str, Any]]:
+        """Sections in document order; text before the first heading is not part of any section"""
+        sections = []
+        current = None
+        for start, end, name in self.headings(content or ''):
+            if current:
+                self._add(sections, current[0], content[current[1]:start])
+            current = (name, end)
+        if current:
+            self._add(sections, current[0], TRAILER.sub('', content[current[1]:]))
+        return sections
+
+    @staticmethod
+    def _add(sections: List[Dict[str, Any]], name: str, text: str):
+        text = text.strip()
+        if text:
+            sections.append({
+                'name': name,
+                'content': text,
+                'word_count': len(WORD.findall(TAG.sub(' ', text)))
+            })
@@ -10,6 +10,8 @@ from typing import Dict, List, Any, Optional
 from datetime import datetime
 from django.utils.text import slugify
 
+from .section_parser import SectionParser
+
 
 class ContentProcessor:
     """Utility class for processing generated content"""
@@ -53,45 +55,7 @@ class ContentProcessor:
     @staticmethod
     def extract_sections(content: str) -> List[Dict[str, Any]]:
         """Extract sections from generated content"""
-        sections = []
-        current_section = None
-        current_content = []
-        
-        lines = content.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            
-            # Check if line is a section header
-            if line.startswith('#') or (line.isupper() and len(line.split()) <= 5):
-                # Save previous section
-                if current_section:
-                    section_content = '\n'.join(current_content).strip()
-                    if section_content:
-                        sections.append({
-                            'name': current_section,
-                            'content': section_content,
-                            'word_count': len(section_content.split())
-                        })
-                
-                # Start new section
-                current_section = re.sub(r'[#*_]', '', line).strip()
-                current_content = []
-            else:
-                if current_section:
-                    current_content.append(line)
-        
-        # Save last section
-        if current_section:
-            section_content = '\n'.join(current_content).strip()
-            if section_content:
-                sections.append({
-                    'name': current_section,
-                    'content': section_content,
-                    'word_count': len(section_content.split())
-                })
-        
-        return sections
+        return SectionParser().parse(content)
     
     @staticmethod
     def calculate_readability_score(content: str) -> Dict[str, float]:
@@ -0,0 +1,58 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.billing.credits import CreditLedger
+from apps.papers.generators.job_queue import PaperJobQueue
+
+
+class Command(BaseCommand):
+    help = 'Generate queued papers from the database queue (PAPER_JOB_BACKEND = "database")'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=getattr(settings, 'PAPER_JOB_CONCURRENCY', 4),
+                            help='Papers generated at the same time')
+        parser.add_argument('--poll-interval', type=float, default=getattr(settings, 'PAPER_JOB_POLL_INTERVAL', 2.0),
+                            help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=self._work, args=(stop, options), name=f'paper-worker-{index}', daemon=True)
+            for index in range(max(options['concurrency'], 1))
+        ]
+        PaperJobQueue.requeue_stale()
+        for thread in threads:
+            thread.start()
+        self.stdout.write(self.style.SUCCESS(f'Paper worker started with {len(threads)} threads'))
+
+        try:
+            last_sweep = time.monotonic()
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(1)
+                if time.monotonic() - last_sweep > 60:
+                    PaperJobQueue.requeue_stale()
+                    CreditLedger.release_stale()
+                    last_sweep = time.monotonic()
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping after the papers in progress...')
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def _work(self, stop: threading.Event, options):
+        while not stop.is_set():
+            try:
+                if PaperJobQueue.process_next():
+                    continue
+            except Exception as e:
+                self.stderr.write(f'Paper job failed: {str(e)}')
+                close_old_connections()
+            if options['once']:
+                return
+            stop.wait(options['poll_interval'])
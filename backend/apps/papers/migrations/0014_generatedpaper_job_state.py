@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('papers', '0013_formatcreditprice_created_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generatedpaper',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Times a worker has picked up the job'),
+        ),
+        migrations.AddField(
+            model_name='generatedpaper',
+            name='started_at',
+            field=models.DateTimeField(blank=True, help_text='When a worker last picked up the job', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='generatedpaper',
+            index=models.Index(fields=['status', 'created_at'], name='paper_status_created_idx'),
+        ),
+    ]
@@ -114,6 +114,10 @@ class GeneratedPaper(BaseModel):
     generation_time = models.DurationField(null=True, blank=True)
     error_message = models.TextField(blank=True)
     
+    # Background job state
+    started_at = models.DateTimeField(null=True, blank=True, help_text="When a worker last picked up the job")
+    attempts = models.PositiveSmallIntegerField(default=0, help_text="Times a worker has picked up the job")
+    
     # File storage
     pdf_file = models.FileField(upload_to='generated_papers/pdf/', blank=True, null=True)
     docx_file = models.FileField(upload_to='generated_papers/docx/', blank=True, null=True)
@@ -127,6 +131,10 @@ class GeneratedPaper(BaseModel):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Workers claim the oldest pending job
+            models.Index(fields=['status', 'created_at'], name='paper_status_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} by {self.user.email}"
@@ -5,6 +5,7 @@ class FormatCreditPriceSerializer(serializers.ModelSerializer):
     class Meta:
         model = FormatCreditPrice
         fields = ['id', 'format', 'credit_price', 'created_at']
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from drf_spectacular.utils import extend_schema_field
 from .models import (
@@ -112,11 +113,27 @@ class GeneratedPaperListSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'template_name', 'format_name', 'created_at', 'updated_at']
 
 
+class PaperStatusSerializer(serializers.ModelSerializer):
+    """Progress of a queued paper, without its content"""
+    
+    class Meta:
+        model = GeneratedPaper
+        fields = [
+            'id', 'title', 'status', 'error_message', 'word_count', 'attempts',
+            'generation_time', 'created_at', 'started_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
 class PaperGenerationRequestSerializer(serializers.Serializer):
     """Serializer for paper generation requests"""
     template_id = serializers.IntegerField()
     title = serializers.CharField(max_length=200, required=False, allow_blank=True)
     user_inputs = serializers.JSONField()
+    mode = serializers.ChoiceField(
+        choices=['single', 'sections'], required=False,
+        help_text="'sections' writes an outline, then all sections of the format concurrently"
+    )
     
     def validate_template_id(self, value):
         try:
@@ -135,6 +152,16 @@ class PaperGenerationRequestSerializer(serializers.Serializer):
         return value
 
 
+class BatchPaperGenerationRequestSerializer(serializers.Serializer):
+    """Serializer for batch paper generation requests"""
+    items = serializers.ListField(
+        child=PaperGenerationRequestSerializer(),
+        min_length=1,
+        max_length=settings.PAPER_BATCH_MAX_ITEMS
+    )
+    stream = serializers.BooleanField(default=False, help_text="Report per-item progress as server-sent events")
+
+
 class PaperFeedbackSerializer(serializers.ModelSerializer):
     """Serializer for paper feedback"""
     user_email = serializers.CharField(source='user.email', read_only=True)
@@ -0,0 +1,16 @@
+from config.celery import app
+
+from .generators.job_queue import PaperJobQueue
+
+
+@app.task(acks_late=True, ignore_result=True)
+def generate_paper_task(paper_id: int):
+    """Generate a queued paper, unless another worker already took it (or is still working on it)"""
+    if PaperJobQueue.claim(paper_id) is not None:
+        PaperJobQueue.run(paper_id)
+
+
+@app.task(ignore_result=True)
+def sweep_paper_jobs():
+    """Re-dispatch papers whose worker died and fail those out of attempts; scheduled by Celery beat"""
+    PaperJobQueue.requeue_stale()
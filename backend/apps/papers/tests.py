@@ -1,3 +1,113 @@
-from django.test import TestCase
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from apps.billing.credits import CreditLedger
+from apps.core.llm_service import LLMServiceError
+from apps.core.models import LLMConfiguration, LLMModel, LLMProvider
+from .generators.paper_generator import CONTINUE_INSTRUCTION, PaperGenerator
+from .generators.section_parser import SectionParser
+from .models import GeneratedPaper, PaperFormat, PaperTemplate
+
+
+class SectionParserTests(SimpleTestCase):
+    """Splitting generated papers into sections"""
+
+    def test_html_and_markdown_headings(self):
+        parser = SectionParser(['Abstract', 'Introduction', 'Method'])
+        html = '<h1>Title</h1>\n<h2>1. Abstract</h2><p>Short.</p>\n<h2>Introduction</h2><p>Why.</p></body></html>'
+        self.assertEqual(
+            [(s['name'], s['content']) for s in parser.parse(html)],
+            [('Abstract', '<p>Short.</p>'), ('Introduction', '<p>Why.</p>')]
+        )
+        markdown = '## Abstract\ntext\n## 2 Methods\nhow\nINTRODUCTION\nwhy'
+        self.assertEqual([s['name'] for s in parser.parse(markdown)], ['Abstract', 'Method', 'Introduction'])
+
+    def test_caps_headings_need_two_capitals_and_few_words(self):
+        sections = SectionParser().parse('RESULTS\nfine\nA\nnot a heading\nTHIS LINE HAS FAR TOO MANY WORDS\nstill results')
+        self.assertEqual([s['name'] for s in sections], ['RESULTS'])
+
+    def test_long_lines_parse_in_linear_time(self):
+        content = '\n'.join([
+            'A' * 5000 + 'a',
+            ' ' * 5000 + 'a',
+            ('THE QUICK BROWN FOX JUMPS OVER THE LAZY DOG AND KEEPS RUNNING ACROSS OPEN FIELDS x\n' * 1000),
+            '<h2>' * 2000,
+            '# ' * 5000 + 'a',
+        ])
+        started = time.perf_counter()
+        SectionParser().parse(content)
+        SectionParser(['Abstract']).parse(content)
+        self.assertLess(time.perf_counter() - started, 1.0)
+
+
+class FakeLLMManager:
+    """Streams canned chunks, optionally failing after them, and records what it was asked"""
+
+    def __init__(self, chunks, fail=False):
+        self.chunks = chunks
+        self.fail = fail
+        self.calls = []
+
+    def _stream(self):
+        yield from self.chunks
+        if self.fail:
+            raise LLMServiceError("Connection dropped", code="STREAM_FAILURE")
+
+    def _get_system_prompt(self, prompt_name, language, variables):
+        return 'You write papers.'
+
+    def stream_with_prompt(self, prompt_name, user_input, language=None, **variables):
+        self.calls.append(('prompt', user_input))
+        return self._stream()
+
+    def stream_response(self, messages, **kwargs):
+        self.calls.append(('messages', messages))
+        return self._stream()
+
+
+@override_settings(PAPER_CHECKPOINT_INTERVAL=0)
+class PaperGeneratorRecoveryTests(TestCase):
+    """Queued generation saves its progress and resumes from it"""
+
+    def setUp(self):
+        provider = LLMProvider.objects.create(name='local', provider_type='ollama', base_url='http://127.0.0.1:9')
+        model = LLMModel.objects.create(provider=provider, name='model', display_name='Model')
+        config = LLMConfiguration.get_config()
+        config.default_provider, config.default_model = provider, model
+        config.save()
+        self.user = get_user_model().objects.create(email='writer@example.com', credits=10)
+        paper_format = PaperFormat.objects.create(name='md', description='Markdown')
+        self.template = PaperTemplate.objects.create(
+            name='Essay', paper_type='essay', format=paper_format, description='Essay',
+            system_prompt='You write essays.', user_prompt_template='Write about {topic}'
+        )
+        self.template.estimated_credits = 2
+        self.paper = GeneratedPaper.objects.create(
+            user=self.user, template=self.template, title='Essay', status='generating', user_inputs={'topic': 'tides'}
+        )
+        CreditLedger.hold(self.user, 2, 'Paper generation: Essay', paper=self.paper)
+
+    def run_paper(self, llm_manager):
+        generator = PaperGenerator(self.template, self.user)
+        generator.llm_manager = llm_manager
+        return generator.run(GeneratedPaper.objects.get(pk=self.paper.pk))
+
+    def test_failed_run_keeps_partial_content_and_resume_asks_for_the_rest(self):
+        with self.assertRaises(Exception):
+            self.run_paper(FakeLLMManager(['<h1>Tides</h1>', '<p>The moon'], fail=True))
+        self.paper.refresh_from_db()
+        self.assertEqual(self.paper.status, 'failed')
+        self.assertEqual(self.paper.recovery_context['partial_content'], '<h1>Tides</h1><p>The moon')
+
+        resume = FakeLLMManager([' pulls the sea.</p>'])
+        paper = self.run_paper(resume)
+        self.assertEqual(paper.status, 'completed')
+        self.assertEqual(paper.content, '<h1>Tides</h1><p>The moon pulls the sea.</p>')
+        self.assertIsNone(paper.recovery_context)
+        (kind, messages), = resume.calls
+        self.assertEqual(kind, 'messages')
+        self.assertEqual(messages[-2], {'role': 'assistant', 'content': '<h1>Tides</h1><p>The moon'})
+        self.assertEqual(messages[-1]['content'], CONTINUE_INSTRUCTION)
 
-# Create your tests here.
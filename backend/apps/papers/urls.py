@@ -22,12 +22,15 @@ urlpatterns = [
     # Paper generation
     path('generate/', views.generate_paper, name='generate_paper'),
     path('generate/stream/', views.generate_paper_stream, name='generate_paper_stream'),
+    path('generate/batch/', views.generate_papers_batch, name='generate_papers_batch'),
     path('validate/', views.validate_paper, name='validate_paper'),
     path('export/', views.export_paper, name='export_paper'),
     
     # Generated papers
     path('history/', views.GeneratedPaperListView.as_view(), name='paper_history'),
     path('<int:pk>/', views.GeneratedPaperDetailView.as_view(), name='paper_detail'),
+    path('<int:pk>/status/', views.paper_status, name='paper_status'),
+    path('<int:pk>/resume/', views.resume_paper, name='resume_paper'),
     
     # Router URLs
     path('', include(router.urls)),
@@ -7,7 +7,7 @@ class FormatCreditPriceViewSet(viewsets.ModelViewSet):
     queryset = FormatCreditPrice.objects.all()
     serializer_class = FormatCreditPriceSerializer
     permission_classes = [permissions.IsAuthenticated]
-from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework import generics, permissions, status, viewsets, serializers
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
@@ -15,6 +15,8 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.db.models import Q, Count
 from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.urls import reverse
 from drf_spectacular.utils import extend_schema, OpenApiParameter, extend_schema_field
 from drf_spectacular.openapi import OpenApiTypes
 import json
@@ -24,20 +26,26 @@ from .models import (
 )
 from .serializers import (
     PaperFormatSerializer, PaperTemplateSerializer, PaperTemplateDetailSerializer,
-    GeneratedPaperSerializer, GeneratedPaperListSerializer, PaperGenerationRequestSerializer,
+    GeneratedPaperSerializer, GeneratedPaperListSerializer, PaperGenerationRequestSerializer, PaperStatusSerializer,
     PaperFeedbackSerializer, PaperValidationSerializer, PaperExportSerializer,
+    BatchPaperGenerationRequestSerializer,
     TemplateSearchSerializer, PaperValidationResponseSerializer, PaperExportResponseSerializer,
     TemplateSearchResponseSerializer
 )
 from .generators import (
     PaperGenerator, PaperGenerationError, TemplateManager,
-    TemplateRecommendationEngine, PaperValidator, PaperMetrics
+    TemplateRecommendationEngine, PaperValidator, PaperMetrics,
+    ChunkedPaperFormatter, BatchPaperGenerator, PaperJobQueue, generator_for
 )
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions, parsers
 from .utils import extract_text_from_file
 from apps.core.llm_service import LLMManager, extract_html_from_response
+from apps.core.prompt_layout import prefixed_message, split_rendered
+from apps.core.parsers import ORJSONParser
+from apps.core.serialization import sse_event
+from apps.billing.credits import CreditLedger, InsufficientCreditsError
 from django.http import HttpResponse, JsonResponse
 import base64
 import re
@@ -51,7 +59,7 @@ logger = logging.getLogger(__name__)
 class AIPaperFormatView(APIView):
     """API endpoint for AI paper formatting (HomePage integration)"""
     permission_classes = [permissions.AllowAny]
-    parser_classes = [MultiPartParser, FormParser, JSONParser]
+    parser_classes = [MultiPartParser, FormParser, ORJSONParser]
 
     @extend_schema(
         summary="AI Paper Formatting (HomePage integration)",
@@ -119,40 +127,46 @@ class AIPaperFormatView(APIView):
         if user.credits < credit_price:
             return Response({'error': f'Insufficient credits. Required: {credit_price}, Available: {user.credits}'}, status=402)
 
-        # Deduct credits
-        user.credits -= credit_price
-        user.total_credits_used += credit_price
-        user.save()
+        system_message = {"role": "system", "content": "You are an expert academic editor. Format papers according to user specifications. Return only the formatted content without explanations or AI commentary."}
 
-        # Construct optimal prompt based on user requirements and output format
-        prompt = self._construct_optimal_prompt(
+        # Instructions come first and are identical for every chunk, so providers can reuse the cached prefix
+        prompt_prefix = self._construct_optimal_prompt(
             user_requirements=user_requirements,
             output_format=output_format,
             title=title,
-            language=language,
-            text=text
+            language=language
         )
 
+        def build_messages(chunk_text, part_instructions):
+            content = f"{chunk_text}\n\n{part_instructions}" if part_instructions else chunk_text
+            return [system_message, prefixed_message(prompt_prefix, content)]
+
+        # Hold the credits for the LLM call; they are refunded if it fails
+        try:
+            hold = CreditLedger.hold(user, credit_price, f"Paper formatting: {format_name}")
+        except InsufficientCreditsError as e:
+            return Response({'error': str(e)}, status=402)
+
         # Generate formatted content using LLM
         try:
-            # Always get the active provider and model from the database
-            from apps.core.models import LLMProvider, LLMModel
-            provider = LLMProvider.objects.filter(is_active=True).order_by('-is_default').first()
-            model = None
-            if provider:
-                model = LLMModel.objects.filter(provider=provider, is_active=True).order_by('-is_default').first()
+            # Always use the active provider and model (from the cached configuration snapshot)
+            from apps.core.config_snapshot import get_config_snapshot
+            provider, model = get_config_snapshot().active_target()
             if provider and model:
                 llm_manager = LLMManager(provider=provider, model=model)
             else:
                 llm_manager = LLMManager()
-            messages = [
-                {"role": "system", "content": "You are an expert academic editor. Format papers according to user specifications. Return only the formatted content without explanations or AI commentary."},
-                {"role": "user", "content": prompt}
-            ]
-            formatted_content = llm_manager.llm_service.generate_response(messages)
+            # Long documents are formatted in parallel chunks that fit the model window
+            formatter = ChunkedPaperFormatter(
+                llm_manager,
+                output_format=output_format,
+                citation_style=user_requirements.get('citation_style', '')
+            )
+            formatted_content = formatter.format(text, build_messages)
             # Clean up and extract relevant content based on output_format
             formatted_content = self._clean_ai_response(formatted_content, output_format)
         except Exception as e:
+            CreditLedger.release(hold, str(e))
             # If it's an LLMServiceError, return only the actual error message if available
             if hasattr(e, 'details') and isinstance(e.details, dict):
                 # Try to extract OpenAI/LLM error message
@@ -170,8 +184,15 @@ class AIPaperFormatView(APIView):
             # Fallback: show the exception string
             return Response({'error': str(e)}, status=500)
 
-        # Return response based on format type
-        return self._format_response(formatted_content, output_format, title)
+        # Return response based on format type; charge once the file was built
+        try:
+            response = self._format_response(formatted_content, output_format, title)
+        except Exception as e:
+            logger.error(f"Building the {output_format} file failed: {str(e)}")
+            CreditLedger.release(hold, str(e))
+            return Response({'error': f'Could not build the {output_format} file: {str(e)}'}, status=500)
+        CreditLedger.commit(hold)
+        return response
 
     def _parse_requirements(self, requirements):
         """Parse user requirements from JSON or plain text"""
@@ -191,8 +212,8 @@ class AIPaperFormatView(APIView):
             'citation_style': ''
         }
 
-    def _construct_optimal_prompt(self, user_requirements, output_format, title, language, text):
-        """Construct the best possible prompt for optimal formatting results"""
+    def _construct_optimal_prompt(self, user_requirements, output_format, title, language):
+        """Construct the formatting instructions; the document text is appended after them"""
         
         # Extract requirements components
         description = user_requirements.get('description', '')
@@ -214,7 +235,7 @@ class AIPaperFormatView(APIView):
         if formatting:
             formatting_str = "\n".join([
                 f"- {key.replace('_', ' ').title()}: {value}"
-                for key, value in formatting.items()
+                for key, value in sorted(formatting.items())
             ])
         
         # Select language-appropriate prompt template
@@ -231,10 +252,10 @@ class AIPaperFormatView(APIView):
 输出格式：{output_format}
 {title_section}
 
-原始内容：
-{text}
+请直接输出格式化后的{output_format}内容，不要包含任何解释或说明。
 
-请直接输出格式化后的{output_format}内容，不要包含任何解释或说明。"""
+原始内容：
+"""
         else:
             prompt_template = """Format this academic paper according to the following specifications:
 
@@ -248,10 +269,10 @@ User Requirements: {description}
 Output Format: {output_format}
 {title_section}
 
-Original Content:
-{text}
+Return only the formatted {output_format} content without any explanations or commentary.
 
-Return only the formatted {output_format} content without any explanations or commentary."""
+Original Content:
+"""
 
         # Build conditional sections
         sections_section = f"Required Sections:\n{sections_str}" if sections_str else ""
@@ -267,8 +288,7 @@ Return only the formatted {output_format} content without any explanations or co
             style_section=style_section,
             citation_section=citation_section,
             output_format=output_format.upper(),
-            title_section=title_section,
-            text=text
+            title_section=title_section
         )
 
     def _clean_ai_response(self, content, output_format=None):
@@ -705,14 +725,15 @@ class PaperGenerationView(APIView):
 
 @extend_schema(
     summary="Generate paper",
-    description="Generate a new academic paper using AI",
+    description="Queue a new academic paper for generation. Responds with 202 and the pending paper; "
+                "follow its progress at the URL in the Location header.",
     request=PaperGenerationRequestSerializer,
-    responses={201: GeneratedPaperSerializer}
+    responses={202: PaperStatusSerializer}
 )
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def generate_paper(request):
-    """Generate a new paper"""
+    """Queue a new paper"""
     serializer = PaperGenerationRequestSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
     
@@ -723,7 +744,7 @@ def generate_paper(request):
     try:
         # Get template
         template = get_object_or_404(
-            PaperTemplate,
+            PaperTemplate.objects.select_related('format'),
             id=template_id,
             is_active=True,
             is_deleted=False
@@ -737,18 +758,15 @@ def generate_paper(request):
                 'user_credits': request.user.credits
             }, status=status.HTTP_402_PAYMENT_REQUIRED)
         
-        # Generate paper
-        generator = PaperGenerator(template, request.user)
-        paper = generator.generate(user_inputs, title)
+        # Charge and queue; a worker generates the content
+        paper = PaperJobQueue.enqueue(template, request.user, user_inputs, title,
+                                      mode=serializer.validated_data.get('mode'))
         
-        # --- LLM HTML extraction logic ---
-        if hasattr(paper, "content") and paper.content:
-            paper.content = extract_html_from_response(paper.content)
-            paper.save(update_fields=["content"])
-        # --- end LLM HTML extraction logic ---
-        
-        serializer = GeneratedPaperSerializer(paper)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        serializer = PaperStatusSerializer(paper)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED, headers={
+            'Location': reverse('paper_status', args=[paper.pk]),
+            'Retry-After': str(settings.PAPER_JOB_STATUS_POLL_AFTER),
+        })
         
     except PaperGenerationError as e:
         return Response({
@@ -756,6 +774,56 @@ def generate_paper(request):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
+@extend_schema(
+    summary="Get paper generation status",
+    description="Lightweight progress check for a queued paper; fetch the paper itself once status is completed",
+    responses={200: PaperStatusSerializer}
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def paper_status(request, pk):
+    """Status of a paper without its content"""
+    paper = get_object_or_404(
+        GeneratedPaper.objects.only(*PaperStatusSerializer.Meta.fields),
+        pk=pk,
+        user=request.user,
+        is_deleted=False
+    )
+    headers = {}
+    if paper.status in ('pending', 'generating'):
+        headers['Retry-After'] = str(settings.PAPER_JOB_STATUS_POLL_AFTER)
+    return Response(PaperStatusSerializer(paper).data, headers=headers)
+
+
+@extend_schema(
+    summary="Resume paper generation",
+    description="Queue a failed paper again. Generation continues from the last checkpoint, so only the "
+                "missing part is generated. The credits refunded when the paper failed are held again.",
+    request=None,
+    responses={202: PaperStatusSerializer}
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def resume_paper(request, pk):
+    """Resume a failed paper from its checkpoint"""
+    paper = get_object_or_404(GeneratedPaper.objects.select_related('template'), pk=pk, user=request.user,
+                              is_deleted=False)
+    try:
+        resumed = PaperJobQueue.resume(paper)
+    except InsufficientCreditsError as e:
+        return Response({'error': str(e)}, status=status.HTTP_402_PAYMENT_REQUIRED)
+    if not resumed:
+        return Response({
+            'error': f"Only failed papers can be resumed; this paper is {paper.status}"
+        }, status=status.HTTP_409_CONFLICT)
+    
+    serializer = PaperStatusSerializer(paper)
+    return Response(serializer.data, status=status.HTTP_202_ACCEPTED, headers={
+        'Location': reverse('paper_status', args=[paper.pk]),
+        'Retry-After': str(settings.PAPER_JOB_STATUS_POLL_AFTER),
+    })
+
+
 @extend_schema(
     summary="Generate paper with streaming",
     description="Generate a paper with real-time streaming response",
@@ -776,7 +844,7 @@ def generate_paper_stream(request):
     try:
         # Get template
         template = get_object_or_404(
-            PaperTemplate,
+            PaperTemplate.objects.select_related('format'),
             id=template_id,
             is_active=True,
             is_deleted=False
@@ -790,9 +858,9 @@ def generate_paper_stream(request):
         
         # Generate streaming response
         def generate():
-            generator = PaperGenerator(template, request.user)
+            generator = generator_for(template, request.user, serializer.validated_data.get('mode'))
             for chunk in generator.stream_generate(user_inputs, title):
-                yield f"data: {json.dumps(chunk)}\n\n"
+                yield sse_event(chunk)
         
         response = StreamingHttpResponse(
             generate(),
@@ -800,6 +868,8 @@ def generate_paper_stream(request):
         )
         response['Cache-Control'] = 'no-cache'
         response['Connection'] = 'keep-alive'
+        # Disable proxy buffering so chunks reach the client immediately
+        response['X-Accel-Buffering'] = 'no'
         return response
         
     except PaperGenerationError as e:
@@ -808,6 +878,73 @@ def generate_paper_stream(request):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
+@extend_schema(
+    summary="Generate papers in batch",
+    description="Generate many papers in one request. Each item is queued as a paper job and the response "
+                "lists the paper IDs to poll. When stream is true the items are generated during the request instead, "
+                "concurrently up to the LLM provider's capacity, and reported as server-sent events.",
+    request=BatchPaperGenerationRequestSerializer,
+    responses={202: OpenApiTypes.OBJECT}
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def generate_papers_batch(request):
+    """Queue several papers, or generate them concurrently while streaming progress"""
+    serializer = BatchPaperGenerationRequestSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    items = serializer.validated_data['items']
+    batch = BatchPaperGenerator(request.user)
+    
+    try:
+        prepared = batch.prepare(items)
+    except PaperGenerationError as e:
+        return Response({
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    # One credit check for the whole batch
+    required_credits = batch.required_credits(prepared)
+    if request.user.credits < required_credits:
+        return Response({
+            'error': 'Insufficient credits',
+            'required_credits': required_credits,
+            'user_credits': request.user.credits
+        }, status=status.HTTP_402_PAYMENT_REQUIRED)
+    
+    if serializer.validated_data['stream']:
+        def generate():
+            completed = failed = 0
+            yield sse_event({'type': 'status', 'total': len(prepared), 'required_credits': required_credits})
+            for result in batch.iter_results(prepared):
+                if result['status'] == 'completed':
+                    completed += 1
+                else:
+                    failed += 1
+                yield sse_event({'type': 'item', **result, 'done': completed + failed, 'total': len(prepared)})
+            yield sse_event({'type': 'completed', 'completed': completed, 'failed': failed})
+        
+        response = StreamingHttpResponse(
+            generate(),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    # Charge and queue every item; workers generate the content
+    results = batch.enqueue(prepared)
+    failed = sum(1 for result in results if result['status'] == 'failed')
+    return Response({
+        'total': len(results),
+        'queued': len(results) - failed,
+        'failed': failed,
+        'results': results
+    }, status=status.HTTP_202_ACCEPTED, headers={
+        'Retry-After': str(settings.PAPER_JOB_STATUS_POLL_AFTER),
+    })
+
+
 @extend_schema(
     summary="Validate paper",
     description="Validate generated paper content",
@@ -1052,9 +1189,6 @@ class PaperFormatWithLLMView(APIView):
         credit_price = paper_format.credit_price
         if user.credits < credit_price:
             return Response({'error': f'Insufficient credits. Required: {credit_price}, Available: {user.credits}'}, status=402)
-        user.credits -= credit_price
-        user.total_credits_used += credit_price
-        user.save()
 
         # Prepare variables for prompt
         sections = paper_format.template_structure.get('sections', []) if paper_format.template_structure else []
@@ -1064,7 +1198,7 @@ class PaperFormatWithLLMView(APIView):
             [f"{s['order']}. {s['name']} ({'Required' if s.get('required') else 'Optional'})" for s in sections]
         )
         formatting_str = "\n".join(
-            [f"- {k.replace('_', ' ').capitalize()}: {v}" for k, v in formatting.items()]
+            [f"- {k.replace('_', ' ').capitalize()}: {v}" for k, v in sorted(formatting.items())]
         )
 
         # Select prompt template based on language
@@ -1088,29 +1222,54 @@ class PaperFormatWithLLMView(APIView):
                 "Please return the formatted paper as HTML, including all required sections, formatting, and style."
             )
 
-        prompt = prompt_template.format(
+        llm_manager = LLMManager()
+
+        # Render once around a marker: everything before the text is the same for every
+        # chunk and every request with this format, so providers can reuse the cached prefix
+        text_marker = '\x00text\x00'
+        prompt_prefix, prompt_suffix = split_rendered(prompt_template.format(
             name=paper_format.name,
             description=paper_format.description,
             sections=sections_str,
             formatting=formatting_str,
             style_guidelines=paper_format.style_guidelines or "",
             citation_style=paper_format.citation_style or "",
-            text=text
-        )
+            text=text_marker
+        ), text_marker)
+
+        def build_messages(chunk_text, part_instructions):
+            content = chunk_text + prompt_suffix
+            if part_instructions:
+                content = f"{content}\n\n{part_instructions}"
+            return [
+                {'role': 'system', 'content': system_prompt},
+                prefixed_message(prompt_prefix, content)
+            ]
+
+        # Hold the credits for the LLM call; they are refunded if it fails
+        try:
+            hold = CreditLedger.hold(user, credit_price, f"Paper formatting: {paper_format.name}")
+        except InsufficientCreditsError as e:
+            return Response({'error': str(e)}, status=402)
 
-        llm_manager = LLMManager()
         try:
-            formatted_content = llm_manager.generate_with_prompt(
-                prompt_name="format_paper",
-                user_input=prompt,
-                language=language
+            # A missing or broken template fails here, inside the block that refunds the hold
+            system_prompt = llm_manager._get_system_prompt("format_paper", language, {})
+            # Long documents are formatted in parallel chunks that fit the model window
+            formatter = ChunkedPaperFormatter(
+                llm_manager,
+                output_format='html',
+                citation_style=paper_format.citation_style or ''
             )
+            formatted_content = formatter.format(text, build_messages)
             # Log the rendered system prompt for debugging
             logger.info(f"Rendered system prompt: {formatted_content}")
             # Remove AI explanations/thinking, keep only HTML
             formatted_content = extract_html_from_response(formatted_content)
         except Exception as e:
+            CreditLedger.release(hold, str(e))
             return Response({'error': f'LLM formatting failed: {str(e)}'}, status=500)
+        CreditLedger.commit(hold)
 
         return Response({
             'formatted_content': formatted_content,
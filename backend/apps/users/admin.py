@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.html import format_html
+from apps.billing.credits import CreditLedger
 from .models import User, UserProfile
 
 
@@ -60,8 +61,8 @@ class UserAdmin(BaseUserAdmin):
     def add_credits(self, request, queryset):
         """Add 10 credits to selected users"""
         for user in queryset:
-            user.credits += 10
-            user.save()
+            CreditLedger.grant(user, 10, 'bonus', description="Bonus credits",
+                               admin_notes=f"Added by admin: {request.user.email}")
         self.message_user(request, f"Added 10 credits to {queryset.count()} users.")
     add_credits.short_description = "Add 10 credits to selected users"
 
@@ -301,7 +301,7 @@ class PasswordChangeView(APIView):
         
         # Set new password
         user.set_password(new_password)
-        user.save()
+        user.save(update_fields=['password'])
         
         return Response({
             'message': 'Password changed successfully'
@@ -440,7 +440,7 @@ class DeleteAccountView(APIView):
         user = request.user
         user.is_active = False
         user.email = f"deleted_{user.id}_{user.email}"
-        user.save()
+        user.save(update_fields=['is_active', 'email'])
         return Response({"message": "Account deleted successfully"})
 
 
@@ -478,11 +478,11 @@ class UserPreferencesView(APIView):
         data = serializer.validated_data
         
         user = request.user
-        for field in ['language', 'email_notifications', 'marketing_emails']:
-            if field in data:
-                setattr(user, field, data[field])
+        fields = [field for field in ['language', 'email_notifications', 'marketing_emails'] if field in data]
+        for field in fields:
+            setattr(user, field, data[field])
         
-        user.save()
+        user.save(update_fields=fields)
         
         return Response({
             'message': 'Preferences updated successfully'
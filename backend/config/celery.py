@@ -0,0 +1,16 @@
+"""
+Celery app for background paper generation (PAPER_JOB_BACKEND = 'celery').
+
+Run a worker with: celery -A config worker
+and one scheduler for the periodic sweeps with: celery -A config beat
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+app = Celery('config')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
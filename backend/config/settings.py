@@ -87,6 +87,26 @@ DATABASES = {
     }
 }
 
+# Cache
+# Set REDIS_URL to share caches (LLM responses, rate limits, locks) across workers
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -144,7 +164,12 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'apps.core.renderers.ORJSONRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'apps.core.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
@@ -166,6 +191,8 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
 ]
+# Queued paper generation answers 202 with the status URL to poll
+CORS_EXPOSE_HEADERS = ['Location', 'Retry-After']
 
 # Spectacular Settings (Swagger)
 SPECTACULAR_SETTINGS = {
@@ -185,6 +212,118 @@ SPECTACULAR_SETTINGS = {
 # OpenAI Settings
 OPENAI_API_KEY = config('OPENAI_API_KEY', default='')
 
+# LLM Settings
+# Upper bound for the in-process tier of the LLM response cache
+LLM_CACHE_LOCAL_MAX_BYTES = config('LLM_CACHE_LOCAL_MAX_BYTES', default=32 * 1024 * 1024, cast=int)
+# Seconds a request may queue for a rate limit slot before failing
+LLM_RATE_LIMIT_MAX_WAIT = config('LLM_RATE_LIMIT_MAX_WAIT', default=30, cast=float)
+# Circuit breaker: open after N consecutive failures (or calls slower than the
+# latency threshold, in seconds) and probe again after the cool-down
+LLM_CIRCUIT_FAILURE_THRESHOLD = config('LLM_CIRCUIT_FAILURE_THRESHOLD', default=3, cast=int)
+LLM_CIRCUIT_LATENCY_THRESHOLD = config('LLM_CIRCUIT_LATENCY_THRESHOLD', default=0, cast=float) or None
+LLM_CIRCUIT_COOLDOWN = config('LLM_CIRCUIT_COOLDOWN', default=30, cast=int)
+LLM_FAILOVER_ENABLED = config('LLM_FAILOVER_ENABLED', default=True, cast=bool)
+# Hedged requests: when an opted-in call has produced no token after the given
+# percentile of recent time-to-first-token, race the next failover provider
+LLM_HEDGING_ENABLED = config('LLM_HEDGING_ENABLED', default=True, cast=bool)
+LLM_HEDGE_PERCENTILE = config('LLM_HEDGE_PERCENTILE', default=95, cast=float)
+LLM_HEDGE_MIN_SAMPLES = config('LLM_HEDGE_MIN_SAMPLES', default=20, cast=int)
+LLM_HEDGE_DEFAULT_DELAY = config('LLM_HEDGE_DEFAULT_DELAY', default=5.0, cast=float)
+LLM_HEDGE_MAX_WORKERS = config('LLM_HEDGE_MAX_WORKERS', default=16, cast=int)
+LLM_HEDGE_WINDOW = config('LLM_HEDGE_WINDOW', default=200, cast=int)
+# Single-flight: identical concurrent generations (in-process and across
+# workers via the cache) wait for one leader instead of each calling the LLM
+LLM_SINGLE_FLIGHT_ENABLED = config('LLM_SINGLE_FLIGHT_ENABLED', default=True, cast=bool)
+LLM_SINGLE_FLIGHT_LOCK_TIMEOUT = config('LLM_SINGLE_FLIGHT_LOCK_TIMEOUT', default=180, cast=int)
+LLM_SINGLE_FLIGHT_WAIT_TIMEOUT = config('LLM_SINGLE_FLIGHT_WAIT_TIMEOUT', default=180, cast=float)
+LLM_SINGLE_FLIGHT_RESULT_TTL = config('LLM_SINGLE_FLIGHT_RESULT_TTL', default=30, cast=int)
+# Documents larger than the model window are formatted in parallel chunks
+LLM_CHUNK_MAX_WORKERS = config('LLM_CHUNK_MAX_WORKERS', default=4, cast=int)
+LLM_CHUNK_OUTPUT_RATIO = config('LLM_CHUNK_OUTPUT_RATIO', default=1.5, cast=float)
+LLM_CHUNK_PROMPT_RESERVE = config('LLM_CHUNK_PROMPT_RESERVE', default=256, cast=int)
+LLM_CHUNK_MIN_TOKENS = config('LLM_CHUNK_MIN_TOKENS', default=256, cast=int)
+# Token budgeting: prompt estimates are padded by this factor and requests
+# leaving fewer than LLM_MIN_OUTPUT_TOKENS for the response are rejected
+LLM_TOKEN_ESTIMATE_MARGIN = config('LLM_TOKEN_ESTIMATE_MARGIN', default=1.1, cast=float)
+LLM_MIN_OUTPUT_TOKENS = config('LLM_MIN_OUTPUT_TOKENS', default=256, cast=int)
+
+# Batch paper generation: items per request, and the cap on the per-provider
+# worker pool (which is otherwise sized by LLMProvider.pool_size)
+PAPER_BATCH_MAX_ITEMS = config('PAPER_BATCH_MAX_ITEMS', default=100, cast=int)
+PAPER_BATCH_MAX_WORKERS = config('PAPER_BATCH_MAX_WORKERS', default=8, cast=int)
+
+# LLM call telemetry, buffered in memory and written in batches
+LLM_TELEMETRY_ENABLED = config('LLM_TELEMETRY_ENABLED', default=True, cast=bool)
+LLM_TELEMETRY_BATCH_SIZE = config('LLM_TELEMETRY_BATCH_SIZE', default=200, cast=int)
+LLM_TELEMETRY_FLUSH_INTERVAL = config('LLM_TELEMETRY_FLUSH_INTERVAL', default=5, cast=float)
+LLM_TELEMETRY_QUEUE_SIZE = config('LLM_TELEMETRY_QUEUE_SIZE', default=10000, cast=int)
+# Percentiles in the latency summary use at most this many recent calls per model
+LLM_TELEMETRY_SUMMARY_MAX_SAMPLES = config('LLM_TELEMETRY_SUMMARY_MAX_SAMPLES', default=5000, cast=int)
+# How often each process checks whether LLM settings changed elsewhere (seconds)
+LLM_CONFIG_SNAPSHOT_CHECK_INTERVAL = config('LLM_CONFIG_SNAPSHOT_CHECK_INTERVAL', default=1.0, cast=float)
+# How often each process checks whether prompt templates changed elsewhere (seconds)
+LLM_PROMPT_REGISTRY_CHECK_INTERVAL = config('LLM_PROMPT_REGISTRY_CHECK_INTERVAL', default=1.0, cast=float)
+
+# Language detection: long texts are sampled in evenly spaced windows, results memoized by content hash
+LANGUAGE_DETECTION_SAMPLE_SIZE = config('LANGUAGE_DETECTION_SAMPLE_SIZE', default=20000, cast=int)
+LANGUAGE_DETECTION_SAMPLE_WINDOWS = config('LANGUAGE_DETECTION_SAMPLE_WINDOWS', default=8, cast=int)
+LANGUAGE_DETECTION_CACHE_SIZE = config('LANGUAGE_DETECTION_CACHE_SIZE', default=1024, cast=int)
+LANGUAGE_DETECTION_BATCH_MAX_ITEMS = config('LANGUAGE_DETECTION_BATCH_MAX_ITEMS', default=100, cast=int)
+
+# Characters of chatter withheld while looking for the start of a streamed HTML document
+LLM_SANITIZER_MAX_PREAMBLE = config('LLM_SANITIZER_MAX_PREAMBLE', default=16384, cast=int)
+
+# Ollama warm-up: preload models at worker start and keep recently used ones resident.
+# Off by default, since it starts a thread in every web worker; enable it where Ollama
+# serves traffic, or run `manage.py warm_llm --heartbeat` once instead
+LLM_OLLAMA_WARMUP_ENABLED = config('LLM_OLLAMA_WARMUP_ENABLED', default=False, cast=bool)
+LLM_OLLAMA_WARMUP_DEFAULT_ONLY = config('LLM_OLLAMA_WARMUP_DEFAULT_ONLY', default=False, cast=bool)
+LLM_OLLAMA_WARMUP_TIMEOUT = config('LLM_OLLAMA_WARMUP_TIMEOUT', default=300, cast=int)  # seconds to wait for a model load
+LLM_OLLAMA_HEARTBEAT_INTERVAL = config('LLM_OLLAMA_HEARTBEAT_INTERVAL', default=240, cast=int)  # seconds
+LLM_OLLAMA_HOT_WINDOW = config('LLM_OLLAMA_HOT_WINDOW', default=21600, cast=int)  # keep models used within this many seconds warm
+# keep_alive sent with requests: twice the typical gap between requests, within these bounds (seconds)
+LLM_OLLAMA_KEEP_ALIVE_DEFAULT = config('LLM_OLLAMA_KEEP_ALIVE_DEFAULT', default=600, cast=int)
+LLM_OLLAMA_KEEP_ALIVE_MIN = config('LLM_OLLAMA_KEEP_ALIVE_MIN', default=300, cast=int)
+LLM_OLLAMA_KEEP_ALIVE_MAX = config('LLM_OLLAMA_KEEP_ALIVE_MAX', default=3600, cast=int)
+LLM_OLLAMA_TRAFFIC_WINDOW = config('LLM_OLLAMA_TRAFFIC_WINDOW', default=50, cast=int)  # requests remembered per model
+# Calls whose model load took at least this long (seconds) are reported as cold starts
+LLM_COLD_START_THRESHOLD = config('LLM_COLD_START_THRESHOLD', default=1.0, cast=float)
+
+# Prompt caching: mark stable prompt prefixes for providers with explicit caching (Anthropic cache_control)
+LLM_PROMPT_CACHE_HINTS = config('LLM_PROMPT_CACHE_HINTS', default=True, cast=bool)
+
+# Background paper generation: 'database' (run `manage.py run_paper_worker`) or 'celery' (`celery -A config worker`)
+PAPER_JOB_BACKEND = config('PAPER_JOB_BACKEND', default='database')
+PAPER_JOB_CONCURRENCY = config('PAPER_JOB_CONCURRENCY', default=4, cast=int)  # papers per database worker process
+PAPER_JOB_POLL_INTERVAL = config('PAPER_JOB_POLL_INTERVAL', default=2.0, cast=float)  # seconds between polls of an empty queue
+PAPER_JOB_TIMEOUT = config('PAPER_JOB_TIMEOUT', default=1800, cast=int)  # seconds before a job in progress is presumed dead
+PAPER_JOB_MAX_ATTEMPTS = config('PAPER_JOB_MAX_ATTEMPTS', default=3, cast=int)
+PAPER_JOB_STATUS_POLL_AFTER = config('PAPER_JOB_STATUS_POLL_AFTER', default=2, cast=int)  # Retry-After hint for status polling
+# 'single' asks for the whole paper in one call; 'sections' writes an outline, then the format's sections concurrently
+PAPER_GENERATION_MODE = config('PAPER_GENERATION_MODE', default='single')
+PAPER_SECTION_MAX_WORKERS = config('PAPER_SECTION_MAX_WORKERS', default=4, cast=int)  # also capped by the provider's pool_size
+PAPER_SECTION_MAX_TOKENS = config('PAPER_SECTION_MAX_TOKENS', default=2000, cast=int)
+PAPER_OUTLINE_MAX_TOKENS = config('PAPER_OUTLINE_MAX_TOKENS', default=800, cast=int)
+# Seconds between checkpoints of a streamed paper; failed papers resume from the last one
+PAPER_CHECKPOINT_INTERVAL = config('PAPER_CHECKPOINT_INTERVAL', default=5.0, cast=float)
+# Credit holds not committed or released within this many seconds are refunded by the sweeper, which runs
+# in run_paper_worker, on the Celery beat schedule below, or from cron with `manage.py release_credit_holds`
+CREDIT_HOLD_TIMEOUT = config('CREDIT_HOLD_TIMEOUT', default=3600, cast=int)
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default=REDIS_URL or 'redis://localhost:6379/0')
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+# Periodic sweeps, run by `celery -A config beat` alongside the workers
+CELERY_BEAT_SCHEDULE = {
+    'sweep-paper-jobs': {
+        'task': 'apps.papers.tasks.sweep_paper_jobs',
+        'schedule': config('PAPER_JOB_SWEEP_INTERVAL', default=60.0, cast=float),
+    },
+    'release-credit-holds': {
+        'task': 'apps.billing.tasks.release_credit_holds',
+        'schedule': config('CREDIT_HOLD_SWEEP_INTERVAL', default=300.0, cast=float),
+    },
+}
+
 # Email Settings (for development)
 # EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
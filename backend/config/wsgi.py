@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Preload Ollama models and keep them resident; off unless LLM_OLLAMA_WARMUP_ENABLED
+# is set and an Ollama model is configured
+from apps.core.ollama_warmup import start_warmup  # noqa: E402
+
+start_warmup()
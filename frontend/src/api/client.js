@@ -113,6 +113,11 @@ class ApiClient {
         throw new ApiError(response.status, data);
       }
 
+      // 需要读取响应头（如Location）时返回完整信息
+      if (options.withHeaders) {
+        return { data, headers: response.headers, status: response.status };
+      }
+
       return data;
     } catch (error) {
       clearTimeout(timeoutId);
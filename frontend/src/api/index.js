@@ -1,7 +1,7 @@
 // API统一导出
 export { apiClient, ApiError } from './client';
 export { authAPI } from './auth';
-export { papersAPI } from './papers';
+export { papersAPI, PaperGenerationFailed, PaperGenerationTimeout } from './papers';
 export { billingAPI } from './billing';
 export { contentAPI } from './content';
 export { coreAPI } from './core';
@@ -69,9 +69,32 @@ class PapersAPI {
     return normalizePaginatedResponse(data);
   }
 
-  // 生成论文
-  async generatePaper(params) {
-    return apiClient.post('/papers/generate/', params);
+  // 生成论文：提交任务后轮询状态，完成后返回论文详情
+  async generatePaper(params, { onStatus, timeout = 15 * 60 * 1000 } = {}) {
+    const { data: job, headers } = await apiClient.post('/papers/generate/', params, { withHeaders: true });
+    const location = headers.get('location');
+    const statusUrl = location
+      ? new URL(location, apiClient.baseURL).href
+      : `/papers/${job.id}/status/`;
+    const deadline = Date.now() + timeout;
+    let current = job;
+    let retryAfter = Number(headers.get('retry-after')) || 2;
+
+    while (current.status === 'pending' || current.status === 'generating') {
+      onStatus?.(current);
+      if (Date.now() > deadline) {
+        throw new PaperGenerationTimeout(current);
+      }
+      await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+      const { data, headers: statusHeaders } = await apiClient.get(statusUrl, { withHeaders: true });
+      current = data;
+      retryAfter = Number(statusHeaders.get('retry-after')) || retryAfter;
+    }
+
+    if (current.status !== 'completed') {
+      throw new PaperGenerationFailed(current);
+    }
+    return this.getPaperDetail(current.id);
   }
 
   // 流式生成论文
@@ -217,4 +240,22 @@ class PapersAPI {
   }
 }
 
+// 论文生成失败（状态为failed），paper中包含error_message
+export class PaperGenerationFailed extends Error {
+  constructor(paper) {
+    super(paper.error_message || 'Paper generation failed');
+    this.name = 'PaperGenerationFailed';
+    this.paper = paper;
+  }
+}
+
+// 轮询超时，论文仍在后台生成
+export class PaperGenerationTimeout extends Error {
+  constructor(paper) {
+    super('Paper generation is still running');
+    this.name = 'PaperGenerationTimeout';
+    this.paper = paper;
+  }
+}
+
 export const papersAPI = new PapersAPI();
\ No newline at end of file
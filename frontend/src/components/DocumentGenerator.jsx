@@ -2,7 +2,7 @@ import { useState, useEffect } from 'react';
 import { useTranslation } from 'react-i18next';
 import { useAuth } from '../contexts/AuthContext';
 import { useModal } from '../contexts/ModalContext';
-import { papersAPI } from '../api/papers';
+import { papersAPI, PaperGenerationFailed, PaperGenerationTimeout } from '../api/papers';
 
 
 function DocumentGenerator() {
@@ -15,6 +15,7 @@ function DocumentGenerator() {
   const [formData, setFormData] = useState({});
   const [previewContent, setPreviewContent] = useState('');
   const [error, setError] = useState(null);
+  const [generationStatus, setGenerationStatus] = useState(null);
   const { openLoginModal } = useModal();
 
   // Fetch templates for all users (authenticated or guest)
@@ -105,6 +106,7 @@ function DocumentGenerator() {
 
     setIsGenerating(true);
     setPreviewContent('');
+    setGenerationStatus(null);
     setError(null);
 
     try {
@@ -140,15 +142,25 @@ function DocumentGenerator() {
         }
       });
 
-      const data = await papersAPI.generatePaper(payload);
+      // The paper is queued; wait for a worker to write it, then load it
+      const data = await papersAPI.generatePaper(payload, {
+        onStatus: paper => setGenerationStatus(paper.status)
+      });
       setApiPaper(data);
       setPreviewContent(data.content);
 
     } catch (error) {
       console.error('Error generating paper:', error);
-      setError(error.message);
+      if (error instanceof PaperGenerationFailed) {
+        setError(`${t('coreFeatures.errors.failed')}: ${error.message}`);
+      } else if (error instanceof PaperGenerationTimeout) {
+        setError(t('coreFeatures.errors.timeout'));
+      } else {
+        setError(error.message);
+      }
     } finally {
       setIsGenerating(false);
+      setGenerationStatus(null);
     }
   };
 
@@ -449,7 +461,11 @@ function DocumentGenerator() {
                         <circle className="opacity-25" cx="12" cy="12" r="10" stroke="currentColor" strokeWidth="4"></circle>
                         <path className="opacity-75" fill="currentColor" d="M4 12a8 8 0 018-8V0C5.373 0 0 5.373 0 12h4zm2 5.291A7.962 7.962 0 014 12H0c0 3.042 1.135 5.824 3 7.938l3-2.647z"></path>
                       </svg>
-                      <p className="mt-4 text-gray-600">{t('coreFeatures.generateButton.loading')}</p>
+                      <p className="mt-4 text-gray-600">
+                        {generationStatus
+                          ? t(`coreFeatures.status.${generationStatus}`)
+                          : t('coreFeatures.generateButton.loading')}
+                      </p>
                       <p className="text-sm text-gray-500 mt-2">
                         {t('coreFeatures.generationTime')}
                       </p>